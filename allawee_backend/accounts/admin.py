@@ -1,13 +1,22 @@
 from django.contrib import admin
+from django.urls import reverse
 from django.utils.html import format_html
+
+from core.admin_performance import AdminPerformanceMixin
+from core.db_router import ReplicaChangelistMixin
+
+from . import bulk_actions
+from .search import IndexedSearchAdminMixin
+
 from .models import (
     UserProfile, LoanProduct, LoanApplication, 
-    Loan, Payment, RepaymentSchedule, RemitaTransaction
+    Loan, Payment, RepaymentSchedule, RemitaTransaction, RemitaWebhookEvent, PortfolioSnapshot, LoanArchive, DataExport, BulkActionJob
 )
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(AdminPerformanceMixin, IndexedSearchAdminMixin, admin.ModelAdmin):
     list_display = ['full_name', 'user', 'nysc_state_code', 'phone_number', 'salary_account_verified', 'created_at']
+    list_select_related = ['user']
     list_filter = ['nysc_state_code', 'salary_account_verified', 'created_at']
     search_fields = ['full_name', 'user__username', 'user__email', 'phone_number', 'bvn']
     readonly_fields = ['created_at', 'updated_at']
@@ -38,10 +47,13 @@ class LoanProductAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 @admin.register(LoanApplication)
-class LoanApplicationAdmin(admin.ModelAdmin):
+class LoanApplicationAdmin(AdminPerformanceMixin, IndexedSearchAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['application_id', 'applicant_name', 'loan_product', 'requested_amount', 'status', 'application_date']
     list_filter = ['status', 'loan_product', 'application_date']
+    list_select_related = ['applicant', 'loan_product']
+    date_hierarchy = 'application_date'
     search_fields = ['application_id', 'applicant__full_name', 'applicant__user__email']
+    autocomplete_fields = ['applicant', 'loan_product']
     readonly_fields = ['application_id', 'application_date']
     
     def applicant_name(self, obj):
@@ -60,25 +72,37 @@ class LoanApplicationAdmin(admin.ModelAdmin):
         })
     )
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
+class LoanAdmin(AdminPerformanceMixin, IndexedSearchAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ('loan_id', 'application', 'principal_amount', 'interest_amount', 'total_amount', 'status', 'disbursement_date', 'maturity_date', 'total_paid', 'outstanding_balance', 'auto_deduction_active')
     list_filter = ('status', 'disbursement_date', 'maturity_date', 'auto_deduction_active')
-    search_fields = ('loan_id', 'application__applicant__full_name', 'application__applicant__email')
+    list_select_related = ('application__applicant',)
+    date_hierarchy = 'disbursement_date'
+    search_fields = ('loan_id', 'borrower__full_name', 'borrower__user__email')
+    autocomplete_fields = ('application',)
+    readonly_fields = ('created_at',)
     actions = ['mark_as_closed', 'mark_as_defaulted']
 
+    def _run_bulk_action(self, request, queryset, action, label):
+        job, updated = bulk_actions.start(action, queryset, request.user)
+        if job is None:
+            self.message_user(request, f"{updated} loans marked as {label}.")
+            return
+        url = reverse('admin:accounts_bulkactionjob_change', args=[job.pk])
+        self.message_user(request, format_html(
+            '{} loans are being marked as {} in the background. <a href="{}">Follow progress</a>.', job.total, label, url
+        ))
+
     def mark_as_closed(self, request, queryset):
-        updated = queryset.update(status='closed')
-        self.message_user(request, f"{updated} loans marked as closed.")
+        self._run_bulk_action(request, queryset, 'close_loans', 'closed')
     mark_as_closed.short_description = "Mark selected loans as closed"
 
     def mark_as_defaulted(self, request, queryset):
-        updated = queryset.update(status='defaulted')
-        self.message_user(request, f"{updated} loans marked as defaulted.")
+        self._run_bulk_action(request, queryset, 'default_loans', 'defaulted')
     mark_as_defaulted.short_description = "Mark selected loans as defaulted"
 
     
     def borrower_name(self, obj):
-        return obj.application.applicant.full_name
+        return obj.borrower.full_name if obj.borrower_id else obj.application.applicant.full_name
     borrower_name.short_description = 'Borrower'
     
     fieldsets = (
@@ -100,14 +124,18 @@ class LoanAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(AdminPerformanceMixin, IndexedSearchAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['payment_id', 'loan_borrower', 'amount', 'payment_method', 'status', 'payment_date']
     list_filter = ['payment_method', 'status', 'payment_date']
+    list_select_related = ['loan', 'borrower']
+    date_hierarchy = 'payment_date'
     search_fields = ['payment_id', 'loan__loan_id', 'remita_rrr']
-    readonly_fields = ['payment_id', 'created_at']
+    autocomplete_fields = ['loan']
+    readonly_fields = ['payment_id', 'created_at', 'remita_response']
     
     def loan_borrower(self, obj):
-        return f"{obj.loan.loan_id} - {obj.loan.application.applicant.full_name}"
+        # borrower is the denormalized copy of loan.application.applicant
+        return f"{obj.loan.loan_id} - {obj.borrower.full_name if obj.borrower_id else ''}"
     loan_borrower.short_description = 'Loan & Borrower'
     
     fieldsets = (
@@ -127,22 +155,71 @@ class PaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(RepaymentSchedule)
-class RepaymentScheduleAdmin(admin.ModelAdmin):
+class RepaymentScheduleAdmin(AdminPerformanceMixin, IndexedSearchAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ('loan', 'installment_number', 'due_date', 'principal_amount', 'interest_amount', 'total_amount', 'is_paid', 'payment_date')
     list_filter = ('is_paid', 'due_date')
+    list_select_related = ('loan__application__applicant',)
+    autocomplete_fields = ('loan',)
     search_fields = ('loan__loan_id',)
 
 @admin.register(RemitaTransaction)
-class RemitaTransactionAdmin(admin.ModelAdmin):
+class RemitaTransactionAdmin(AdminPerformanceMixin, IndexedSearchAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ['remita_rrr', 'user_name', 'transaction_type', 'amount', 'status', 'initiated_at']
     list_filter = ['transaction_type', 'status', 'initiated_at']
+    list_select_related = ['user_profile']
+    date_hierarchy = 'initiated_at'
     search_fields = ['remita_rrr', 'user_profile__full_name']
-    readonly_fields = ['initiated_at']
+    autocomplete_fields = ['user_profile', 'loan']
+    readonly_fields = ['initiated_at', 'response_data']
     
     def user_name(self, obj):
         return obj.user_profile.full_name
     user_name.short_description = 'User'
 
+@admin.register(RemitaWebhookEvent)
+class RemitaWebhookEventAdmin(AdminPerformanceMixin, ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['remita_rrr', 'transaction_id', 'event_type', 'received_at', 'processed_at', 'outcome', 'detail']
+    list_filter = ['event_type', 'outcome', 'received_at']
+    search_fields = ['=remita_rrr', '=transaction_id']
+    readonly_fields = ['event_type', 'remita_rrr', 'transaction_id', 'payload', 'received_at', 'processed_at', 'outcome', 'detail']
+
+@admin.register(PortfolioSnapshot)
+class PortfolioSnapshotAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ['snapshot_date', 'outstanding_principal', 'par1_amount', 'par30_amount', 'par90_amount', 'collections_amount', 'disbursed_amount', 'defaulted_loans']
+    date_hierarchy = 'snapshot_date'
+    readonly_fields = ['created_at']
+
+@admin.register(LoanArchive)
+class LoanArchiveAdmin(AdminPerformanceMixin, admin.ModelAdmin):
+    list_display = ['loan_id', 'applicant', 'status', 'principal_amount', 'payment_count', 'closed_at', 'archived_at']
+    list_select_related = ['applicant']
+    list_filter = ['status']
+    search_fields = ['loan_id']
+    exclude = ['payload']
+    readonly_fields = ['loan_id', 'applicant', 'status', 'principal_amount', 'total_amount', 'disbursement_date', 'closed_at', 'payment_count', 'archived_at']
+
+@admin.register(DataExport)
+class DataExportAdmin(admin.ModelAdmin):
+    list_display = ['id', 'export', 'format', 'compress', 'status', 'row_count', 'requested_by', 'created_at', 'completed_at']
+    list_select_related = ['requested_by']
+    list_filter = ['export', 'status']
+    readonly_fields = ['export', 'format', 'compress', 'filters', 'status', 'file', 'row_count', 'error', 'requested_by', 'created_at', 'started_at', 'completed_at']
+
+@admin.register(BulkActionJob)
+class BulkActionJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'action', 'status', 'progress', 'changed', 'requested_by', 'created_at', 'completed_at']
+    list_filter = ['action', 'status']
+    list_select_related = ['requested_by']
+    exclude = ['object_ids']
+    readonly_fields = ['action', 'status', 'progress', 'total', 'processed', 'changed', 'error', 'requested_by', 'created_at', 'started_at', 'completed_at']
+    
+    def progress(self, obj):
+        return f"{obj.processed} / {obj.total} ({obj.percent_done}%)"
+    progress.short_description = 'Progress'
+    
+    def has_add_permission(self, request):
+        return False
+
 # Customize admin site
 admin.site.site_header = "AllaweePlus Admin Dashboard"
 admin.site.site_title = "AllaweePlus Admin"
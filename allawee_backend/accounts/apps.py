@@ -4,3 +4,26 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from core.sqlite_profile import apply_sqlite_profile
+
+        from . import authentication, bootstrap, quotes, sync
+        from .models import LoanProduct, UserProfile
+
+        connection_created.connect(apply_sqlite_profile, dispatch_uid='core.sqlite_profile')
+        for model in sync.ENTITY_BY_MODEL:
+            post_delete.connect(sync.record_tombstone, sender=model, dispatch_uid=f'accounts.sync.{model.__name__}')
+        for model in (User, UserProfile):
+            for name, signal in (('save', post_save), ('delete', post_delete)):
+                signal.connect(authentication.invalidate_principal_on_save, sender=model,
+                               dispatch_uid=f'accounts.authentication.{model.__name__}.{name}')
+        for name, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(bootstrap.invalidate_loan_products, sender=LoanProduct,
+                           dispatch_uid=f'accounts.bootstrap.LoanProduct.{name}')
+            signal.connect(quotes.invalidate_products, sender=LoanProduct,
+                           dispatch_uid=f'accounts.quotes.LoanProduct.{name}')
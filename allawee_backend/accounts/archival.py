@@ -0,0 +1,155 @@
+"""
+Archival of closed loans for AllaweePlus
+
+Loans that were closed, completed or written off more than N months ago are
+moved, together with their payments, repayment schedule and Remita
+transactions, into one compressed LoanArchive row each. The loan application
+stays in place. loan_history() reads a loan from the live tables or the
+archive and returns the same shape either way.
+"""
+
+from datetime import timedelta
+import json
+import logging
+import zlib
+
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Loan, LoanArchive
+
+logger = logging.getLogger(__name__)
+
+ARCHIVABLE_STATUSES = ('closed', 'completed', 'written_off')
+
+DEFAULT_ARCHIVE_BATCH_SIZE = 200
+
+
+def _serialize(queryset):
+    return [
+        dict(row['fields'], id=row['pk'])
+        for row in serializers.serialize('python', queryset)
+    ]
+
+
+def _with_payloads(queryset, payload_relation, key):
+    # Gateway responses live in RemitaPayload; archive them inline with their row
+    rows = []
+    for obj in queryset.select_related(payload_relation):
+        row = _serialize([obj])[0]
+        # A missing reverse one-to-one raises an AttributeError subclass
+        payload = getattr(obj, payload_relation, None)
+        row[key] = payload.data if payload is not None else None
+        rows.append(row)
+    return rows
+
+
+def _loan_rows(loan):
+    return {
+        'loan': _serialize([loan])[0],
+        'application': _serialize([loan.application])[0],
+        'payments': _with_payloads(loan.payments.order_by('payment_date', 'pk'), 'remita_payload', 'remita_response'),
+        'repayment_schedule': _serialize(loan.repayment_schedule.order_by('installment_number')),
+        'remita_transactions': _with_payloads(loan.remita_transactions.order_by('initiated_at', 'pk'), 'payload', 'response_data'),
+    }
+
+
+def _compress(rows):
+    return zlib.compress(json.dumps(rows, cls=DjangoJSONEncoder).encode('utf-8'), 6)
+
+
+def _decompress(payload):
+    return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+
+
+def archive_cutoff(months, now=None):
+    return (now or timezone.now()) - timedelta(days=30 * months)
+
+
+def archivable_loans(months, now=None):
+    return Loan.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=archive_cutoff(months, now))
+
+
+def archive_loan(loan_pk, cutoff=None):
+    """
+    Move one loan and its child rows into a LoanArchive row.
+
+    The loan is re-read under a row lock, which also holds off new payments
+    and posting for it, and is only archived if it is still archivable (and
+    was last updated before cutoff, when given). Returns the LoanArchive, or
+    None when the loan was reopened, updated or deleted in the meantime.
+    """
+    with transaction.atomic():
+        loan = Loan.objects.select_for_update().select_related('application').filter(pk=loan_pk).first()
+        if loan is None or loan.status not in ARCHIVABLE_STATUSES:
+            return None
+        if cutoff is not None and loan.updated_at >= cutoff:
+            return None
+        rows = _loan_rows(loan)
+        archive = LoanArchive.objects.create(
+            loan_id=loan.loan_id,
+            applicant_id=loan.application.applicant_id,
+            status=loan.status,
+            principal_amount=loan.principal_amount,
+            total_amount=loan.total_amount,
+            disbursement_date=loan.disbursement_date,
+            closed_at=loan.updated_at,
+            payment_count=len(rows['payments']),
+            payload=_compress(rows),
+        )
+        # Cascades to payments, repayment schedule and Remita transactions
+        loan.delete()
+    return archive
+
+
+def archive_closed_loans(months, batch_size=DEFAULT_ARCHIVE_BATCH_SIZE, limit=None):
+    """
+    Archive loans closed more than `months` months ago, one transaction per
+    loan, batch_size loans fetched at a time. Returns the number archived.
+    """
+    now = timezone.now()
+    cutoff = archive_cutoff(months, now)
+    archived = 0
+    last_pk = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        batch = list(
+            archivable_loans(months, now).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:size]
+        )
+        if not batch:
+            break
+        for pk in batch:
+            last_pk = pk
+            if archive_loan(pk, cutoff) is not None:
+                archived += 1
+    logger.info(f"Archived {archived} closed loans")
+    return archived
+
+
+def loan_history(loan_id):
+    """
+    Return a loan's full history by its public loan_id, from the live tables
+    or the archive, as a dict with 'archived', 'loan', 'application',
+    'payments', 'repayment_schedule' and 'remita_transactions'.
+    Returns None when the loan is unknown.
+    """
+    loan = Loan.objects.select_related('application').filter(loan_id=loan_id).first()
+    if loan is not None:
+        # Round-trip through JSON so live and archived loans look identical
+        rows = json.loads(json.dumps(_loan_rows(loan), cls=DjangoJSONEncoder))
+        return dict(rows, archived=False)
+
+    archive = LoanArchive.objects.filter(loan_id=loan_id).first()
+    if archive is not None:
+        return dict(_decompress(archive.payload), archived=True)
+    return None
+
+
+def loan_history_owner(loan_id):
+    """UserProfile id owning the loan, live or archived, or None."""
+    owner = Loan.objects.filter(loan_id=loan_id).values_list('borrower_id', flat=True).first()
+    if owner is None:
+        owner = LoanArchive.objects.filter(loan_id=loan_id).values_list('applicant_id', flat=True).first()
+    return owner
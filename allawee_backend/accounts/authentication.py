@@ -0,0 +1,123 @@
+"""
+JWT authentication with a cached principal
+
+simplejwt's JWTAuthentication loads the User row on every request, and most
+views then read request.user.profile, a second query. CachedJWTAuthentication
+keeps the user, with its profile attached, in the cache for
+AUTH_PRINCIPAL_CACHE_TTL seconds under
+
+    auth_principal_<user id>_<generation>
+
+The generation is a per-user value that the User and UserProfile
+post_save/post_delete receivers (connected in accounts.apps) replace once
+the transaction commits. After that, requests read a new key and load
+fresh rows. A request that loaded the old rows just before the commit can
+only write them under the old key, which nothing reads any more.
+
+Tokens carry the profile id (PROFILE_ID_CLAIM), so a cache miss loads the
+profile by primary key and its user in a single query. Tokens without the
+claim (older tokens, staff without a profile) load the user and its
+optional profile in a single join. The is_active and revoke-token checks
+still run on every request, against the cached user.
+
+Tokens are issued by login/register and by /api/auth/login/ through
+token_for_user(). SIMPLE_JWT accepts both "Bearer" and "Token" header
+prefixes, so clients that stored a DRF token keep the same header format.
+"""
+
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_CLAIM = 'profile_id'
+DEFAULT_PRINCIPAL_TTL = 60
+
+
+def principal_ttl():
+    return getattr(settings, 'AUTH_PRINCIPAL_CACHE_TTL', DEFAULT_PRINCIPAL_TTL)
+
+
+def generation_key(user_id):
+    return f"auth_principal_generation_{user_id}"
+
+
+def principal_key(user_id, generation):
+    return f"auth_principal_{user_id}_{generation}"
+
+
+def invalidate_principal(user_id):
+    """Start a new cache generation for user_id; earlier cached principals are never read again."""
+    # Outlives any principal cached under the previous generation, so
+    # expiring it cannot bring one back
+    cache.set(generation_key(user_id), uuid.uuid4().hex, principal_ttl() * 2)
+
+
+def invalidate_principal_on_save(sender, instance, **kwargs):
+    """post_save/post_delete receiver for User and UserProfile."""
+    user_id = instance.pk if sender is User else instance.user_id
+    if user_id is not None:
+        transaction.on_commit(lambda: invalidate_principal(user_id))
+
+
+def token_for_user(user):
+    """Refresh token (with its access token) for user, carrying the profile id claim."""
+    token = RefreshToken.for_user(user)
+    profile_id = UserProfile.objects.filter(user=user).values_list('pk', flat=True).first()
+    if profile_id is not None:
+        token[PROFILE_ID_CLAIM] = profile_id
+    return token
+
+
+def load_principal(user_id, profile_id=None):
+    """The user with its profile cached on it, in one query. None when the user does not exist."""
+    if profile_id is not None:
+        profile = UserProfile.objects.select_related('user').filter(pk=profile_id, user_id=user_id).first()
+        if profile is not None:
+            return profile.user
+    return User.objects.select_related('profile').filter(pk=user_id).first()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the user and profile from the cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+        user = None
+        try:
+            key = principal_key(user_id, cache.get(generation_key(user_id), 0))
+            user = cache.get(key)
+        except Exception as exc:
+            key = None
+            logger.warning(f"Principal cache unavailable for user {user_id}: {exc}")
+
+        if user is None:
+            user = load_principal(user_id, validated_token.get(PROFILE_ID_CLAIM))
+            if user is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if key is not None:
+                cache.set(key, user, principal_ttl())
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,485 @@
+"""
+Endpoint benchmark over a seeded loan book
+
+    python manage.py benchmark_endpoints [--users 20000] [--applications 100000] [--payments 500000]
+        [--iterations 30] [--only loans] [--cold] [--output report.json]
+        [--baseline benchmarks/baseline.json] [--update-baseline] [--keepdb]
+
+The command runs in a throwaway test database (the project database is not
+touched) that seed() fills with bulk_create. Every route in accounts.urls
+and accounts.urls_optimized (served under /api/optimized/) is then called
+in-process through the Django test client. Callers authenticate with JWTs
+as a seeded borrower or staff user, or make anonymous calls, as the route
+requires. For each case the report records:
+  * latency percentiles over the timed iterations (after warm-up calls);
+  * queries per request and the peak Python allocation per request
+    (tracemalloc). Both come from separate profiling passes, so the
+    instrumentation does not slow the timed ones.
+Requests that write run inside a transaction that is rolled back, so every
+iteration sees the same data. Throttles are off, Remita is mocked, and a
+private LocMem cache stands in for the configured one, so a benchmark
+never clears or fills a shared cache.
+
+failed_cases() lists the cases that did not return a 2xx; the command
+exits with an error when there are any, so a run never times error paths
+as if they were the route. compare() checks a report against a stored
+baseline. A case regresses
+when its p95 grows by more than the tolerance (and by at least
+MIN_P95_DELTA_MS), when it issues more queries, or when a route that used
+to succeed starts returning an error status. Baselines are only comparable
+when they were taken on the same dataset size and machine class.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+import hashlib
+import hmac
+import json
+import logging
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from core.urls import urlpatterns as core_urlpatterns
+
+from . import exports, urls as accounts_urls, urls_optimized
+from .authentication import token_for_user
+from .models import DataExport, Loan, LoanApplication, LoanProduct, Payment, RemitaTransaction, RepaymentSchedule, UserProfile
+
+# Served as ROOT_URLCONF while the benchmark runs
+urlpatterns = core_urlpatterns + [path('api/optimized/', include('accounts.urls_optimized'))]
+
+BENCH_PASSWORD = 'bench-password-1'
+BORROWER_USERNAME = 'bench000000'
+STAFF_USERNAME = 'bench-admin'
+PROFILE_PASSES = 5
+MIN_P95_DELTA_MS = 1.0
+DEFAULT_TOLERANCE = 0.2
+
+STATES = ['LA', 'AB', 'OG', 'KN', 'FC', 'EN', 'KD', 'PL']
+PRODUCTS = [
+    ('Emergency Loan', 'emergency'),
+    ('Education Loan', 'education'),
+    ('Business Loan', 'business'),
+    ('Personal Loan', 'personal'),
+]
+OPEN_STATUSES = ['pending', 'under_review', 'approved', 'rejected']
+PAYMENT_METHODS = ['remita_auto', 'remita_manual', 'bank_transfer', 'cash']
+
+BENCHMARK_SETTINGS = {
+    'ROOT_URLCONF': 'accounts.benchmark',
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'endpoint-benchmark'}},
+    'REMITA': {**getattr(settings, 'REMITA', {}), 'BASE_URL': '', 'WEBHOOK_SECRET': 'benchmark-webhook-secret'},
+}
+
+# user: 'borrower', 'staff' or None (anonymous). writes: run in a rolled-back transaction
+Case = namedtuple('Case', 'route method kwargs data query user writes headers')
+Case.__new__.__defaults__ = (None, None, '', 'borrower', False, None)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def dataset_counts():
+    return {
+        'users': UserProfile.objects.count(),
+        'applications': LoanApplication.objects.count(),
+        'loans': Loan.objects.count(),
+        'schedules': RepaymentSchedule.objects.count(),
+        'payments': Payment.objects.count(),
+    }
+
+
+def seed(users=20000, applications=100000, payments=500000, batch_size=5000, log=None):
+    """
+    Bulk-insert a synthetic loan book: every second application is
+    disbursed into a loan with one installment per month of tenure, and
+    payments are spread over the loans. Returns dataset_counts().
+    """
+    if users < 1 or applications < 1 or payments < 1:
+        raise ValueError("users, applications and payments must all be at least 1")
+    log = log or (lambda message: None)
+    now = timezone.now()
+    password = make_password(BENCH_PASSWORD)
+
+    products = LoanProduct.objects.bulk_create([
+        LoanProduct(name=name, loan_type=loan_type, min_amount=Decimal('5000.00'), max_amount=Decimal('100000.00'),
+                    interest_rate=Decimal('15.00'), max_tenure_months=6)
+        for name, loan_type in PRODUCTS
+    ])
+    User.objects.create_user(STAFF_USERNAME, f'{STAFF_USERNAME}@example.com', BENCH_PASSWORD, is_staff=True, is_superuser=True)
+
+    profile_ids = []
+    for batch in _batches(range(users), batch_size):
+        created = User.objects.bulk_create([
+            User(username=f'bench{i:06d}', email=f'bench{i:06d}@example.com', password=password, first_name='Bench')
+            for i in batch
+        ])
+        profiles = UserProfile.objects.bulk_create([
+            UserProfile(user=user, full_name=f'Bench Corper {i:06d}', nysc_state_code=STATES[i % len(STATES)],
+                        phone_number=f'090{i:08d}', bvn=f'{20000000000 + i}', bank_details=f'Bench Bank {i:06d}')
+            for i, user in zip(batch, created)
+        ])
+        profile_ids.extend(profile.pk for profile in profiles)
+    log(f"  {users} users and profiles")
+
+    loans = []  # (application pk, borrower id, principal, tenure, disbursed at)
+    for batch in _batches(range(applications), batch_size):
+        rows = []
+        for i in batch:
+            amount = Decimal(5000 + (i * 37 % 46) * 2000)
+            tenure = 1 + i % 6
+            rows.append(LoanApplication(
+                applicant_id=profile_ids[i % users], loan_product=products[i % len(products)],
+                application_id=f'BA{i:09d}', requested_amount=amount, tenure_months=tenure,
+                interest_rate=Decimal('15.00'), processing_fee=(amount * Decimal('0.025')).quantize(Decimal('0.01')),
+                status='disbursed' if i % 2 == 0 else OPEN_STATUSES[(i // 2) % len(OPEN_STATUSES)], purpose='Benchmark',
+            ))
+        for application in LoanApplication.objects.bulk_create(rows):
+            if application.status == 'disbursed':
+                disbursed_at = now - timedelta(days=len(loans) * 7 % 365, hours=len(loans) % 24)
+                loans.append((application.pk, application.applicant_id, application.requested_amount,
+                              application.tenure_months, disbursed_at))
+    log(f"  {applications} applications")
+
+    loan_rows = []  # (loan pk, borrower id, monthly payment, disbursed at)
+    for offset, batch in enumerate(_batches(loans, batch_size)):
+        rows, schedules = [], []
+        for i, (application_id, borrower_id, principal, tenure, disbursed_at) in enumerate(batch, offset * batch_size):
+            interest = (principal * Decimal('0.15') * tenure / 12).quantize(Decimal('0.01'))
+            total = principal + interest
+            rows.append(Loan(
+                application_id=application_id, borrower_id=borrower_id, loan_id=f'BL{i:09d}',
+                principal_amount=principal, interest_amount=interest, total_amount=total,
+                monthly_payment=(total / tenure).quantize(Decimal('0.01')),
+                status='completed' if i % 10 == 0 else 'defaulted' if i % 25 == 0 else 'active',
+                disbursement_date=disbursed_at, maturity_date=(disbursed_at + timedelta(days=30 * tenure)).date(),
+                outstanding_balance=total,
+            ))
+        for loan in Loan.objects.bulk_create(rows):
+            tenure = loans[len(loan_rows)][3]
+            loan_rows.append((loan.pk, loan.borrower_id, loan.monthly_payment, loan.disbursement_date))
+            for number in range(1, tenure + 1):
+                due_date = (loan.disbursement_date + timedelta(days=30 * number)).date()
+                schedules.append(RepaymentSchedule(
+                    loan_id=loan.pk, borrower_id=loan.borrower_id, installment_number=number, due_date=due_date,
+                    principal_amount=(loan.principal_amount / tenure).quantize(Decimal('0.01')),
+                    interest_amount=(loan.interest_amount / tenure).quantize(Decimal('0.01')),
+                    total_amount=loan.monthly_payment, is_paid=due_date < now.date(),
+                ))
+        RepaymentSchedule.objects.bulk_create(schedules, batch_size=batch_size)
+    log(f"  {len(loan_rows)} loans with repayment schedules")
+
+    for batch in _batches(range(payments), batch_size):
+        rows = []
+        for i in batch:
+            loan_id, borrower_id, amount, disbursed_at = loan_rows[i % len(loan_rows)]
+            paid_at = min(disbursed_at + timedelta(days=30 * (1 + i // len(loan_rows) % 6)), now)
+            rows.append(Payment(
+                loan_id=loan_id, borrower_id=borrower_id, payment_id=f'BP{i:010d}', amount=amount,
+                payment_method=PAYMENT_METHODS[i % len(PAYMENT_METHODS)],
+                status='failed' if i % 20 == 0 else 'pending' if i % 20 == 1 else 'successful',
+                payment_date=paid_at, due_date=paid_at.date(), reference=f'bench-{i}',
+            ))
+        Payment.objects.bulk_create(rows)
+    log(f"  {payments} payments")
+
+    paid = Payment.objects.filter(loan=OuterRef('pk'), status='successful').values('loan') \
+        .annotate(total=Sum('amount')).values('total')
+    paid = Coalesce(Subquery(paid), Value(Decimal('0.00')), output_field=DecimalField(max_digits=10, decimal_places=2))
+    Loan.objects.update(total_paid=paid, outstanding_balance=F('total_amount') - paid)
+    DataExport.objects.create(export='loans', format='csv', status='pending')
+    DataExport.objects.create(export='payments', format='csv', status='completed', filters={'status': 'failed'})
+    loan = Loan.objects.filter(borrower_id=profile_ids[0]).order_by('pk').first()
+    collection = RemitaTransaction.objects.create(
+        user_profile_id=profile_ids[0], loan=loan, transaction_type='payment_collection',
+        remita_rrr='BENCH-RRR-0', amount=loan.monthly_payment, status='successful',
+    )
+    collection.store_response_data({'statuscode': '00', 'RRR': 'BENCH-RRR-0', 'amount': str(loan.monthly_payment)})
+    return dataset_counts()
+
+
+def fixtures():
+    """Ids and tokens the cases need, picked from the seeded data."""
+    borrower = UserProfile.objects.select_related('user').get(user__username=BORROWER_USERNAME)
+    staff = User.objects.get(username=STAFF_USERNAME)
+    loan = Loan.objects.filter(borrower=borrower).order_by('pk').first()
+    payment = Payment.objects.filter(borrower=borrower).order_by('pk').first()
+    if loan is None or payment is None:
+        raise ValueError(f"Seeded data has no loan or payment for {BORROWER_USERNAME}")
+    borrower_token = token_for_user(borrower.user)
+    return {
+        'profile': borrower.pk,
+        'application': loan.application_id,
+        'loan': loan.pk,
+        'loan_code': loan.loan_id,
+        'payment': payment.pk,
+        'product': LoanProduct.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'export': DataExport.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'export_file': DataExport.objects.filter(status='completed').order_by('pk').values_list('pk', flat=True).first(),
+        'remita_transaction': RemitaTransaction.objects.filter(user_profile=borrower).order_by('pk')
+                              .values_list('pk', flat=True).first(),
+        'refresh': str(borrower_token),
+        'tokens': {
+            'borrower': str(borrower_token.access_token),
+            'staff': str(token_for_user(staff).access_token),
+        },
+    }
+
+
+def build_cases(fx):
+    """Requests covering every route; fx is fixtures()."""
+    application = {'loan_product': fx['product'], 'requested_amount': '20000.00', 'tenure_months': 3, 'purpose': 'Benchmark'}
+    # LoanApplicationListCreateView takes the full LoanApplicationSerializer, not the create serializer
+    full_application = {'loan_product_id': fx['product'], 'requested_amount': '20000.00', 'tenure_months': 3,
+                        'interest_rate': '15.00', 'processing_fee': '500.00', 'purpose': 'Benchmark'}
+    webhook = {'rrr': 'BENCH-RRR-1', 'amount': '5000.00', 'status': '00'}
+    recent = (timezone.now() - timedelta(days=30)).date().isoformat()
+    return [
+        Case('login', 'post', data={'username': BORROWER_USERNAME, 'password': BENCH_PASSWORD}, user=None, writes=True),
+        Case('register', 'post', data={'username': 'bench-new', 'email': 'bench-new@example.com', 'password': BENCH_PASSWORD,
+                                       'full_name': 'Bench New', 'phone_number': '09199999999'}, user=None, writes=True),
+        Case('logout', 'post', data={'refresh': fx['refresh']}, writes=True),
+        Case('bootstrap', 'get'),
+        Case('delta-sync', 'get'),
+        Case('user-profile', 'get'),
+        Case('loan-products', 'get', user=None),
+        Case('loan-product-detail', 'get', kwargs={'pk': fx['product']}, user=None),
+        Case('loan-quotes', 'get', query='amounts=20000,50000&tenures=3,6', user=None),
+        Case('loan-applications', 'get'),
+        Case('loan-applications', 'post', data=application, writes=True),
+        Case('loan-application-detail', 'get', kwargs={'pk': fx['application']}),
+        Case('loanapplication-list-create', 'get'),
+        Case('loanapplication-list-create', 'post', data=full_application, writes=True),
+        Case('loans', 'get'),
+        Case('loans', 'get', user='staff'),
+        Case('loan-detail', 'get', kwargs={'pk': fx['loan']}),
+        Case('loan-history', 'get', kwargs={'loan_id': fx['loan_code']}),
+        Case('payments', 'get'),
+        Case('payments', 'get', user='staff'),
+        Case('payment-detail', 'get', kwargs={'pk': fx['payment']}),
+        Case('repayment-schedule', 'get', kwargs={'loan_id': fx['loan']}),
+        Case('dashboard-stats', 'get', user='staff'),
+        Case('monthly-trends', 'get', user='staff'),
+        Case('portfolio-history', 'get', user='staff'),
+        Case('user-dashboard', 'get'),
+        Case('export-jobs', 'get', user='staff'),
+        Case('export-jobs', 'post', data={'export': 'payments', 'format': 'csv'}, user='staff', writes=True),
+        Case('export-job-detail', 'get', kwargs={'pk': fx['export']}, user='staff'),
+        Case('export-job-download', 'get', kwargs={'pk': fx['export_file']}, user='staff'),
+        Case('export-download', 'get', kwargs={'filename': 'loans.csv'}, query=f'start={recent}', user='staff'),
+        Case('db-pool-status', 'get', user='staff'),
+        Case('verify-salary', 'post', data={}, writes=True),
+        Case('setup-mandate', 'post', data={'loan_id': fx['loan']}, writes=True),
+        Case('remita-webhook', 'post', data=webhook, user=None, writes=True,
+             headers={'HTTP_X_REMITA_SIGNATURE': webhook_signature(webhook)}),
+        Case('remita-transaction-detail', 'get', kwargs={'pk': fx['remita_transaction']}),
+
+        Case('optimized-profile-list', 'get'),
+        Case('optimized-profile-detail', 'get', kwargs={'pk': fx['profile']}),
+        Case('optimized-profile-loan-summary', 'get', kwargs={'pk': fx['profile']}),
+        Case('optimized-application-list', 'get'),
+        Case('optimized-application-statistics', 'get'),
+        Case('optimized-application-detail', 'get', kwargs={'pk': fx['application']}),
+        Case('optimized-loan-list', 'get'),
+        Case('optimized-loan-detail', 'get', kwargs={'pk': fx['loan']}),
+        Case('optimized-loan-repayment-schedule', 'get', kwargs={'pk': fx['loan']}),
+        Case('optimized-payment-list', 'get'),
+        Case('optimized-payment-payment-analytics', 'get'),
+        Case('optimized-payment-detail', 'get', kwargs={'pk': fx['payment']}),
+        Case('optimized-product-list', 'get'),
+        Case('optimized-product-detail', 'get', kwargs={'pk': fx['product']}),
+        Case('optimized-dashboard-overview', 'get'),
+    ]
+
+
+def webhook_signature(payload):
+    secret = BENCHMARK_SETTINGS['REMITA']['WEBHOOK_SECRET']
+    return hmac.new(secret.encode('utf-8'), json.dumps(payload).encode('utf-8'), hashlib.sha512).hexdigest()
+
+
+def case_label(case):
+    return f"{case.method.upper()} {case.route} as {case.user or 'anonymous'}"
+
+
+def routes():
+    """Names of the routes the benchmark must cover."""
+    return sorted({pattern.name for pattern in accounts_urls.urlpatterns + urls_optimized.urlpatterns if pattern.name})
+
+
+def uncovered_routes(cases):
+    return sorted(set(routes()) - {case.route for case in cases})
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Runner:
+    """Calls cases through the test client; use inside benchmark_settings()."""
+
+    def __init__(self, fx, cold=False):
+        self.client = Client(raise_request_exception=False)
+        self.fx = fx
+        self.cold = cold
+        self.errors = {}  # case label -> first unhandled exception
+
+    def path(self, case):
+        url = reverse(case.route, kwargs=case.kwargs)
+        return f"{url}?{case.query}" if case.query else url
+
+    def call(self, case):
+        """One request; returns (status, seconds)."""
+        if not case.writes:
+            return self._request(case)
+        with transaction.atomic():
+            result = self._request(case)
+            transaction.set_rollback(True)
+        return result
+
+    def _request(self, case):
+        if self.cold:
+            cache.clear()
+        extra = dict(case.headers or {})
+        if case.user:
+            extra['HTTP_AUTHORIZATION'] = f"Bearer {self.fx['tokens'][case.user]}"
+        body = json.dumps(case.data) if case.data is not None else ''
+
+        started = time.perf_counter()
+        response = self.client.generic(case.method.upper(), self.path(case), body, content_type='application/json', **extra)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+        if response.exc_info and case_label(case) not in self.errors:
+            self.errors[case_label(case)] = f"{response.exc_info[0].__name__}: {response.exc_info[1]}"
+        return response.status_code, elapsed
+
+    def profile(self, case):
+        """Queries and peak allocation (KiB) for one request."""
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                tracemalloc.reset_peak()
+                self.call(case)
+                _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return len(queries.captured_queries), peak / 1024
+
+    def measure(self, case, iterations, warmup):
+        for _ in range(warmup):
+            self.call(case)
+        timings, statuses = [], set()
+        for _ in range(iterations):
+            status, elapsed = self.call(case)
+            timings.append(elapsed * 1000)
+            statuses.add(status)
+        profiles = [self.profile(case) for _ in range(min(PROFILE_PASSES, iterations))]
+        timings.sort()
+        result = {
+            'route': case.route,
+            'method': case.method.upper(),
+            'path': self.path(case),
+            'status': max(statuses),
+            'p50_ms': round(_percentile(timings, 0.50), 2),
+            'p95_ms': round(_percentile(timings, 0.95), 2),
+            'p99_ms': round(_percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'max_ms': round(timings[-1], 2),
+            'queries': max(queries for queries, _ in profiles),
+            'alloc_peak_kb': round(statistics.median(peak for _, peak in profiles), 1),
+        }
+        if case_label(case) in self.errors:
+            result['error'] = self.errors[case_label(case)]
+        return result
+
+
+def benchmark_settings():
+    """Settings override for a run: benchmark URLConf, private cache, no throttles, mocked Remita."""
+    rest_framework = {**getattr(settings, 'REST_FRAMEWORK', {}), 'DEFAULT_THROTTLE_CLASSES': [], 'DEFAULT_THROTTLE_RATES': {}}
+    return override_settings(REST_FRAMEWORK=rest_framework, **BENCHMARK_SETTINGS)
+
+
+def run_benchmark(iterations=30, warmup=3, only=None, cold=False, log=None):
+    """Measure every case against the current database. Returns the report dict."""
+    log = log or (lambda message: None)
+    # Unhandled exceptions are recorded in the report instead of logged with a traceback
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        report = _run(iterations, warmup, only, cold, log)
+    finally:
+        request_logger.setLevel(level)
+    return report
+
+
+def _run(iterations, warmup, only, cold, log):
+    with benchmark_settings(), tempfile.TemporaryDirectory() as export_root, \
+            override_settings(EXPORT_ROOT=export_root, EXPORT_ACCEL_REDIRECT_PREFIX=''):
+        fx = fixtures()
+        # export-job-download needs the file of the completed export on disk
+        exports.run_export(DataExport.objects.get(pk=fx['export_file']))
+        cases = build_cases(fx)
+        runner = Runner(fx, cold=cold)
+        results = {}
+        for case in cases:
+            label = case_label(case)
+            if only and only not in label:
+                continue
+            results[label] = runner.measure(case, iterations, warmup)
+            log(label)
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'dataset': dataset_counts(),
+        'iterations': iterations,
+        'warmup': warmup,
+        'cold_cache': cold,
+        'uncovered_routes': uncovered_routes(cases),
+        'results': results,
+    }
+
+
+def failed_cases(report):
+    """Labels of the cases whose status was not 2xx."""
+    return [label for label, result in report['results'].items() if not 200 <= result['status'] < 300]
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of report against baseline, as dicts with case, metric, baseline and current."""
+    regressions = []
+    for label, current in report['results'].items():
+        before = baseline.get('results', {}).get(label)
+        if before is None:
+            continue
+        if current['p95_ms'] > before['p95_ms'] * (1 + tolerance) and current['p95_ms'] - before['p95_ms'] >= MIN_P95_DELTA_MS:
+            regressions.append({'case': label, 'metric': 'p95_ms', 'baseline': before['p95_ms'], 'current': current['p95_ms']})
+        if current['queries'] > before['queries']:
+            regressions.append({'case': label, 'metric': 'queries', 'baseline': before['queries'], 'current': current['queries']})
+        if before['status'] < 400 <= current['status']:
+            regressions.append({'case': label, 'metric': 'status', 'baseline': before['status'], 'current': current['status']})
+    return regressions
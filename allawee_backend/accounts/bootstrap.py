@@ -0,0 +1,142 @@
+"""
+App-launch bootstrap payload
+
+One response with everything the mobile home screens need: profile,
+dashboard figures, loan products, the user's loans and the next repayment.
+Each section is cached separately and carries its own ETag, so a client that
+sends back the ETags it already holds only receives the sections that changed.
+
+Per-user sections are dropped from the cache by invalidate_user_sections()
+whenever the user's loans, payments or profile change, and the shared
+loan_products section by invalidate_loan_products() whenever a LoanProduct
+is saved or deleted. Otherwise sections expire after SECTION_TTLS.
+"""
+
+from decimal import Decimal
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import LoanApplication, LoanProduct, Loan, Payment, RepaymentSchedule
+from .serializers import (
+    BootstrapLoanSerializer, LoanProductSerializer, RepaymentInstallmentSerializer, UserProfileSerializer,
+)
+
+SECTIONS = ['profile', 'dashboard', 'loan_products', 'loans', 'next_repayment']
+USER_SECTIONS = ['profile', 'dashboard', 'loans', 'next_repayment']
+
+SECTION_TTLS = {
+    'profile': 300,
+    'dashboard': 60,
+    'loan_products': 600,
+    'loans': 60,
+    'next_repayment': 60,
+}
+
+
+def section_cache_key(section, profile_id):
+    if section == 'loan_products':
+        return 'bootstrap_loan_products'
+    return f"bootstrap_{section}_{profile_id}"
+
+
+def invalidate_user_sections(profile_id):
+    cache.delete_many([section_cache_key(section, profile_id) for section in USER_SECTIONS])
+
+
+def invalidate_loan_products(sender=None, **kwargs):
+    """post_save/post_delete receiver for LoanProduct."""
+    transaction.on_commit(lambda: cache.delete(section_cache_key('loan_products', None)))
+
+
+def next_repayment(profile):
+    installment = RepaymentSchedule.objects.select_related('loan').filter(
+        borrower=profile, is_paid=False
+    ).order_by('due_date').first()
+    return RepaymentInstallmentSerializer(installment).data if installment else None
+
+
+def dashboard_for(profile):
+    """User dashboard figures in one aggregate query per table."""
+    applications = LoanApplication.objects.filter(applicant=profile).aggregate(
+        total=Count('pk'),
+        pending=Count('pk', filter=Q(status='pending')),
+        approved=Count('pk', filter=Q(status='approved')),
+    )
+    loans = Loan.objects.filter(borrower=profile).aggregate(
+        active=Count('pk', filter=Q(status='active')),
+        borrowed=Sum('principal_amount'),
+        outstanding=Sum('outstanding_balance', filter=Q(status='active')),
+    )
+    paid = Payment.objects.filter(borrower=profile, status='successful').aggregate(total=Sum('amount'))['total']
+    return {
+        'total_applications': applications['total'],
+        'pending_applications': applications['pending'],
+        'approved_applications': applications['approved'],
+        'active_loans': loans['active'],
+        'total_borrowed': loans['borrowed'] or Decimal('0'),
+        'total_paid': paid or Decimal('0'),
+        'outstanding_balance': loans['outstanding'] or Decimal('0'),
+    }
+
+
+def _build(section, profile):
+    if section == 'profile':
+        return UserProfileSerializer(profile).data
+    if section == 'dashboard':
+        return dashboard_for(profile)
+    if section == 'loan_products':
+        return LoanProductSerializer(LoanProduct.objects.filter(is_active=True).order_by('pk'), many=True).data
+    if section == 'loans':
+        loans = Loan.objects.select_related('application__loan_product').filter(borrower=profile).order_by('-created_at')
+        return BootstrapLoanSerializer(loans, many=True).data
+    if section == 'next_repayment':
+        return next_repayment(profile)
+    raise ValueError(f"Unknown bootstrap section {section}")
+
+
+def get_section(section, profile):
+    """Return (etag, data) for a section, from cache when possible."""
+    key = section_cache_key(section, profile.pk)
+    cached = cache.get(key)
+    if cached is None:
+        # Round-trip through JSON so cached and fresh sections are identical
+        data = json.loads(json.dumps(_build(section, profile), cls=DjangoJSONEncoder))
+        digest = hashlib.md5(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        cached = (f"{section}:{digest}", data)
+        cache.set(key, cached, SECTION_TTLS[section])
+    return cached
+
+
+def parse_etags(header):
+    """Split an If-None-Match header into a set of bare ETag values."""
+    tags = set()
+    for part in (header or '').split(','):
+        part = part.strip()
+        if part.startswith('W/'):
+            part = part[2:]
+        if part:
+            tags.add(part.strip('"'))
+    return tags
+
+
+def build_bootstrap(profile, known_etags=(), sections=SECTIONS):
+    """
+    Return (combined_etag, payload). Sections whose ETag is in known_etags
+    come back as {'etag': ..., 'not_modified': True} without data.
+    """
+    payload = {}
+    etags = []
+    for section in sections:
+        etag, data = get_section(section, profile)
+        etags.append(etag)
+        if etag in known_etags:
+            payload[section] = {'etag': etag, 'not_modified': True}
+        else:
+            payload[section] = {'etag': etag, 'data': data}
+    combined = hashlib.md5('|'.join(etags).encode('utf-8')).hexdigest()[:16]
+    return f"bootstrap:{combined}", payload
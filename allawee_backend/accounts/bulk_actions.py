@@ -0,0 +1,124 @@
+"""
+Admin bulk actions that can outlive a request
+
+An admin action calls start(), which applies the change inline for small
+selections (up to ADMIN_BULK_SYNC_LIMIT rows) and otherwise records a
+BulkActionJob and leaves it to accounts.tasks.run_bulk_action_job. The task
+works through the selected ids in chunks of ADMIN_BULK_CHUNK_SIZE, each in
+its own transaction, and bumps processed/changed after every chunk, so the
+BulkActionJob admin page shows progress and a retried task resumes where the
+last one stopped.
+
+Loan status actions recompute total_paid and outstanding_balance from the
+successful payments while the rows are locked, then drop the borrowers'
+cached app sections and the dashboard caches.
+"""
+
+from decimal import Decimal
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .bootstrap import invalidate_user_sections
+from .models import BulkActionJob, Loan, Payment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_LIMIT = 200
+DEFAULT_CHUNK_SIZE = 500
+
+
+def set_loan_status(loan_ids, status, now):
+    """Set status on the given loans and recompute their balances. Returns the number changed."""
+    with transaction.atomic():
+        # Lock in id order, like posting, so concurrent workers cannot deadlock
+        loans = list(Loan.objects.select_for_update().filter(pk__in=loan_ids).order_by('pk'))
+        paid = dict(
+            Payment.objects.filter(loan_id__in=[loan.pk for loan in loans], status='successful')
+            .values('loan_id').annotate(total=Sum('amount')).values_list('loan_id', 'total')
+        )
+        for loan in loans:
+            loan.total_paid = paid.get(loan.pk) or Decimal('0.00')
+            loan.outstanding_balance = max(loan.total_amount - loan.total_paid, Decimal('0.00'))
+            if status == 'defaulted' and loan.status != 'defaulted':
+                loan.defaulted_at = now
+            loan.status = status
+            loan.updated_at = now
+        Loan.objects.bulk_update(loans, ['total_paid', 'outstanding_balance', 'status', 'defaulted_at', 'updated_at'])
+
+    for loan in loans:
+        cache.delete(f"loan_repayment_schedule_{loan.pk}")
+    for borrower_id in {loan.borrower_id for loan in loans}:
+        invalidate_user_sections(borrower_id)
+    return len(loans)
+
+
+# action -> (description, function(ids, now) -> rows changed)
+BULK_ACTIONS = {
+    'close_loans': ("Mark loans as closed", lambda ids, now: set_loan_status(ids, 'closed', now)),
+    'default_loans': ("Mark loans as defaulted", lambda ids, now: set_loan_status(ids, 'defaulted', now)),
+}
+
+
+def sync_limit():
+    return getattr(settings, 'ADMIN_BULK_SYNC_LIMIT', DEFAULT_SYNC_LIMIT)
+
+
+def chunk_size():
+    return getattr(settings, 'ADMIN_BULK_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def _invalidate_dashboards():
+    cache.delete("dashboard_overview")
+    cache.delete("payment_analytics")
+
+
+def start(action, queryset, user=None):
+    """
+    Apply action to queryset now, or queue it when the selection is large.
+    Returns (job, changed): job is None when the change was applied inline.
+    """
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    if len(ids) <= sync_limit():
+        _, apply = BULK_ACTIONS[action]
+        changed = apply(ids, timezone.now())
+        _invalidate_dashboards()
+        return None, changed
+
+    job = BulkActionJob.objects.create(action=action, object_ids=ids, total=len(ids), requested_by=user)
+    from .tasks import run_bulk_action_job  # tasks imports this module
+    transaction.on_commit(lambda: run_bulk_action_job.delay(job.pk))
+    return job, 0
+
+
+def run_job(job_id, size=None):
+    """Apply a queued job chunk by chunk, recording progress. Returns the job."""
+    size = size or chunk_size()
+    job = BulkActionJob.objects.get(pk=job_id)
+    if job.status == 'completed':
+        return job
+    _, apply = BULK_ACTIONS[job.action]
+    BulkActionJob.objects.filter(pk=job.pk).update(status='running', started_at=job.started_at or timezone.now())
+
+    try:
+        # processed only moves forward after a chunk commits, so a rerun resumes there
+        for offset in range(job.processed, job.total, size):
+            chunk = job.object_ids[offset:offset + size]
+            changed = apply(chunk, timezone.now())
+            BulkActionJob.objects.filter(pk=job.pk).update(
+                processed=F('processed') + len(chunk), changed=F('changed') + changed
+            )
+    except Exception as exc:
+        logger.error(f"Bulk action job {job.pk} ({job.action}) failed: {exc}")
+        BulkActionJob.objects.filter(pk=job.pk).update(status='failed', error=str(exc)[:255])
+        raise
+
+    _invalidate_dashboards()
+    BulkActionJob.objects.filter(pk=job.pk).update(status='completed', error='', completed_at=timezone.now())
+    job.refresh_from_db()
+    logger.info(f"Bulk action job {job.pk} ({job.action}): {job.changed} of {job.total} rows changed")
+    return job
@@ -0,0 +1,54 @@
+"""
+Consistency checks for denormalized columns
+
+Loan, Payment and RepaymentSchedule carry a copy of the owning
+LoanApplication.applicant as `borrower`. It is filled in on save(), but
+bulk_create(), queryset.update() and admin edits of an application's
+applicant bypass that, so these helpers find and repair rows that drifted.
+"""
+
+import logging
+
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Loan, LoanApplication, Payment, RepaymentSchedule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPAIR_BATCH_SIZE = 1000
+
+# model -> (lookup to the authoritative applicant, loan reference for the subquery)
+BORROWER_SOURCES = {
+    Loan: ('application__applicant', 'pk'),
+    Payment: ('loan__application__applicant', 'loan_id'),
+    RepaymentSchedule: ('loan__application__applicant', 'loan_id'),
+}
+
+
+def borrower_mismatches(model):
+    """Rows of model whose borrower is missing or differs from the application's applicant."""
+    source, _ = BORROWER_SOURCES[model]
+    return model.objects.filter(Q(borrower__isnull=True) | ~Q(borrower=F(source)))
+
+
+def check_borrower_consistency():
+    """Return {model label: mismatched row count}."""
+    return {model._meta.label: borrower_mismatches(model).count() for model in BORROWER_SOURCES}
+
+
+def repair_borrower_consistency(batch_size=DEFAULT_REPAIR_BATCH_SIZE):
+    """Reset borrower from the application on every mismatched row. Returns {label: fixed}."""
+    fixed = {}
+    for model, (_, loan_ref) in BORROWER_SOURCES.items():
+        applicant = LoanApplication.objects.filter(loan=OuterRef(loan_ref)).values('applicant_id')[:1]
+        count = 0
+        while True:
+            batch = list(borrower_mismatches(model).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            count += model.objects.filter(pk__in=batch).update(borrower_id=Subquery(applicant), updated_at=timezone.now())
+        fixed[model._meta.label] = count
+        if count:
+            logger.warning(f"Repaired borrower on {count} {model._meta.label} rows")
+    return fixed
@@ -0,0 +1,274 @@
+"""
+Streaming extracts of the loan book for finance and regulators
+
+    GET /api/accounts/exports/payments.csv?start=2026-01-01&end=2026-02-01
+    GET /api/accounts/exports/loans.ndjson.gz?status=active
+    python manage.py export_data payments --format ndjson --gzip --output payments.ndjson.gz
+
+Rows are read with values_list() in keyset pages of EXPORT_CHUNK_SIZE
+(WHERE pk > last ORDER BY pk LIMIT n), so neither Django nor the database
+holds more than one page, whatever the table size, and no cursor or
+transaction stays open while a slow client downloads. Each page is encoded
+(CSV or NDJSON, optionally gzip) and handed to the response as one chunk.
+
+Exports too large for an HTTP request go to a background task instead:
+POST /api/accounts/exports/ creates a DataExport and
+accounts.tasks.run_data_export writes the file under EXPORT_ROOT (private,
+never served as media); staff fetch it from
+GET /api/accounts/exports/jobs/<id>/download/.
+"""
+
+from datetime import date, datetime, time
+import csv
+import io
+import json
+import logging
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.db_router import replica_alias, replica_is_healthy
+
+from .models import DataExport, Loan, Payment, RepaymentSchedule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# name -> (model, date filter field, [(column, values_list lookup)])
+EXPORTS = {
+    'loans': (Loan, 'disbursement_date', [
+        ('loan_id', 'loan_id'),
+        ('application_id', 'application__application_id'),
+        ('borrower_id', 'borrower_id'),
+        ('borrower_name', 'borrower__full_name'),
+        ('nysc_state_code', 'borrower__nysc_state_code'),
+        ('status', 'status'),
+        ('principal_amount', 'principal_amount'),
+        ('interest_amount', 'interest_amount'),
+        ('total_amount', 'total_amount'),
+        ('monthly_payment', 'monthly_payment'),
+        ('total_paid', 'total_paid'),
+        ('outstanding_balance', 'outstanding_balance'),
+        ('disbursement_date', 'disbursement_date'),
+        ('maturity_date', 'maturity_date'),
+        ('remita_mandate_id', 'remita_mandate_id'),
+        ('auto_deduction_active', 'auto_deduction_active'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ]),
+    'payments': (Payment, 'payment_date', [
+        ('payment_id', 'payment_id'),
+        ('loan_id', 'loan__loan_id'),
+        ('borrower_id', 'borrower_id'),
+        ('amount', 'amount'),
+        ('payment_method', 'payment_method'),
+        ('status', 'status'),
+        ('payment_date', 'payment_date'),
+        ('due_date', 'due_date'),
+        ('remita_rrr', 'remita_rrr'),
+        ('remita_transaction_id', 'remita_transaction_id'),
+        ('reference', 'reference'),
+        ('created_at', 'created_at'),
+    ]),
+    'schedules': (RepaymentSchedule, 'due_date', [
+        ('loan_id', 'loan__loan_id'),
+        ('borrower_id', 'borrower_id'),
+        ('installment_number', 'installment_number'),
+        ('due_date', 'due_date'),
+        ('principal_amount', 'principal_amount'),
+        ('interest_amount', 'interest_amount'),
+        ('total_amount', 'total_amount'),
+        ('late_fee', 'late_fee'),
+        ('is_paid', 'is_paid'),
+        ('payment_date', 'payment_date'),
+        ('is_overdue', 'is_overdue'),
+        ('days_overdue', 'days_overdue'),
+    ]),
+}
+
+
+def default_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def parse_filename(filename):
+    """'payments.ndjson.gz' -> ('payments', 'ndjson', True). Raises ValueError."""
+    parts = filename.split('.')
+    compress = parts[-1] == 'gz'
+    if compress:
+        parts = parts[:-1]
+    if len(parts) != 2 or parts[0] not in EXPORTS or parts[1] not in FORMATS:
+        raise ValueError(
+            f"Unknown export {filename!r}; use <{'|'.join(EXPORTS)}>.<{'|'.join(FORMATS)}>[.gz]"
+        )
+    return parts[0], parts[1], compress
+
+
+def parse_filters(params):
+    """Validate start/end (ISO dates, end exclusive) and status. Raises ValueError."""
+    filters = {}
+    for key in ('start', 'end'):
+        if params.get(key):
+            try:
+                value = parse_date(params[key])
+            except ValueError:
+                value = None
+            if value is None:
+                raise ValueError(f"{key} must be a date (YYYY-MM-DD)")
+            filters[key] = value.isoformat()
+    if params.get('status'):
+        filters['status'] = params['status']
+    return filters
+
+
+def _bound(field, value):
+    """A date filter value, as a local midnight for datetime columns so the index is used."""
+    value = date.fromisoformat(value)
+    if isinstance(field, models.DateTimeField):
+        return timezone.make_aware(datetime.combine(value, time.min))
+    return value
+
+
+def build_queryset(name, filters=None, using=None):
+    model, date_field, _ = EXPORTS[name]
+    filters = filters or {}
+    field = model._meta.get_field(date_field)
+    rows = model.objects.using(using or 'default').all()
+    if filters.get('start'):
+        rows = rows.filter(**{f"{date_field}__gte": _bound(field, filters['start'])})
+    if filters.get('end'):
+        rows = rows.filter(**{f"{date_field}__lt": _bound(field, filters['end'])})
+    if filters.get('status'):
+        rows = rows.filter(status=filters['status'])
+    return rows
+
+
+def read_alias():
+    """Exports read the replica when there is a healthy one."""
+    alias = replica_alias()
+    return alias if alias and replica_is_healthy(alias) else 'default'
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class ExportStream:
+    """
+    Iterable of encoded byte chunks, one per page of rows. rows holds the
+    number of rows written so far.
+    """
+
+    def __init__(self, name, fmt='csv', compress=False, filters=None, using=None, chunk_size=None):
+        if name not in EXPORTS or fmt not in FORMATS:
+            raise ValueError(f"Unknown export {name}.{fmt}")
+        self.name = name
+        self.fmt = fmt
+        self.compress = compress
+        self.filters = filters or {}
+        self.using = using
+        self.chunk_size = chunk_size or default_chunk_size()
+        self.rows = 0
+
+    @property
+    def filename(self):
+        return f"{self.name}.{self.fmt}{'.gz' if self.compress else ''}"
+
+    @property
+    def content_type(self):
+        return 'application/gzip' if self.compress else FORMATS[self.fmt]
+
+    @property
+    def headers(self):
+        return [column for column, _ in EXPORTS[self.name][2]]
+
+    def pages(self):
+        """Lists of value tuples, one keyset page at a time."""
+        _, _, columns = EXPORTS[self.name]
+        rows = build_queryset(self.name, self.filters, self.using).order_by('pk')
+        lookups = ['pk'] + [lookup for _, lookup in columns]
+        last = None
+        while True:
+            page = rows if last is None else rows.filter(pk__gt=last)
+            page = list(page.values_list(*lookups)[:self.chunk_size])
+            if not page:
+                return
+            last = page[-1][0]
+            yield [row[1:] for row in page]
+            if len(page) < self.chunk_size:
+                return
+
+    def _encode(self, page, buffer, writer):
+        if self.fmt == 'csv':
+            writer.writerows([_csv_value(value) for value in row] for row in page)
+        else:
+            for row in page:
+                buffer.write(json.dumps(dict(zip(self.headers, row)), cls=DjangoJSONEncoder))
+                buffer.write('\n')
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    def __iter__(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # wbits=31: gzip container, so the output is a regular .gz file
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if self.compress else None
+
+        def emit(data):
+            return compressor.compress(data) if compressor else data
+
+        if self.fmt == 'csv':
+            writer.writerow(self.headers)
+            yield emit(self._encode([], buffer, writer))
+        for page in self.pages():
+            self.rows += len(page)
+            data = emit(self._encode(page, buffer, writer))
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+
+
+def write_export(stream, fileobj):
+    """Write an ExportStream to a binary file object. Returns the row count."""
+    for data in stream:
+        fileobj.write(data)
+    return stream.rows
+
+
+def run_export(export):
+    """Write a DataExport's file to storage and mark it completed (or failed)."""
+    DataExport.objects.filter(pk=export.pk).update(status='running', started_at=timezone.now())
+    stream = ExportStream(export.export, export.format, export.compress, export.filters, using=read_alias())
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            rows = write_export(stream, tmp)
+            tmp.seek(0)
+            export.file.save(stream.filename, File(tmp), save=False)
+    except Exception as exc:
+        logger.error(f"Export {export.pk} ({stream.filename}) failed: {exc}")
+        DataExport.objects.filter(pk=export.pk).update(status='failed', error=str(exc)[:255], completed_at=timezone.now())
+        raise
+    DataExport.objects.filter(pk=export.pk).update(
+        status='completed', file=export.file.name, row_count=rows, completed_at=timezone.now()
+    )
+    logger.info(f"Export {export.pk}: {rows} rows written to {export.file.name}")
+    return rows
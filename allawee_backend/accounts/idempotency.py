@@ -0,0 +1,109 @@
+"""
+Idempotency-Key support for retried POSTs
+
+Clients send a unique Idempotency-Key header (e.g. a UUID per logical
+attempt) with register, loan application and mandate requests:
+  * the first request takes a short lock (cache.add, i.e. SET NX on Redis),
+    runs the view and stores its status and data for IDEMPOTENCY_KEY_TTL;
+  * a retry with the same key and body gets the stored response back after
+    one cache lookup, marked with Idempotent-Replayed: true;
+  * a retry that arrives while the first request is still running gets 409,
+    and a key reused with a different body gets 422.
+5xx responses are not stored, so the client can retry them. Keys are scoped
+per view and per user (anonymous requests share one scope).
+
+    @api_view(['POST'])
+    @permission_classes([...])
+    @idempotent('setup_mandate')
+    def setup_mandate(request): ...
+
+    class LoanApplicationList(IdempotentPostMixin, generics.ListCreateAPIView):
+        idempotency_scope = 'loan_application'
+"""
+
+from functools import wraps
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+DEFAULT_KEY_TTL = 86400
+DEFAULT_LOCK_TIMEOUT = 90  # longer than the slowest view (Remita's TOTAL_TIMEOUT)
+
+
+def cache_key(scope, request, key):
+    user = request.user
+    owner = user.pk if user is not None and user.is_authenticated else 'anon'
+    return f"idempotency_{scope}_{owner}_{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+
+def fingerprint(request):
+    return hashlib.sha256(request.method.encode('utf-8') + request.path.encode('utf-8') + request.body).hexdigest()
+
+
+def run_idempotent(scope, request, view):
+    """Run view() at most once per Idempotency-Key; see the module docstring."""
+    key = request.META.get(HEADER)
+    if not key:
+        return view()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}, status=status.HTTP_400_BAD_REQUEST)
+
+    stored_key = cache_key(scope, request, key)
+    request_fingerprint = fingerprint(request)
+    stored = cache.get(stored_key)
+    if stored is None:
+        lock_key = f"{stored_key}_lock"
+        if not cache.add(lock_key, 1, getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)):
+            response = Response({'error': 'A request with this Idempotency-Key is still being processed'}, status=status.HTTP_409_CONFLICT)
+            response['Retry-After'] = '1'
+            return response
+        try:
+            # The first request may have stored its response and released the
+            # lock between the lookup above and cache.add()
+            stored = cache.get(stored_key)
+            if stored is not None:
+                return _replay(stored, request_fingerprint)
+            response = view()
+            if isinstance(response, Response) and response.status_code < 500:
+                cache.set(stored_key, {
+                    'fingerprint': request_fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_KEY_TTL))
+            return response
+        finally:
+            cache.delete(lock_key)
+    return _replay(stored, request_fingerprint)
+
+
+def _replay(stored, request_fingerprint):
+    if stored['fingerprint'] != request_fingerprint:
+        return Response({'error': 'Idempotency-Key was already used for a different request'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(stored['data'], status=stored['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """Decorator for DRF function views; place it below @api_view and @permission_classes."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            return run_idempotent(scope, request, lambda: view_func(request, *args, **kwargs))
+        return wrapped
+    return decorator
+
+
+class IdempotentPostMixin:
+    """Honour Idempotency-Key on a DRF generic view's POST handler."""
+    idempotency_scope = None
+
+    def post(self, request, *args, **kwargs):
+        scope = self.idempotency_scope or type(self).__name__
+        return run_idempotent(scope, request, lambda: super(IdempotentPostMixin, self).post(request, *args, **kwargs))
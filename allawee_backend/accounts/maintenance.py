@@ -0,0 +1,144 @@
+"""
+Adaptive database maintenance for AllaweePlus
+
+Reads table statistics and only ANALYZEs, VACUUMs or REINDEXes what has
+actually drifted, inside an off-peak window. Thresholds follow the shape of
+Postgres autovacuum (base + scale factor * live rows) and can be overridden
+with the DB_MAINTENANCE setting. On SQLite the job runs PRAGMA optimize.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Local hours during which maintenance may run, as [start, end)
+    'WINDOW_START_HOUR': 1,
+    'WINDOW_END_HOUR': 5,
+    # Only tables whose name starts with one of these are considered
+    'TABLE_PREFIXES': ('accounts_',),
+    'ANALYZE_THRESHOLD': 1000,
+    'ANALYZE_SCALE_FACTOR': 0.05,
+    'VACUUM_THRESHOLD': 5000,
+    'VACUUM_SCALE_FACTOR': 0.10,
+    # Indexes with leaf density below this (percent) are rebuilt; needs pgstattuple
+    'REINDEX_MIN_LEAF_DENSITY': 60,
+    'REINDEX_MIN_SIZE_BYTES': 10 * 1024 * 1024,
+}
+
+TABLE_STATS_SQL = """
+    SELECT relname, n_live_tup, n_dead_tup, n_mod_since_analyze
+    FROM pg_stat_user_tables
+    WHERE schemaname = current_schema()
+    ORDER BY relname
+"""
+
+INDEX_STATS_SQL = """
+    SELECT i.indexrelname, (pgstatindex(i.indexrelid::regclass)).avg_leaf_density
+    FROM pg_stat_user_indexes i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE i.schemaname = current_schema()
+      AND i.relname = ANY(%s)
+      AND am.amname = 'btree'
+      AND pg_relation_size(i.indexrelid) >= %s
+"""
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DB_MAINTENANCE', {}))
+    return config
+
+
+def in_maintenance_window(config, now=None):
+    hour = timezone.localtime(now).hour
+    start, end = config['WINDOW_START_HOUR'], config['WINDOW_END_HOUR']
+    if start <= end:
+        return start <= hour < end
+    # Window wraps midnight, e.g. 22 -> 4
+    return hour >= start or hour < end
+
+
+def plan_table_maintenance(table_stats, config):
+    """
+    Decide which tables need ANALYZE or VACUUM.
+
+    table_stats is an iterable of (table, live_rows, dead_rows, modified_since_analyze).
+    Returns a list of (action, table) with VACUUM ANALYZE replacing a plain ANALYZE.
+    """
+    plan = []
+    for table, live, dead, modified in table_stats:
+        if not table.startswith(tuple(config['TABLE_PREFIXES'])):
+            continue
+        live = live or 0
+        vacuum_limit = config['VACUUM_THRESHOLD'] + config['VACUUM_SCALE_FACTOR'] * live
+        analyze_limit = config['ANALYZE_THRESHOLD'] + config['ANALYZE_SCALE_FACTOR'] * live
+        if (dead or 0) > vacuum_limit:
+            plan.append(('VACUUM ANALYZE', table))
+        elif (modified or 0) > analyze_limit:
+            plan.append(('ANALYZE', table))
+    return plan
+
+
+def _has_pgstattuple(cursor):
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple'")
+    return cursor.fetchone() is not None
+
+
+def _run_postgresql(config):
+    quote = connection.ops.quote_name
+    actions = []
+    with connection.cursor() as cursor:
+        cursor.execute(TABLE_STATS_SQL)
+        plan = plan_table_maintenance(cursor.fetchall(), config)
+
+        # VACUUM and REINDEX CONCURRENTLY cannot run inside a transaction block;
+        # Django is in autocommit here so each statement runs on its own.
+        for action, table in plan:
+            cursor.execute(f"{action} {quote(table)}")
+            actions.append(f"{action} {table}")
+
+        # pgstatindex reads the whole index, so only check tables just vacuumed
+        tables = [table for action, table in plan if action.startswith('VACUUM')]
+        if tables and _has_pgstattuple(cursor):
+            cursor.execute(INDEX_STATS_SQL, [tables, config['REINDEX_MIN_SIZE_BYTES']])
+            for index, density in cursor.fetchall():
+                if density is not None and density < config['REINDEX_MIN_LEAF_DENSITY']:
+                    cursor.execute(f"REINDEX INDEX CONCURRENTLY {quote(index)}")
+                    actions.append(f"REINDEX {index}")
+    return actions
+
+
+def _run_sqlite(config):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA optimize")
+    return ['PRAGMA optimize']
+
+
+def run_maintenance(force=False, now=None):
+    """
+    Run whatever maintenance is due. Returns the list of statements executed,
+    or None when outside the maintenance window.
+    """
+    config = get_config()
+    if not force and not in_maintenance_window(config, now):
+        return None
+
+    if connection.in_atomic_block:
+        raise RuntimeError("Database maintenance must not run inside a transaction")
+
+    if connection.vendor == 'postgresql':
+        actions = _run_postgresql(config)
+    elif connection.vendor == 'sqlite':
+        actions = _run_sqlite(config)
+    else:
+        actions = []
+
+    for action in actions:
+        logger.info(f"Database maintenance: {action}")
+    return actions
@@ -0,0 +1,33 @@
+"""
+Move long-closed loans out of the hot tables
+
+    python manage.py archive_closed_loans --months 12
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.archival import DEFAULT_ARCHIVE_BATCH_SIZE, archivable_loans, archive_closed_loans
+
+
+class Command(BaseCommand):
+    help = "Archive loans closed, completed or written off more than N months ago"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help="Stop after archiving this many loans")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the loans that would be archived")
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError("--months must be at least 1")
+
+        if options['dry_run']:
+            count = archivable_loans(options['months']).count()
+            self.stdout.write(f"{count} loans would be archived")
+            return
+
+        archived = archive_closed_loans(
+            options['months'], batch_size=options['batch_size'], limit=options['limit']
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} loans"))
@@ -0,0 +1,27 @@
+"""
+Detach old monthly partitions of accounts_payment / accounts_remitatransaction
+
+    python manage.py archive_partitions --older-than-months 24
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.partitioning import archive_partitions, ensure_future_partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions and move old ones to the archive schema (Postgres only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-months', type=int, help="Archive partitions ending more than N months ago")
+        parser.add_argument('--months-ahead', type=int, default=3, help="Future partitions to keep ready")
+
+    def handle(self, *args, **options):
+        ensured = ensure_future_partitions(months_ahead=options['months_ahead'])
+        self.stdout.write(f"Ensured {len(ensured)} future partitions")
+
+        if options['older_than_months'] is not None:
+            if options['older_than_months'] < 1:
+                raise CommandError("--older-than-months must be at least 1")
+            for name in archive_partitions(options['older_than_months']):
+                self.stdout.write(self.style.SUCCESS(f"Archived {name}"))
@@ -0,0 +1,50 @@
+"""
+Backfill daily portfolio snapshots
+
+    python manage.py backfill_portfolio_snapshots --start 2025-08-01 --end 2025-08-31
+"""
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from accounts.models import Loan
+from accounts.portfolio import backfill_portfolio_snapshots
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Build PortfolioSnapshot rows for a date range, oldest first"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day (default: first disbursement date)")
+        parser.add_argument('--end', help="Last day (default: yesterday)")
+        parser.add_argument('--rebuild', action='store_true', help="Recompute days that already have a snapshot")
+
+    def handle(self, *args, **options):
+        end_date = _parse_date(options['end']) if options['end'] else timezone.localdate() - timedelta(days=1)
+
+        if options['start']:
+            start_date = _parse_date(options['start'])
+        else:
+            first = Loan.objects.aggregate(first=Min('disbursement_date'))['first']
+            if first is None:
+                self.stdout.write("No disbursed loans, nothing to backfill")
+                return
+            start_date = timezone.localtime(first).date()
+
+        if start_date > end_date:
+            raise CommandError("--start must not be after --end")
+
+        written = backfill_portfolio_snapshots(start_date, end_date, rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} portfolio snapshots for {start_date} to {end_date}"
+        ))
@@ -0,0 +1,107 @@
+"""
+Benchmark every API route against a seeded dataset
+
+    python manage.py benchmark_endpoints [--users 20000] [--applications 100000] [--payments 500000]
+        [--iterations 30] [--warmup 3] [--only loans] [--cold]
+        [--output benchmark-report.json] [--baseline PATH] [--update-baseline] [--tolerance 0.2] [--keepdb]
+
+Runs in a throwaway test database; the project database is not touched.
+With --keepdb the test database (and its seeded rows) is reused by the next
+run, which skips seeding when the database already holds data. Exits with an
+error when the report regresses against the baseline (BENCHMARK_BASELINE by
+default). See accounts/benchmark.py.
+"""
+
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from accounts import benchmark
+from accounts.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Benchmark latency, queries and allocations for every accounts API route"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--applications', type=int, default=100000)
+        parser.add_argument('--payments', type=int, default=500000)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', help="Only cases whose label contains this text, e.g. 'GET loans'")
+        parser.add_argument('--cold', action='store_true', help="Clear the cache before every request")
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument('--baseline', default=str(getattr(settings, 'BENCHMARK_BASELINE', '')))
+        parser.add_argument('--update-baseline', action='store_true', help="Write this report as the new baseline")
+        parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            if UserProfile.objects.exists():
+                self.stdout.write("Reusing the seeded test database")
+            else:
+                self.stdout.write("Seeding...")
+                try:
+                    benchmark.seed(options['users'], options['applications'], options['payments'], log=self.stdout.write)
+                except ValueError as exc:
+                    raise CommandError(str(exc))
+            report = benchmark.run_benchmark(
+                options['iterations'], options['warmup'], options['only'], options['cold'],
+                log=lambda label: self.stdout.write(f"  {label}"),
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        self._print(report)
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f"Report written to {options['output']}")
+        failed = benchmark.failed_cases(report)
+        if failed:
+            raise CommandError(f"{len(failed)} case(s) did not return 2xx: {', '.join(failed)}")
+
+        baseline_path = options['baseline']
+        if options['update_baseline']:
+            if not baseline_path:
+                raise CommandError("No baseline path; pass --baseline")
+            os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+            with open(baseline_path, 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Baseline updated: {baseline_path}")
+        elif baseline_path and os.path.exists(baseline_path):
+            with open(baseline_path) as stored:
+                self._compare(report, json.load(stored), options['tolerance'])
+        else:
+            self.stdout.write(f"No baseline at {baseline_path or '(unset)'}; run with --update-baseline to store one")
+
+    def _print(self, report):
+        self.stdout.write(f"Dataset: {report['dataset']}")
+        columns = ['status', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'alloc_peak_kb']
+        self.stdout.write(f"{'case':<60}" + "".join(f"{column:>14}" for column in columns))
+        for label, result in report['results'].items():
+            self.stdout.write(f"{label:<60}" + "".join(f"{result[column]:>14}" for column in columns))
+        for label, result in report['results'].items():
+            if 'error' in result:
+                self.stdout.write(self.style.WARNING(f"{label}: {result['error']}"))
+        if report['uncovered_routes']:
+            self.stdout.write(self.style.WARNING(f"Routes without a benchmark case: {', '.join(report['uncovered_routes'])}"))
+
+    def _compare(self, report, baseline, tolerance):
+        if baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline dataset {baseline.get('dataset')} differs from this run; latencies are not comparable"
+            ))
+        regressions = benchmark.compare(report, baseline, tolerance)
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{regression['case']}: {regression['metric']} {regression['baseline']} -> {regression['current']}"
+            ))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
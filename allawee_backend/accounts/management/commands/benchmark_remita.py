@@ -0,0 +1,29 @@
+"""
+Compare blocking Remita calls with the pooled async client
+
+    python manage.py benchmark_remita [--requests 500] [--concurrency 50] [--blocking-workers 4] [--latency 0.2]
+
+Runs against a throwaway stub gateway on a random local port; Remita itself
+is never called.
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts.remita_stub import run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Benchmark Remita gateway throughput against the local stub"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--blocking-workers', type=int, default=4)
+        parser.add_argument('--latency', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        columns = ['mode', 'requests', 'errors', 'requests_per_second', 'p50_ms', 'p95_ms']
+        self.stdout.write("  ".join(f"{column:>20}" for column in columns))
+        results = run_benchmark(options['requests'], options['concurrency'], options['blocking_workers'], options['latency'])
+        for result in results:
+            self.stdout.write("  ".join(f"{result[column]:>20}" for column in columns))
@@ -0,0 +1,28 @@
+"""
+Compare the default and tuned SQLite profiles under concurrent load
+
+    python manage.py benchmark_sqlite [--threads 16] [--seconds 10] [--loans 1000]
+
+Runs against throwaway databases in a temp directory; the project database
+is not touched.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.sqlite_profile import run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Benchmark SQLite with default pragmas vs. the tuned profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=int, default=10)
+        parser.add_argument('--loans', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        columns = ['profile', 'ops_per_second', 'errors', 'p50_ms', 'p95_ms', 'p99_ms']
+        self.stdout.write("  ".join(f"{column:>14}" for column in columns))
+        for tuned in (False, True):
+            result = run_benchmark(tuned, options['threads'], options['seconds'], options['loans'])
+            self.stdout.write("  ".join(f"{result[column]:>14}" for column in columns))
@@ -0,0 +1,33 @@
+"""
+Verify the denormalized borrower column against loan applications
+
+    python manage.py check_borrower_consistency [--fix]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.consistency import check_borrower_consistency, repair_borrower_consistency
+
+
+class Command(BaseCommand):
+    help = "Check (and optionally repair) borrower on loans, payments and repayment schedules"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Reset mismatched rows from the loan application")
+
+    def handle(self, *args, **options):
+        if options['fix']:
+            for label, count in repair_borrower_consistency().items():
+                self.stdout.write(f"{label}: repaired {count}")
+            return
+
+        failures = 0
+        for label, count in check_borrower_consistency().items():
+            if count:
+                failures += count
+                self.stdout.write(self.style.ERROR(f"MISMATCH  {label}: {count}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK        {label}"))
+
+        if failures:
+            raise CommandError(f"{failures} rows have a stale borrower; rerun with --fix")
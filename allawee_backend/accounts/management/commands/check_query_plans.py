@@ -0,0 +1,31 @@
+"""
+Verify that hot queries are planned on their intended indexes
+
+    python manage.py check_query_plans [--verbose-plans]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot accounts queries and fail if an expected index is not used"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the full plan for every query")
+
+    def handle(self, *args, **options):
+        failures = 0
+        for description, index, plan, ok in check_query_plans(using=options['database']):
+            if ok:
+                self.stdout.write(self.style.SUCCESS(f"OK    {description} -> {index}"))
+            else:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"MISS  {description} -> {index}"))
+            if options['verbose_plans'] or not ok:
+                self.stdout.write(f"      {plan}")
+
+        if failures:
+            raise CommandError(f"{failures} queries are not using their expected index")
@@ -0,0 +1,47 @@
+"""
+Export loans, payments or repayment schedules with constant memory
+
+    python manage.py export_data payments --format csv --output payments.csv
+    python manage.py export_data loans --format ndjson --gzip --status active --output loans.ndjson.gz
+    python manage.py export_data schedules --start 2026-01-01 --end 2026-02-01 > schedules.csv
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.exports import EXPORTS, FORMATS, ExportStream, parse_filters, read_alias, write_export
+
+
+class Command(BaseCommand):
+    help = "Stream a full extract of loans, payments or repayment schedules to a file or stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Compress the output")
+        parser.add_argument('--start', help="First date to include (YYYY-MM-DD)")
+        parser.add_argument('--end', help="First date to exclude (YYYY-MM-DD)")
+        parser.add_argument('--status')
+        parser.add_argument('--chunk-size', type=int, help="Rows per query (default EXPORT_CHUNK_SIZE)")
+        parser.add_argument('--output', default='-', help="File to write, or - for stdout")
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_filters(options)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        stream = ExportStream(
+            options['export'], options['format'], options['gzip'], filters,
+            using=read_alias(), chunk_size=options['chunk_size'],
+        )
+        if options['output'] == '-':
+            rows = write_export(stream, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+            self.stderr.write(f"Exported {rows} rows")
+            return
+
+        with open(options['output'], 'wb') as output:
+            rows = write_export(stream, output)
+        self.stdout.write(self.style.SUCCESS(f"Exported {rows} {options['export']} rows to {options['output']}"))
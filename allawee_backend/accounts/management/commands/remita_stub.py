@@ -0,0 +1,31 @@
+"""
+Run the local Remita stub gateway
+
+    python manage.py remita_stub [--host 127.0.0.1] [--port 8765] [--latency 0.2]
+
+Point the client at it with REMITA_BASE_URL=http://127.0.0.1:8765.
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts.remita_stub import StubRemitaServer
+
+
+class Command(BaseCommand):
+    help = "Serve a stub Remita gateway for offline development and benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds to wait before each response')
+
+    def handle(self, *args, **options):
+        server = StubRemitaServer(options['host'], options['port'], options['latency'])
+        self.stdout.write(f"Remita stub listening on {server.url} ({options['latency']}s latency)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.requests} requests, peak concurrency {server.max_in_flight}")
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:00
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_merge_20250810_0049'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField(unique=True)),
+                ('outstanding_principal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('defaulted_loans', models.IntegerField(default=0)),
+                ('par1_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('par1_loans', models.IntegerField(default=0)),
+                ('par30_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('par30_loans', models.IntegerField(default=0)),
+                ('par90_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('par90_loans', models.IntegerField(default=0)),
+                ('disbursed_count', models.IntegerField(default=0)),
+                ('disbursed_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('collections_count', models.IntegerField(default=0)),
+                ('collections_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('cumulative_disbursed', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('cumulative_collected', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-snapshot_date'],
+            },
+        ),
+    ]
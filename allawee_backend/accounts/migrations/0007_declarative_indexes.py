@@ -0,0 +1,157 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_portfoliosnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Replace the hand-written indexes from 0004 with the ones declared in
+        # Meta.indexes; the unique columns among them were indexed twice.
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_userprofile_bvn;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_userprofile_bvn ON accounts_userprofile(bvn);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_userprofile_phone;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_userprofile_phone ON accounts_userprofile(phone_number);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_userprofile_created_at;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_userprofile_created_at ON accounts_userprofile(created_at);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_userprofile_nysc_state;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_userprofile_nysc_state ON accounts_userprofile(nysc_state_code);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loanapplication_status;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loanapplication_status ON accounts_loanapplication(status);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loanapplication_applicant_status;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loanapplication_applicant_status ON accounts_loanapplication(applicant_id, status);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loanapplication_created_at;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loanapplication_created_at ON accounts_loanapplication(application_date);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loanapplication_loan_id;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loanapplication_loan_id ON accounts_loanapplication(application_id);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loan_status;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loan_status ON accounts_loan(status);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loan_loan_id;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loan_loan_id ON accounts_loan(loan_id);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loan_application_status;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loan_application_status ON accounts_loan(application_id, status);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loan_disbursement_date;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loan_disbursement_date ON accounts_loan(disbursement_date);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_payment_status;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_payment_status ON accounts_payment(status);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_payment_payment_id;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_payment_payment_id ON accounts_payment(payment_id);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_payment_loan_status;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_payment_loan_status ON accounts_payment(loan_id, status);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_payment_created_at;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_payment_created_at ON accounts_payment(created_at);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loan_application_created;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loan_application_created ON accounts_loan(application_id, created_at);"
+        ),
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS idx_loanapp_applicant_created;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS idx_loanapp_applicant_created ON accounts_loanapplication(applicant_id, application_date);"
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['-created_at'], name='loan_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'created_at'], name='loan_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['disbursement_date'], name='loan_disbursement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['applicant', 'status'], name='loanapp_applicant_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['applicant', '-application_date'], name='loanapp_applicant_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['status', 'application_date'], name='loanapp_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-created_at'], name='payment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'payment_date'], name='payment_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['loan', 'status'], name='payment_loan_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['remita_rrr'], name='payment_rrr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='remitatransaction',
+            index=models.Index(fields=['remita_rrr'], name='remita_txn_rrr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(fields=['loan', 'installment_number'], name='schedule_loan_installment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['due_date'], name='schedule_unpaid_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['phone_number'], name='profile_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['bvn'], name='profile_bvn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-created_at'], name='profile_created_idx'),
+        ),
+    ]
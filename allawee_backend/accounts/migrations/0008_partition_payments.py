@@ -0,0 +1,110 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Table -> partition key. Postgres requires the partition key in every unique
+# constraint, so the primary key becomes (id, key) and unique columns become
+# (column, key); ids and payment_ids stay globally unique in practice because
+# they come from a sequence and a UUID respectively.
+PARTITIONED_TABLES = [
+    ('accounts_payment', 'payment_date'),
+    ('accounts_remitatransaction', 'initiated_at'),
+]
+
+FUTURE_MONTHS = 3
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def _partition_table(schema_editor, table, key):
+    quote = schema_editor.quote_name
+    legacy = f"{table}_unpartitioned"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [table]
+        )
+        if cursor.fetchone():
+            return
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'", [table]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT c.conname, array_agg(a.attname::text ORDER BY k.ord) FROM pg_constraint c "
+            "CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord) "
+            "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum "
+            "WHERE c.conrelid = %s::regclass AND c.contype = 'u' GROUP BY c.conname", [table]
+        )
+        unique_constraints = cursor.fetchall()
+        cursor.execute(
+            "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+            "WHERE i.indrelid = %s::regclass AND NOT i.indisunique AND NOT i.indisprimary", [table]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE ({quote(key)})"
+        )
+
+        cursor.execute(f"SELECT min({quote(key)}) FROM {quote(legacy)}")
+        oldest = cursor.fetchone()[0] or timezone.now()
+        month = oldest.date().replace(day=1)
+        last = _add_months(timezone.now().date().replace(day=1), FUTURE_MONTHS)
+        while month <= last:
+            cursor.execute(
+                f"CREATE TABLE {quote(f'{table}_p{month.year}_{month.month:02d}')} "
+                f"PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+                [month.isoformat(), _add_months(month, 1).isoformat()],
+            )
+            month = _add_months(month, 1)
+        cursor.execute(f"CREATE TABLE {quote(f'{table}_default')} PARTITION OF {quote(table)} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {quote(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {quote(legacy)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 1), max(id) IS NOT NULL) "
+            f"FROM {quote(table)}", [table]
+        )
+        cursor.execute(f"DROP TABLE {quote(legacy)}")
+
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, {quote(key)})")
+        for name, columns in unique_constraints:
+            column_list = ', '.join(quote(column) for column in list(columns) + [key])
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} UNIQUE ({column_list})")
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, key in PARTITIONED_TABLES:
+        _partition_table(schema_editor, table, key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_declarative_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='repaymentschedule',
+            name='payment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.payment'),
+        ),
+        # Partitioned tables behave like plain tables for the ORM, so rolling
+        # back leaves them partitioned.
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_partition_payments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_id', models.CharField(max_length=20, unique=True)),
+                ('status', models.CharField(max_length=20)),
+                ('principal_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('disbursement_date', models.DateTimeField()),
+                ('closed_at', models.DateTimeField()),
+                ('payment_count', models.IntegerField(default=0)),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('applicant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to='accounts.userprofile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_borrowers(apps, schema_editor):
+    LoanApplication = apps.get_model('accounts', 'LoanApplication')
+    for model_name, loan_ref in (('Loan', 'pk'), ('Payment', 'loan_id'), ('RepaymentSchedule', 'loan_id')):
+        model = apps.get_model('accounts', model_name)
+        applicant = LoanApplication.objects.filter(loan=OuterRef(loan_ref)).values('applicant_id')[:1]
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(borrower__isnull=True, pk__gt=last_pk)
+                .order_by('pk').values_list('pk', flat=True)[:BACKFILL_BATCH_SIZE]
+            )
+            if not batch:
+                break
+            model.objects.filter(pk__in=batch).update(borrower_id=Subquery(applicant))
+            last_pk = batch[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_loanarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='borrower',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='loans', to='accounts.userprofile'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='borrower',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='accounts.userprofile'),
+        ),
+        migrations.AddField(
+            model_name='repaymentschedule',
+            name='borrower',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='repayment_installments', to='accounts.userprofile'),
+        ),
+        migrations.RunPython(backfill_borrowers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['borrower', '-created_at'], name='loan_borrower_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['borrower', '-created_at'], name='payment_borrower_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['borrower', 'status'], name='payment_borrower_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(fields=['borrower', 'due_date'], name='schedule_borrower_due_idx'),
+        ),
+    ]
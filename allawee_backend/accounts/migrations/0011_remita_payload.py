@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COPY_BATCH_SIZE = 1000
+
+
+def move_payloads(apps, schema_editor):
+    Payment = apps.get_model('accounts', 'Payment')
+    RemitaTransaction = apps.get_model('accounts', 'RemitaTransaction')
+    RemitaPayload = apps.get_model('accounts', 'RemitaPayload')
+    sources = (
+        (Payment, 'remita_response', 'payment_id'),
+        (RemitaTransaction, 'response_data', 'transaction_id'),
+    )
+    for model, field, owner in sources:
+        rows = model.objects.filter(**{f'{field}__isnull': False}).values_list('pk', field)
+        batch = []
+        for pk, data in rows.iterator(chunk_size=COPY_BATCH_SIZE):
+            batch.append(RemitaPayload(data=data, **{owner: pk}))
+            if len(batch) >= COPY_BATCH_SIZE:
+                RemitaPayload.objects.bulk_create(batch)
+                batch = []
+        RemitaPayload.objects.bulk_create(batch)
+
+
+def restore_payloads(apps, schema_editor):
+    Payment = apps.get_model('accounts', 'Payment')
+    RemitaTransaction = apps.get_model('accounts', 'RemitaTransaction')
+    RemitaPayload = apps.get_model('accounts', 'RemitaPayload')
+    for payload in RemitaPayload.objects.iterator(chunk_size=COPY_BATCH_SIZE):
+        if payload.payment_id:
+            Payment.objects.filter(pk=payload.payment_id).update(remita_response=payload.data)
+        else:
+            RemitaTransaction.objects.filter(pk=payload.transaction_id).update(response_data=payload.data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_borrower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemitaPayload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payment', models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='remita_payload', to='accounts.payment')),
+                ('transaction', models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payload', to='accounts.remitatransaction')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('payment__isnull', False), ('transaction__isnull', True)), models.Q(('payment__isnull', True), ('transaction__isnull', False)), _connector='OR'), name='remita_payload_one_owner')],
+            },
+        ),
+        migrations.RunPython(move_payloads, restore_payloads),
+        migrations.RemoveField(
+            model_name='payment',
+            name='remita_response',
+        ),
+        migrations.RemoveField(
+            model_name='remitatransaction',
+            name='response_data',
+        ),
+    ]
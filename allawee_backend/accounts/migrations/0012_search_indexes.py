@@ -0,0 +1,67 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:30
+
+from django.db import migrations
+
+# Postgres: trigram GIN indexes on the expressions Django's icontains lookup
+# compiles to (UPPER(col::text) LIKE UPPER('%term%')), so the existing
+# search_fields queries stop sequential scanning.
+TRIGRAM_COLUMNS = [
+    ('profile_name_trgm_idx', 'full_name'),
+    ('profile_phone_trgm_idx', 'phone_number'),
+    ('profile_bvn_trgm_idx', 'bvn'),
+]
+
+# SQLite: external-content FTS5 table over the same columns. The trigram
+# tokenizer gives substring matching like the Postgres indexes.
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS accounts_userprofile_fts USING fts5("
+    "full_name, phone_number, bvn, content='accounts_userprofile', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS accounts_userprofile_fts_ai AFTER INSERT ON accounts_userprofile BEGIN "
+    "INSERT INTO accounts_userprofile_fts(rowid, full_name, phone_number, bvn) "
+    "VALUES (new.id, new.full_name, new.phone_number, new.bvn); END",
+    "CREATE TRIGGER IF NOT EXISTS accounts_userprofile_fts_ad AFTER DELETE ON accounts_userprofile BEGIN "
+    "INSERT INTO accounts_userprofile_fts(accounts_userprofile_fts, rowid, full_name, phone_number, bvn) "
+    "VALUES ('delete', old.id, old.full_name, old.phone_number, old.bvn); END",
+    "CREATE TRIGGER IF NOT EXISTS accounts_userprofile_fts_au AFTER UPDATE ON accounts_userprofile BEGIN "
+    "INSERT INTO accounts_userprofile_fts(accounts_userprofile_fts, rowid, full_name, phone_number, bvn) "
+    "VALUES ('delete', old.id, old.full_name, old.phone_number, old.bvn); "
+    "INSERT INTO accounts_userprofile_fts(rowid, full_name, phone_number, bvn) "
+    "VALUES (new.id, new.full_name, new.phone_number, new.bvn); END",
+    "INSERT INTO accounts_userprofile_fts(accounts_userprofile_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, column in TRIGRAM_COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON accounts_userprofile "
+                f"USING gin (UPPER({column}::text) gin_trgm_ops)"
+            )
+    elif vendor == 'sqlite':
+        for statement in SQLITE_FTS:
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, _ in TRIGRAM_COLUMNS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS accounts_userprofile_fts_{suffix}")
+        schema_editor.execute("DROP TABLE IF EXISTS accounts_userprofile_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_remita_payload'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemitaWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('payment', 'Payment'), ('mandate', 'Mandate')], max_length=20)),
+                ('remita_rrr', models.CharField(blank=True, max_length=100)),
+                ('transaction_id', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, choices=[('applied', 'Applied'), ('ignored', 'Ignored'), ('failed', 'Failed')], max_length=20)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='remita_event_unprocessed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('remita_rrr', 'transaction_id'), name='remita_event_dedupe')],
+            },
+        ),
+    ]
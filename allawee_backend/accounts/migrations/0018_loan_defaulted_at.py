@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_defaulted_at(apps, schema_editor):
+    # The real default date was never recorded; the last update is the closest one
+    Loan = apps.get_model('accounts', 'Loan')
+    Loan.objects.filter(status='defaulted', defaulted_at__isnull=True).update(defaulted_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_bulk_action_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='defaulted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_defaulted_at, migrations.RunPython.noop),
+    ]
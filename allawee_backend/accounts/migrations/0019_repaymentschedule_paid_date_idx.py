@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_loan_defaulted_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repaymentschedule',
+            index=models.Index(condition=models.Q(('is_paid', True)), fields=['payment_date'], name='schedule_paid_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:26
+
+import accounts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_repaymentschedule_paid_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dataexport',
+            name='file',
+            field=models.FileField(blank=True, storage=accounts.storage.ExportStorage(), upload_to=accounts.storage.export_upload_to),
+        ),
+    ]
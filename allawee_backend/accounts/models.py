@@ -4,6 +4,8 @@ from decimal import Decimal
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .storage import ExportStorage, export_upload_to
+
 def user_certificate_path(instance, filename):
     # File will be uploaded to MEDIA_ROOT/certificates/user_<id>/<filename>
     return f'certificates/user_{instance.user.id}/{filename}'
@@ -30,6 +32,13 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['phone_number'], name='profile_phone_idx'),
+            models.Index(fields=['bvn'], name='profile_bvn_idx'),
+            models.Index(fields=['-created_at'], name='profile_created_idx'),
+        ]
+
     def __str__(self):
         return self.full_name
 
@@ -88,6 +97,17 @@ class LoanApplication(models.Model):
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='reviewed_applications')
     review_comments = models.TextField(blank=True)
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['applicant', 'status'], name='loanapp_applicant_status_idx'),
+            models.Index(fields=['applicant', '-application_date'], name='loanapp_applicant_date_idx'),
+            models.Index(fields=['status', 'application_date'], name='loanapp_status_date_idx'),
+            models.Index(fields=['application_date'], name='loanapp_date_idx'),
+            models.Index(fields=['applicant', 'updated_at'], name='loanapp_applicant_updated_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
         if not self.application_id:
             # Generate unique application ID
@@ -107,6 +127,9 @@ class Loan(models.Model):
     ]
     
     application = models.OneToOneField(LoanApplication, on_delete=models.CASCADE, related_name='loan')
+    # Copy of application.applicant so per-borrower queries stay on one table.
+    # Indexed through the composite indexes below; see accounts/consistency.py
+    borrower = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='loans', null=True, editable=False, db_index=False)
     loan_id = models.CharField(max_length=20, unique=True)
     
     # Loan Details
@@ -119,6 +142,8 @@ class Loan(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     disbursement_date = models.DateTimeField()
     maturity_date = models.DateField()
+    # When the loan was last marked defaulted, so portfolio snapshots can be backfilled
+    defaulted_at = models.DateTimeField(blank=True, null=True)
     
     # Payment Tracking
     total_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
@@ -131,12 +156,23 @@ class Loan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='loan_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='loan_status_created_idx'),
+            models.Index(fields=['disbursement_date'], name='loan_disbursement_idx'),
+            models.Index(fields=['borrower', '-created_at'], name='loan_borrower_created_idx'),
+            models.Index(fields=['borrower', 'updated_at'], name='loan_borrower_updated_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
         if not self.loan_id:
             import uuid
             self.loan_id = f"LN{str(uuid.uuid4())[:8].upper()}"
+        if self.borrower_id is None:
+            self.borrower_id = self.application.applicant_id
         if self.pk:
-            total_paid = self.payments.aggregate(total=models.Sum('amount'))['total'] or 0
+            total_paid = self.payments.filter(status='successful').aggregate(total=models.Sum('amount'))['total'] or 0
             self.outstanding_balance = self.total_amount - total_paid
         else:
             self.outstanding_balance = self.total_amount
@@ -145,15 +181,6 @@ class Loan(models.Model):
     def __str__(self):
         return f"{self.loan_id} - {self.application.applicant.full_name}"
 
-    def check_and_close(self):
-        total_paid = self.payments.aggregate(total=models.Sum('amount'))['total'] or 0
-        self.outstanding_balance = self.total_amount - total_paid
-        if total_paid >= self.total_amount and self.status != 'closed':
-            self.status = 'closed'
-            self.outstanding_balance = 0
-        self.save()
-        # Optionally, notify user/admin here
-        # NOTE: Call this method after each repayment
 class Payment(models.Model):
     PAYMENT_METHODS = [
         ('remita_auto', 'Remita Auto Deduction'),
@@ -170,6 +197,7 @@ class Payment(models.Model):
     ]
     
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='payments')
+    borrower = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='payments', null=True, editable=False, db_index=False)
     payment_id = models.CharField(max_length=20, unique=True)
     
     # Payment Details
@@ -184,27 +212,64 @@ class Payment(models.Model):
     # Remita Fields
     remita_rrr = models.CharField(max_length=100, blank=True, null=True)
     remita_transaction_id = models.CharField(max_length=100, blank=True, null=True)
-    remita_response = models.JSONField(blank=True, null=True)
+    # The raw gateway response lives in RemitaPayload (see remita_response)
     
     # Additional Info
     reference = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='payment_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+            models.Index(fields=['status', 'payment_date'], name='payment_status_date_idx'),
+            models.Index(fields=['payment_date'], name='payment_date_idx'),
+            models.Index(fields=['loan', 'status'], name='payment_loan_status_idx'),
+            models.Index(fields=['remita_rrr'], name='payment_rrr_idx'),
+            models.Index(fields=['borrower', '-created_at'], name='payment_borrower_created_idx'),
+            models.Index(fields=['borrower', 'status'], name='payment_borrower_status_idx'),
+            models.Index(fields=['borrower', 'updated_at'], name='payment_borrower_updated_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.payment_id:
             import uuid
             self.payment_id = f"PY{str(uuid.uuid4())[:8].upper()}"
+        if self.borrower_id is None:
+            self.borrower_id = self.loan.borrower_id
+        # Balances and loan closure are applied under the loan's row lock: pending
+        # payments by posting.post_loan_payments, anything saved as (or out of)
+        # successful here by posting.rebalance_loan
+        if self._state.adding:
+            rebalance = self.status == 'successful'
+        else:
+            previous = Payment.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+            rebalance = (previous == 'successful') != (self.status == 'successful')
         super().save(*args, **kwargs)
-        if self.loan:
-            self.loan.check_and_close()
+        if rebalance:
+            from .posting import rebalance_loan
+            rebalance_loan(self.loan_id, (self.pk, self.payment_date) if self.status == 'successful' else None)
+    
+    @property
+    def remita_response(self):
+        """Raw Remita response; one extra query unless fetched with select_related('remita_payload')"""
+        try:
+            return self.remita_payload.data
+        except RemitaPayload.DoesNotExist:
+            return None
+    
+    def store_remita_response(self, data):
+        RemitaPayload.objects.update_or_create(payment=self, defaults={'data': data})
     
     def __str__(self):
         return f"{self.payment_id} - ₦{self.amount}"
 
 class RepaymentSchedule(models.Model):
     loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='repayment_schedule')
+    borrower = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='repayment_installments', null=True, editable=False, db_index=False)
     installment_number = models.IntegerField()
     due_date = models.DateField()
     principal_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -214,13 +279,31 @@ class RepaymentSchedule(models.Model):
     # Payment Status
     is_paid = models.BooleanField(default=False)
     payment_date = models.DateTimeField(blank=True, null=True)
-    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, blank=True, null=True)
+    # No DB-level constraint: accounts_payment is range-partitioned on Postgres,
+    # so its primary key includes payment_date and cannot be referenced by id alone
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, blank=True, null=True, db_constraint=False)
     
     # Late Payment Tracking
     is_overdue = models.BooleanField(default=False)
     days_overdue = models.IntegerField(default=0)
     late_fee = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['loan', 'installment_number'], name='schedule_loan_installment_idx'),
+            models.Index(fields=['due_date'], name='schedule_unpaid_due_idx', condition=models.Q(is_paid=False)),
+            models.Index(fields=['payment_date'], name='schedule_paid_date_idx', condition=models.Q(is_paid=True)),
+            models.Index(fields=['borrower', 'due_date'], name='schedule_borrower_due_idx'),
+            models.Index(fields=['borrower', 'updated_at'], name='schedule_borrower_updated_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.borrower_id is None:
+            self.borrower_id = self.loan.borrower_id
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.loan.loan_id} - Installment {self.installment_number}"
 
@@ -241,11 +324,232 @@ class RemitaTransaction(models.Model):
     
     # Remita Response Data
     status = models.CharField(max_length=50)
-    response_data = models.JSONField()
+    # The raw gateway response lives in RemitaPayload (see response_data)
     
     # Timestamps
     initiated_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['remita_rrr'], name='remita_txn_rrr_idx'),
+            models.Index(fields=['initiated_at'], name='remita_txn_initiated_idx'),
+        ]
+    
+    @property
+    def response_data(self):
+        """Raw Remita response; one extra query unless fetched with select_related('payload')"""
+        try:
+            return self.payload.data
+        except RemitaPayload.DoesNotExist:
+            return None
+    
+    def store_response_data(self, data):
+        RemitaPayload.objects.update_or_create(transaction=self, defaults={'data': data})
+    
     def __str__(self):
         return f"{self.transaction_type} - {self.remita_rrr}"
+
+
+class RemitaPayload(models.Model):
+    """
+    Raw Remita gateway response for one payment or one Remita transaction.
+    Kept out of accounts_payment / accounts_remitatransaction so list queries
+    and scans over those tables never read the JSON.
+    """
+    # No DB-level constraints: both parent tables are range-partitioned on Postgres
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, blank=True, null=True, related_name='remita_payload', db_constraint=False)
+    transaction = models.OneToOneField(RemitaTransaction, on_delete=models.CASCADE, blank=True, null=True, related_name='payload', db_constraint=False)
+    data = models.JSONField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(payment__isnull=False, transaction__isnull=True) | models.Q(payment__isnull=True, transaction__isnull=False),
+                name='remita_payload_one_owner',
+            ),
+        ]
+    
+    def __str__(self):
+        owner = f"payment {self.payment_id}" if self.payment_id else f"transaction {self.transaction_id}"
+        return f"Remita payload for {owner}"
+
+
+class PortfolioSnapshot(models.Model):
+    """End-of-day portfolio figures, built incrementally from the previous day's row."""
+    snapshot_date = models.DateField(unique=True)
+    
+    # Book
+    outstanding_principal = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    defaulted_loans = models.IntegerField(default=0)
+    
+    # Portfolio at risk (outstanding principal of loans with an installment overdue by N+ days)
+    par1_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    par1_loans = models.IntegerField(default=0)
+    par30_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    par30_loans = models.IntegerField(default=0)
+    par90_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    par90_loans = models.IntegerField(default=0)
+    
+    # Flows for the day
+    disbursed_count = models.IntegerField(default=0)
+    disbursed_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    collections_count = models.IntegerField(default=0)
+    collections_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    
+    # Running totals
+    cumulative_disbursed = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    cumulative_collected = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-snapshot_date']
+    
+    def __str__(self):
+        return f"Portfolio {self.snapshot_date}"
+
+class LoanArchive(models.Model):
+    """A closed loan moved out of the hot tables with its payments, schedule and Remita rows."""
+    loan_id = models.CharField(max_length=20, unique=True)
+    applicant = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='archived_loans')
+    status = models.CharField(max_length=20)
+    principal_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    disbursement_date = models.DateTimeField()
+    closed_at = models.DateTimeField()
+    payment_count = models.IntegerField(default=0)
+    
+    # zlib-compressed JSON of the serialized rows, see accounts/archival.py
+    payload = models.BinaryField()
+    
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.loan_id} (archived)"
+
+class SyncTombstone(models.Model):
+    """A deleted loan, payment, installment or application, reported by the delta sync (accounts/sync.py)."""
+    # No DB-level constraint: tombstones outlive the rows and may outlive the profile
+    borrower = models.ForeignKey(UserProfile, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False, db_index=False)
+    entity = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['borrower', 'deleted_at'], name='tombstone_borrower_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.entity} {self.object_id} deleted"
+
+class RemitaWebhookEvent(models.Model):
+    """
+    Raw Remita notification, appended by the webhook and applied later by
+    accounts.tasks.process_remita_events (see accounts/webhooks.py). The
+    payload is never modified; consumers only stamp processed_at/outcome.
+    """
+    EVENT_TYPES = [
+        ('payment', 'Payment'),
+        ('mandate', 'Mandate'),
+    ]
+    
+    OUTCOMES = [
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    remita_rrr = models.CharField(max_length=100, blank=True)
+    transaction_id = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now)
+    
+    processed_at = models.DateTimeField(blank=True, null=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOMES, blank=True)
+    detail = models.CharField(max_length=255, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['remita_rrr', 'transaction_id'], name='remita_event_dedupe'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], name='remita_event_unprocessed_idx', condition=models.Q(processed_at__isnull=True)),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.remita_rrr or self.transaction_id}"
+
+class DataExport(models.Model):
+    """A background export of loans, payments or schedules to a file (see accounts/exports.py)."""
+    EXPORTS = [
+        ('loans', 'Loans'),
+        ('payments', 'Payments'),
+        ('schedules', 'Repayment Schedules'),
+    ]
+    
+    FORMATS = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    export = models.CharField(max_length=20, choices=EXPORTS)
+    format = models.CharField(max_length=10, choices=FORMATS, default='csv')
+    compress = models.BooleanField(default=False)
+    filters = models.JSONField(default=dict, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to=export_upload_to, storage=ExportStorage(), blank=True)
+    row_count = models.IntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='data_exports')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.export}.{self.format} ({self.status})"
+
+class BulkActionJob(models.Model):
+    """An admin bulk action over a large selection, applied in chunks by a background task (see accounts/bulk_actions.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    action = models.CharField(max_length=50)
+    object_ids = models.JSONField(default=list)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    changed = models.IntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+    
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='bulk_action_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    @property
+    def percent_done(self):
+        return round(self.processed * 100 / self.total) if self.total else 100
+    
+    def __str__(self):
+        return f"{self.action} x{self.total} ({self.status})"
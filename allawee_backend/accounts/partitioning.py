@@ -0,0 +1,179 @@
+"""
+Monthly range partitions for the append-mostly tables (Postgres only)
+
+Migration 0008 converts accounts_payment (by payment_date) and
+accounts_remitatransaction (by initiated_at) into partitioned tables. This
+module keeps future partitions ahead of the clock and detaches old ones into
+the archive schema, so the live indexes only ever cover recent months.
+Everything here is a no-op on other backends.
+"""
+
+from datetime import date
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = {
+    'accounts_payment': 'payment_date',
+    'accounts_remitatransaction': 'initiated_at',
+}
+
+# Table -> (column, referenced live table). A partition is only archived once
+# none of its rows point at a live row, see archive_partitions()
+ARCHIVE_GUARDS = {
+    'accounts_payment': ('loan_id', 'accounts_loan'),
+}
+
+ARCHIVE_SCHEMA = 'archive'
+DEFAULT_DETACH_LOCK_TIMEOUT = '5s'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month.year}_{month.month:02d}"
+
+
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_partition(cursor, table, month):
+    """Create the partition holding [month, next month) if it does not exist."""
+    quote = connection.ops.quote_name
+    name = partition_name(table, month)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [month.isoformat(), add_months(month, 1).isoformat()],
+    )
+    return name
+
+
+def list_partitions(table):
+    """Return [(partition_name, lower_bound_month)] for monthly partitions of table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s AND p.relnamespace = current_schema()::regnamespace",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    prefix = f"{table}_p"
+    for name in names:
+        if not name.startswith(prefix):
+            continue  # default partition
+        year, month = name[len(prefix):].split('_')
+        partitions.append((name, date(int(year), int(month), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def ensure_future_partitions(months_ahead=3, today=None):
+    """
+    Make sure partitions exist from the current month through months_ahead
+    months in the future. Returns the names of partitions created or kept.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    current = month_start(today or timezone.localdate())
+    ensured = []
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(table):
+                continue
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                try:
+                    with transaction.atomic():
+                        ensured.append(create_partition(cursor, table, month))
+                except DatabaseError as exc:
+                    # Usually rows for that month already landed in the default partition
+                    logger.error(f"Could not create {partition_name(table, month)}: {exc}")
+    return ensured
+
+
+def has_live_rows(cursor, table, partition):
+    """True when a row of the partition still belongs to a live row of the guarded table."""
+    if table not in ARCHIVE_GUARDS:
+        return False
+    quote = connection.ops.quote_name
+    column, live_table = ARCHIVE_GUARDS[table]
+    cursor.execute(
+        f"SELECT 1 FROM {quote(partition)} p WHERE EXISTS "
+        f"(SELECT 1 FROM {quote(live_table)} l WHERE l.id = p.{quote(column)}) LIMIT 1"
+    )
+    return cursor.fetchone() is not None
+
+
+def archive_partitions(older_than_months, today=None):
+    """
+    Detach monthly partitions that end more than older_than_months ago and move
+    them to the archive schema, where they stay queryable but outside the live
+    table and its indexes. Returns the qualified names of archived tables.
+
+    Archived rows are invisible to the ORM, so a Loan whose payments were
+    archived would lose them the next time its balance is re-aggregated. A
+    payment partition is therefore skipped while any of its payments belongs
+    to a loan still in accounts_loan; archival.archive_closed_loans moves those
+    loans out first.
+
+    The parent keeps a DEFAULT partition, which rules out DETACH ...
+    CONCURRENTLY. The plain DETACH takes an exclusive lock on the parent, so
+    it runs under PARTITION_DETACH_LOCK_TIMEOUT and a partition whose lock
+    cannot be had in time is left for the next run. Each partition is
+    detached in its own transaction, so this must not run inside another one.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    if connection.in_atomic_block:
+        raise RuntimeError("Partition archival must not run inside a transaction")
+
+    quote = connection.ops.quote_name
+    lock_timeout = getattr(settings, 'PARTITION_DETACH_LOCK_TIMEOUT', DEFAULT_DETACH_LOCK_TIMEOUT)
+    cutoff = add_months(month_start(today or timezone.localdate()), -older_than_months)
+    archived = []
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(ARCHIVE_SCHEMA)}")
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(table):
+                continue
+            for name, month in list_partitions(table):
+                if add_months(month, 1) > cutoff:
+                    continue
+                if has_live_rows(cursor, table, name):
+                    logger.warning(f"Not archiving {name}: it still references live rows in {ARCHIVE_GUARDS[table][1]}")
+                    continue
+                try:
+                    with transaction.atomic():
+                        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [lock_timeout])
+                        cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+                        cursor.execute(f"ALTER TABLE {quote(name)} SET SCHEMA {quote(ARCHIVE_SCHEMA)}")
+                except DatabaseError as exc:
+                    logger.warning(f"Could not archive {name} of {table}, retrying next run: {exc}")
+                    continue
+                archived.append(f"{ARCHIVE_SCHEMA}.{name}")
+                logger.info(f"Archived partition {name} of {table}")
+    return archived
@@ -0,0 +1,128 @@
+"""
+Daily portfolio snapshots for AllaweePlus - risk and flow figures per day
+
+Each snapshot scans the day's own disbursements and collections, and
+recomputes the book totals as of the end of the day from the source tables,
+so a payment backdated or posted after a snapshot was built is picked up the
+next time that day (or any later one) is built. Loans that were closed,
+completed or written off (by their updated_at) or defaulted (by defaulted_at)
+before the end of the day are out of the outstanding book.
+Portfolio-at-risk is evaluated as of the snapshot date using
+installment due dates (the same figure update_overdue_payments stores in
+RepaymentSchedule.days_overdue), so past days can be backfilled. The
+installments are marked paid by posting.post_loan_payments, and defaulted
+loans are counted by Loan.defaulted_at. A loan that has since left the
+defaulted status is not counted for earlier days.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Loan, Payment, PortfolioSnapshot, RepaymentSchedule
+
+PAR_BUCKETS = (1, 30, 90)
+
+ENDED_STATUSES = ('closed', 'completed', 'written_off')
+
+ZERO = Decimal('0.00')
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _unpaid_as_of(end):
+    """
+    Installments still unpaid at the given instant. Each arm matches a partial
+    index (schedule_unpaid_due_idx, schedule_paid_date_idx) so the planner
+    can BitmapOr them instead of scanning the table.
+    """
+    return Q(is_paid=False) | Q(is_paid=True, payment_date__gte=end)
+
+
+def _portfolio_at_risk(day, end, days):
+    at_risk_loans = RepaymentSchedule.objects.filter(
+        _unpaid_as_of(end), due_date__lte=day - timedelta(days=days)
+    ).values('loan_id')
+    result = RepaymentSchedule.objects.filter(
+        _unpaid_as_of(end), loan_id__in=at_risk_loans
+    ).aggregate(amount=Sum('principal_amount'), loans=Count('loan_id', distinct=True))
+    return result['amount'] or ZERO, result['loans']
+
+
+def _outstanding_book(end):
+    """Loans disbursed before end that had not ended or defaulted by then."""
+    return Loan.objects.filter(disbursement_date__lt=end).exclude(
+        Q(status__in=ENDED_STATUSES, updated_at__lt=end) | Q(status='defaulted', defaulted_at__lt=end)
+    )
+
+
+def _outstanding_principal(end):
+    book = _outstanding_book(end)
+    principal = book.aggregate(total=Sum('principal_amount'))['total'] or ZERO
+    repaid = RepaymentSchedule.objects.filter(
+        is_paid=True, payment_date__lt=end, loan__in=book.values('pk')
+    ).aggregate(total=Sum('principal_amount'))['total'] or ZERO
+    return principal - repaid
+
+
+def build_portfolio_snapshot(day):
+    """Compute and store the snapshot for the given date."""
+    start, end = _day_bounds(day)
+
+    disbursed = Loan.objects.filter(
+        disbursement_date__gte=start, disbursement_date__lt=end
+    ).aggregate(count=Count('id'), amount=Sum('principal_amount'))
+    collected = Payment.objects.filter(
+        status='successful', payment_date__gte=start, payment_date__lt=end
+    ).aggregate(count=Count('id'), amount=Sum('amount'))
+    cumulative_disbursed = Loan.objects.filter(
+        disbursement_date__lt=end
+    ).aggregate(total=Sum('principal_amount'))['total'] or ZERO
+    cumulative_collected = Payment.objects.filter(
+        status='successful', payment_date__lt=end
+    ).aggregate(total=Sum('amount'))['total'] or ZERO
+
+    values = {
+        'outstanding_principal': max(_outstanding_principal(end), ZERO),
+        'defaulted_loans': Loan.objects.filter(status='defaulted', defaulted_at__lt=end).count(),
+        'disbursed_count': disbursed['count'],
+        'disbursed_amount': disbursed['amount'] or ZERO,
+        'collections_count': collected['count'],
+        'collections_amount': collected['amount'] or ZERO,
+        'cumulative_disbursed': cumulative_disbursed,
+        'cumulative_collected': cumulative_collected,
+    }
+    for days in PAR_BUCKETS:
+        amount, loans = _portfolio_at_risk(day, end, days)
+        values[f'par{days}_amount'] = amount
+        values[f'par{days}_loans'] = loans
+
+    snapshot, _ = PortfolioSnapshot.objects.update_or_create(snapshot_date=day, defaults=values)
+    return snapshot
+
+
+def backfill_portfolio_snapshots(start_date, end_date, rebuild=False):
+    """
+    Build snapshots for every day in [start_date, end_date]. Existing rows
+    are kept unless rebuild.
+    Returns the number of snapshots written.
+    """
+    existing = set()
+    if not rebuild:
+        existing = set(PortfolioSnapshot.objects.filter(
+            snapshot_date__gte=start_date, snapshot_date__lte=end_date
+        ).values_list('snapshot_date', flat=True))
+
+    written = 0
+    day = start_date
+    while day <= end_date:
+        if day not in existing:
+            build_portfolio_snapshot(day)
+            written += 1
+        day += timedelta(days=1)
+    return written
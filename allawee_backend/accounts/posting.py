@@ -0,0 +1,144 @@
+"""
+Payment posting for AllaweePlus - applies pending payments to loan balances
+
+Payments are grouped by loan so that each loan row is locked once per batch,
+every pending payment for it is applied, and the balance/status is written back
+in a single UPDATE. Payments saved as successful outside the worker are
+rebalanced through the same locked path (rebalance_loan). Installments covered by the new total are marked paid in
+installment order. Locks are always taken in loan id order to avoid deadlocks
+between concurrent workers.
+"""
+
+from collections import OrderedDict
+from decimal import Decimal
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .bootstrap import invalidate_user_sections
+from .models import Loan, Payment, RepaymentSchedule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POSTING_BATCH_SIZE = 500
+
+
+def _mark_installments_paid(loan_id, total_paid, last_payment, now):
+    """Mark the unpaid installments that total_paid now covers, oldest first."""
+    already_paid = RepaymentSchedule.objects.filter(
+        loan_id=loan_id, is_paid=True
+    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    available = total_paid - already_paid
+
+    covered = []
+    unpaid = RepaymentSchedule.objects.filter(loan_id=loan_id, is_paid=False).order_by('installment_number')
+    for pk, amount in unpaid.values_list('pk', 'total_amount'):
+        if amount > available:
+            break
+        available -= amount
+        covered.append(pk)
+
+    if covered:
+        payment_id, paid_at = last_payment
+        RepaymentSchedule.objects.filter(pk__in=covered).update(
+            is_paid=True, payment_date=paid_at, payment_id=payment_id, updated_at=now
+        )
+
+
+def _apply_balance(loan, last_payment, now):
+    """Re-aggregate a locked loan's successful payments into its balance and status."""
+    total_paid = Payment.objects.filter(
+        loan_id=loan.pk, status='successful'
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    outstanding_balance = loan.total_amount - total_paid
+    status = loan.status
+    if outstanding_balance <= 0:
+        status = 'closed'
+        outstanding_balance = Decimal('0.00')
+
+    Loan.objects.filter(pk=loan.pk).update(
+        total_paid=total_paid,
+        outstanding_balance=outstanding_balance,
+        status=status,
+        updated_at=now,
+    )
+    if last_payment is not None:
+        _mark_installments_paid(loan.pk, total_paid, last_payment, now)
+
+
+def _invalidate(loan):
+    cache.delete(f"loan_repayment_schedule_{loan.pk}")
+    invalidate_user_sections(loan.borrower_id)
+
+
+def post_loan_payments(loan_id, payment_ids=None):
+    """
+    Post pending payments for a single loan under a row lock.
+
+    If payment_ids is given only those payments are posted, otherwise every
+    pending payment on the loan is. Returns the number of payments posted.
+    """
+    with transaction.atomic():
+        loan = Loan.objects.select_for_update().get(pk=loan_id)
+
+        pending = Payment.objects.select_for_update().filter(loan_id=loan_id, status='pending')
+        if payment_ids is not None:
+            pending = pending.filter(pk__in=payment_ids)
+        rows = list(pending.order_by('payment_date', 'pk').values_list('pk', 'payment_date'))
+        if not rows:
+            return 0
+        batch = [pk for pk, _ in rows]
+        now = timezone.now()
+
+        # Queryset update skips Payment.save(), which would rebalance per payment
+        Payment.objects.filter(pk__in=batch).update(status='successful', updated_at=now)
+        _apply_balance(loan, rows[-1], now)
+
+    _invalidate(loan)
+    return len(batch)
+
+
+def rebalance_loan(loan_id, last_payment=None):
+    """
+    Re-aggregate a loan's balance under its row lock.
+
+    Payment.save() calls this when a payment is saved as successful, or
+    moved out of successful, outside the posting worker (admin edits,
+    imports), so those payments go through the same locked path.
+    last_payment is (pk, payment_date) of a newly successful payment.
+    """
+    with transaction.atomic():
+        loan = Loan.objects.select_for_update().get(pk=loan_id)
+        _apply_balance(loan, last_payment, timezone.now())
+    _invalidate(loan)
+
+
+def post_pending_payments(batch_size=DEFAULT_POSTING_BATCH_SIZE):
+    """
+    Post up to batch_size pending payments, coalesced by loan.
+
+    Returns a dict with the number of loans touched and payments posted.
+    """
+    rows = Payment.objects.filter(status='pending').order_by('loan_id', 'pk').values_list(
+        'pk', 'loan_id'
+    )[:batch_size]
+
+    by_loan = OrderedDict()
+    for payment_id, loan_id in rows:
+        by_loan.setdefault(loan_id, []).append(payment_id)
+
+    posted = 0
+    for loan_id, payment_ids in by_loan.items():
+        try:
+            posted += post_loan_payments(loan_id, payment_ids)
+        except Loan.DoesNotExist:
+            logger.warning(f"Skipping payments {payment_ids}: loan {loan_id} no longer exists")
+
+    if posted:
+        cache.delete("payment_analytics")
+        cache.delete("dashboard_overview")
+
+    return {'loans': len(by_loan), 'payments': posted}
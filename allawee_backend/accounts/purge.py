@@ -0,0 +1,84 @@
+"""
+Chunked purge of expired authentication rows
+
+Deletes expired DRF tokens, SimpleJWT outstanding/blacklisted tokens and
+database sessions in primary-key order, a small batch per transaction with
+a pause in between, so the auth tables are never held by one large DELETE.
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_PAUSE_SECONDS = 0.2
+
+
+def delete_in_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE_SECONDS):
+    """
+    Delete every row of queryset, chunk_size rows per transaction, walking the
+    primary key upwards. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        last_pk = pks[-1]
+        if len(pks) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def purge_expired_auth_rows(chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE_SECONDS, now=None):
+    """
+    Purge expired auth rows from every store that is in use.
+
+    Returns a dict of table label -> rows deleted.
+    """
+    now = now or timezone.now()
+    report = {}
+
+    if apps.is_installed('rest_framework.authtoken'):
+        from rest_framework.authtoken.models import Token
+        max_age = timedelta(days=getattr(settings, 'AUTH_TOKEN_MAX_AGE_DAYS', 30))
+        report['authtoken.Token'] = delete_in_chunks(
+            Token.objects.filter(created__lt=now - max_age), chunk_size, pause
+        )
+
+    if apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        # Blacklist rows first so the outstanding delete does not cascade into them
+        report['token_blacklist.BlacklistedToken'] = delete_in_chunks(
+            BlacklistedToken.objects.filter(token__expires_at__lt=now), chunk_size, pause
+        )
+        report['token_blacklist.OutstandingToken'] = delete_in_chunks(
+            OutstandingToken.objects.filter(expires_at__lt=now), chunk_size, pause
+        )
+
+    if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.db':
+        from django.contrib.sessions.models import Session
+        report['sessions.Session'] = delete_in_chunks(
+            Session.objects.filter(expire_date__lt=now), chunk_size, pause
+        )
+
+    for label, count in report.items():
+        logger.info(f"Purged {count} expired rows from {label}")
+    return report
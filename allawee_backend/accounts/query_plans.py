@@ -0,0 +1,84 @@
+"""
+Expected query plans for the accounts indexes
+
+Each entry pairs a hot query with the Meta.indexes entry it should use. The
+check runs EXPLAIN for each one; on Postgres sequential scans are disabled
+for the check so a small or empty table still shows whether the index is
+usable at all.
+"""
+
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import LoanApplication, Loan, Payment, RepaymentSchedule, RemitaTransaction, UserProfile
+
+
+def expected_plans():
+    today = timezone.localdate()
+    month_ago = timezone.now() - timedelta(days=30)
+    return [
+        ('applications by applicant and status',
+         LoanApplication.objects.filter(applicant_id=1, status='pending'),
+         'loanapp_applicant_status_idx'),
+        ('applications for applicant, newest first',
+         LoanApplication.objects.filter(applicant_id=1).order_by('-application_date'),
+         'loanapp_applicant_date_idx'),
+        ('review queue by status and date',
+         LoanApplication.objects.filter(status='pending', application_date__gte=month_ago),
+         'loanapp_status_date_idx'),
+        ('active loans by creation date',
+         Loan.objects.filter(status='active', created_at__gte=month_ago),
+         'loan_status_created_idx'),
+        ('recent payments by status',
+         Payment.objects.filter(status='successful', created_at__gte=month_ago),
+         'payment_status_created_idx'),
+        ('collections by payment date',
+         Payment.objects.filter(status='successful', payment_date__gte=month_ago),
+         'payment_status_date_idx'),
+        ('successful payments on a loan',
+         Payment.objects.filter(loan_id=1, status='successful'),
+         'payment_loan_status_idx'),
+        ('payments for a borrower, newest first',
+         Payment.objects.filter(borrower_id=1).order_by('-created_at'),
+         'payment_borrower_created_idx'),
+        ('successful payments for a borrower',
+         Payment.objects.filter(borrower_id=1, status='successful'),
+         'payment_borrower_status_idx'),
+        ('loans for a borrower, newest first',
+         Loan.objects.filter(borrower_id=1).order_by('-created_at'),
+         'loan_borrower_created_idx'),
+        ('next installment for a borrower',
+         RepaymentSchedule.objects.filter(borrower_id=1, is_paid=False).order_by('due_date'),
+         'schedule_borrower_due_idx'),
+        ('payment by RRR',
+         Payment.objects.filter(remita_rrr='000000000000'),
+         'payment_rrr_idx'),
+        ('Remita transaction by RRR',
+         RemitaTransaction.objects.filter(remita_rrr='000000000000'),
+         'remita_txn_rrr_idx'),
+        ('unpaid installments due',
+         RepaymentSchedule.objects.filter(is_paid=False, due_date__lte=today),
+         'schedule_unpaid_due_idx'),
+        ('profile by phone number',
+         UserProfile.objects.filter(phone_number='08000000000'),
+         'profile_phone_idx'),
+    ]
+
+
+def check_query_plans(using='default'):
+    """
+    EXPLAIN every expected query. Returns a list of
+    (description, expected_index, plan_text, uses_index).
+    """
+    connection = connections[using]
+    results = []
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for description, queryset, index in expected_plans():
+            plan = queryset.using(using).explain()
+            results.append((description, index, plan, index in plan))
+    return results
@@ -0,0 +1,142 @@
+"""
+Loan quotes for AllaweePlus
+
+Prices every active product x tenure x amount combination in one NumPy
+broadcast, so the mobile app can call it on every slider movement.
+
+Pricing matches the loan application screen:
+  total_interest  = amount * interest_rate% * tenure_months   (simple, per month)
+  total_repayable = amount + total_interest
+  monthly_payment = total_repayable / tenure_months
+  processing_fee  = amount * processing_fee_percentage%        (upfront)
+Combinations outside a product's amount range or max tenure come back as None.
+"""
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+import numpy as np
+
+from .models import LoanProduct
+
+QUOTE_CACHE_TTL = 60  # seconds
+PRODUCT_CACHE_TTL = 300
+PRODUCT_CACHE_KEY = 'loan_quote_products'
+
+MAX_AMOUNTS = 50
+MAX_TENURE_MONTHS = 60
+MAX_AMOUNT = 99999999.99  # largest amount a loan's DecimalField(max_digits=10) can hold
+
+
+def _product_table():
+    """
+    Active products as column arrays, cached because they rarely change and
+    dropped by invalidate_products() when they do. version changes with every
+    rebuild, so quotes cached against an older table are never read again.
+    """
+    table = cache.get(PRODUCT_CACHE_KEY)
+    if table is None:
+        rows = list(
+            LoanProduct.objects.filter(is_active=True).order_by('pk').values_list(
+                'pk', 'name', 'loan_type', 'interest_rate', 'processing_fee_percentage',
+                'min_amount', 'max_amount', 'max_tenure_months',
+            )
+        )
+        table = {
+            'version': uuid.uuid4().hex,
+            'id': [row[0] for row in rows],
+            'name': [row[1] for row in rows],
+            'loan_type': [row[2] for row in rows],
+            'interest_rate': np.array([row[3] for row in rows], dtype=float),
+            'fee_pct': np.array([row[4] for row in rows], dtype=float),
+            'min_amount': np.array([row[5] for row in rows], dtype=float),
+            'max_amount': np.array([row[6] for row in rows], dtype=float),
+            'max_tenure': np.array([row[7] for row in rows], dtype=int),
+        }
+        cache.set(PRODUCT_CACHE_KEY, table, PRODUCT_CACHE_TTL)
+    return table
+
+
+def _money(values, mask):
+    """Round to kobo and replace ineligible cells with None."""
+    rounded = np.round(values, 2)
+    return np.where(mask, rounded, None).tolist()
+
+
+def compute_quotes(amounts, tenures=None, product_ids=None):
+    """
+    Return a quote matrix for the given amounts (and tenures, defaulting to
+    1..longest product tenure). Monthly payment, interest and total are
+    [tenure][amount] grids per product; the processing fee is per amount.
+    """
+    table = _product_table()
+    selected = [
+        index for index, pk in enumerate(table['id'])
+        if product_ids is None or pk in product_ids
+    ]
+    if tenures is None:
+        longest = int(table['max_tenure'][selected].max()) if selected else 0
+        tenures = list(range(1, min(longest, MAX_TENURE_MONTHS) + 1))
+
+    amount = np.asarray(amounts, dtype=float)[None, None, :]   # (1, 1, A)
+    tenure = np.asarray(tenures, dtype=float)[None, :, None]   # (1, T, 1)
+    rate = table['interest_rate'][selected, None, None] / 100  # (P, 1, 1)
+    fee_pct = table['fee_pct'][selected, None] / 100           # (P, 1)
+
+    eligible = (
+        (amount >= table['min_amount'][selected, None, None])
+        & (amount <= table['max_amount'][selected, None, None])
+        & (tenure <= table['max_tenure'][selected, None, None])
+    )                                                          # (P, T, A)
+    in_range = eligible.any(axis=1)                            # (P, A)
+
+    total_interest = amount * rate * tenure
+    total_repayable = amount + total_interest
+    monthly_payment = total_repayable / tenure
+    processing_fee = amount[0] * fee_pct                       # (P, A)
+
+    products = []
+    for row, index in enumerate(selected):
+        products.append({
+            'id': table['id'][index],
+            'name': table['name'][index],
+            'loan_type': table['loan_type'][index],
+            'interest_rate': float(table['interest_rate'][index]),
+            'processing_fee_percentage': float(table['fee_pct'][index]),
+            'max_tenure_months': int(table['max_tenure'][index]),
+            'monthly_payment': _money(monthly_payment[row], eligible[row]),
+            'total_interest': _money(total_interest[row], eligible[row]),
+            'total_repayable': _money(total_repayable[row], eligible[row]),
+            'processing_fee': _money(processing_fee[row], in_range[row]),
+        })
+
+    return {
+        'amounts': [float(value) for value in amounts],
+        'tenures': [int(value) for value in tenures],
+        'products': products,
+    }
+
+
+def invalidate_products(sender=None, **kwargs):
+    """post_save/post_delete receiver for LoanProduct."""
+    transaction.on_commit(lambda: cache.delete(PRODUCT_CACHE_KEY))
+
+
+def quote_cache_key(amounts, tenures, product_ids, version=''):
+    raw = f"{version}|{sorted(amounts)}|{tenures}|{sorted(product_ids) if product_ids else None}"
+    return f"loan_quotes_{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def get_quotes(amounts, tenures=None, product_ids=None):
+    """compute_quotes() behind a short-lived cache keyed on the request."""
+    amounts = sorted(set(amounts))
+    if tenures is not None:
+        tenures = sorted(set(tenures))
+    key = quote_cache_key(amounts, tenures, product_ids, _product_table()['version'])
+    quotes = cache.get(key)
+    if quotes is None:
+        quotes = compute_quotes(amounts, tenures, product_ids)
+        cache.set(key, quotes, QUOTE_CACHE_TTL)
+    return quotes
@@ -0,0 +1,364 @@
+"""
+Remita payday-loan gateway client
+
+One RemitaClient per process holds keep-alive httpx connection pools (HTTP/2
+when the h2 package is installed) and runs on a dedicated event-loop thread,
+so connections survive between calls whether they come from Celery tasks,
+sync views or async code:
+
+    remita.call('salary_history', phone_number, authorisation_code)          # sync
+    await remita.acall('salary_history', phone_number, authorisation_code)   # async
+
+Under gevent workers (gunicorn --worker-class gevent) a private event loop
+would run in a greenlet and every future.result() would block the hub, so
+call() uses a blocking SyncRemitaClient instead, whose sockets gevent makes
+cooperative. REMITA['SYNC_CLIENT'] forces either client; by default the sync
+one is used when gevent has patched the socket module.
+
+Connect/read/pool timeouts and a concurrency cap (MAX_CONCURRENCY in-flight
+requests per process) come from settings.REMITA. Timeouts, connection
+failures and 5xx responses raise RemitaUnavailable (safe to retry); any other
+non-"00" response, a body that is not a JSON object, or a "00" response
+missing the fields the caller relies on, raises RemitaError.
+
+With REMITA['BASE_URL'] unset the Remita views keep their mock responses.
+For offline testing and benchmarking run the stub gateway in
+accounts/remita_stub.py (python manage.py remita_stub).
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import uuid
+
+from django.conf import settings
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BASE_URL': '',
+    'MERCHANT_ID': '',
+    'API_KEY': '',
+    'API_TOKEN': '',
+    'WEBHOOK_SECRET': '',        # HMAC-SHA512 key for incoming notifications
+    'CONNECT_TIMEOUT': 5.0,
+    'READ_TIMEOUT': 30.0,
+    'POOL_TIMEOUT': 10.0,        # wait for a free pooled connection
+    'TOTAL_TIMEOUT': 60.0,       # sync callers give up after this
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 100,
+    'CONNECTIONS_PER_POOL': 25,
+    'KEEPALIVE_EXPIRY': 30.0,
+    'MAX_CONCURRENCY': 50,
+    'HTTP2': True,
+    'SYNC_CLIENT': None,         # None: blocking client when gevent has patched sockets
+}
+
+API_PREFIX = '/remita/exapp/api/v1/send/api/loansvc/data/api/v2/payday'
+SALARY_HISTORY_PATH = f'{API_PREFIX}/salary/history/ph'
+DISBURSEMENT_PATH = f'{API_PREFIX}/post/loan'
+STOP_LOAN_PATH = f'{API_PREFIX}/stop/loan'
+
+SUCCESS_CODE = '00'
+
+
+class RemitaError(Exception):
+    def __init__(self, message, status_code=None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+class RemitaUnavailable(RemitaError):
+    """The gateway timed out, refused the connection or returned a 5xx."""
+
+
+def _incomplete(path, data, problem):
+    logger.warning(f"Remita {path} returned an incomplete response ({problem}): {data!r}")
+    return RemitaError(f"Remita {path} returned an incomplete response: {problem}", response=data)
+
+
+def _check_salary_history(path, data):
+    """data, when present, is an object whose salaryPaymentDetails all carry an amount."""
+    salary = data.get('data') or {}
+    payments = (salary.get('salaryPaymentDetails') or []) if isinstance(salary, dict) else None
+    if not isinstance(payments, list) or not all(isinstance(item, dict) and 'amount' in item for item in payments):
+        raise _incomplete(path, data, "malformed salaryPaymentDetails")
+
+
+def _check_mandate_reference(path, data):
+    details = data.get('data')
+    if not isinstance(details, dict) or not details.get('mandateReference'):
+        raise _incomplete(path, data, "no mandateReference")
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'REMITA', {}))
+    return config
+
+
+def is_configured():
+    return bool(get_config()['BASE_URL'])
+
+
+class _RemitaApi:
+    """
+    Requests and response checks shared by both clients. Subclasses provide
+    post(path, payload, check); on RemitaClient the API methods return
+    coroutines, on SyncRemitaClient the response data.
+    """
+
+    def __init__(self, config=None, transport=None):
+        self.config = config or get_config()
+        self._transport = transport
+
+    def _http2(self):
+        return self.config['HTTP2'] and importlib.util.find_spec('h2') is not None
+
+    def _timeout(self):
+        config = self.config
+        return httpx.Timeout(config['READ_TIMEOUT'], connect=config['CONNECT_TIMEOUT'], pool=config['POOL_TIMEOUT'])
+
+    def _headers(self):
+        request_id = uuid.uuid4().hex
+        api_key = self.config['API_KEY']
+        token = hashlib.sha512(f"{api_key}{request_id}{self.config['API_TOKEN']}".encode('utf-8')).hexdigest()
+        return {
+            'MERCHANT_ID': self.config['MERCHANT_ID'],
+            'API_KEY': api_key,
+            'REQUEST_ID': request_id,
+            'AUTHORIZATION': f"remitaConsumerKey={api_key}, remitaConsumerToken={token}",
+        }
+
+    def _parse(self, path, response, check=None):
+        if response.status_code >= 500:
+            raise RemitaUnavailable(f"Remita {path} returned HTTP {response.status_code}", response.status_code)
+        try:
+            data = response.json()
+        except ValueError:
+            raise RemitaError(f"Remita {path} returned invalid JSON", response.status_code)
+        if not isinstance(data, dict):
+            logger.warning(f"Remita {path} returned a non-object body: {data!r}")
+            raise RemitaError(f"Remita {path} returned HTTP {response.status_code} without a JSON object", response.status_code, data)
+        if response.status_code >= 400 or data.get('responseCode') != SUCCESS_CODE:
+            message = data.get('responseMsg') or f"HTTP {response.status_code}"
+            raise RemitaError(f"Remita {path}: {message}", response.status_code, data)
+        if check is not None:
+            check(path, data)
+        return data
+
+    def salary_history(self, phone_number, authorisation_code, channel='USSD'):
+        return self.post(SALARY_HISTORY_PATH, {
+            'authorisationCode': authorisation_code,
+            'phoneNumber': phone_number,
+            'authorisationChannel': channel,
+        }, _check_salary_history)
+
+    def notify_disbursement(self, customer_id, authorisation_code, phone_number, account_number, bank_code,
+                            loan_amount, collection_amount, number_of_repayments,
+                            disbursement_date, collection_date, channel='USSD'):
+        """Tell Remita a loan was disbursed; the response carries data.mandateReference."""
+        return self.post(DISBURSEMENT_PATH, {
+            'customerId': customer_id,
+            'authorisationCode': authorisation_code,
+            'authorisationChannel': channel,
+            'phoneNumber': phone_number,
+            'accountNumber': account_number,
+            'bankCode': bank_code,
+            'currency': 'NGN',
+            'loanAmount': float(loan_amount),
+            'collectionAmount': float(collection_amount),
+            'totalCollectionAmount': float(collection_amount) * number_of_repayments,
+            'numberOfRepayments': number_of_repayments,
+            'dateOfDisbursement': disbursement_date.strftime('%d-%m-%Y %H:%M:%S+0000'),
+            'dateOfCollection': collection_date.strftime('%d-%m-%Y %H:%M:%S+0000'),
+        }, _check_mandate_reference)
+
+    def stop_mandate(self, customer_id, mandate_reference, authorisation_code):
+        return self.post(STOP_LOAN_PATH, {
+            'authorisationCode': authorisation_code,
+            'customerId': customer_id,
+            'mandateReference': mandate_reference,
+        })
+
+
+class RemitaClient(_RemitaApi):
+    """Async Remita client. Create and use it on a single event loop."""
+
+    def __init__(self, config=None, transport=None):
+        super().__init__(config, transport)
+        self._pools = []
+        self._next_pool = 0
+        self._semaphore = None
+
+    def _client(self):
+        """
+        Pick a pooled AsyncClient. httpcore scans every pooled connection on
+        each request, which stops scaling past ~30 connections per pool, so
+        MAX_CONNECTIONS is split over pools of CONNECTIONS_PER_POOL, used in turn.
+        """
+        if not self._pools:
+            config = self.config
+            per_pool = max(1, min(config['CONNECTIONS_PER_POOL'], config['MAX_CONNECTIONS']))
+            count = -(-config['MAX_CONNECTIONS'] // per_pool)
+            keepalive = -(-config['MAX_KEEPALIVE_CONNECTIONS'] // count)
+            self._pools = [
+                httpx.AsyncClient(
+                    base_url=config['BASE_URL'],
+                    http2=self._http2(),
+                    limits=httpx.Limits(
+                        max_connections=per_pool,
+                        max_keepalive_connections=min(keepalive, per_pool),
+                        keepalive_expiry=config['KEEPALIVE_EXPIRY'],
+                    ),
+                    timeout=self._timeout(),
+                    transport=self._transport,
+                )
+                for _ in range(count)
+            ]
+            self._semaphore = asyncio.Semaphore(config['MAX_CONCURRENCY'])
+        self._next_pool = (self._next_pool + 1) % len(self._pools)
+        return self._pools[self._next_pool]
+
+    async def post(self, path, payload, check=None):
+        client = self._client()
+        async with self._semaphore:
+            try:
+                response = await client.post(path, json=payload, headers=self._headers())
+            except httpx.TransportError as exc:
+                logger.warning(f"Remita {path} failed: {exc!r}")
+                raise RemitaUnavailable(f"Remita {path} failed: {exc!r}") from exc
+        return self._parse(path, response, check)
+
+    async def aclose(self):
+        pools, self._pools = self._pools, []
+        for pool in pools:
+            await pool.aclose()
+
+
+class SyncRemitaClient(_RemitaApi):
+    """
+    Blocking Remita client for gevent workers. One keep-alive pool shared by
+    every greenlet in the process; the concurrency cap is a semaphore, which
+    gevent's monkey patching makes cooperative like the sockets.
+    """
+
+    def __init__(self, config=None, transport=None):
+        super().__init__(config, transport)
+        self._http = None
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(self.config['MAX_CONCURRENCY'])
+
+    def _client(self):
+        with self._lock:
+            if self._http is None:
+                config = self.config
+                self._http = httpx.Client(
+                    base_url=config['BASE_URL'],
+                    http2=self._http2(),
+                    limits=httpx.Limits(
+                        max_connections=config['MAX_CONNECTIONS'],
+                        max_keepalive_connections=config['MAX_KEEPALIVE_CONNECTIONS'],
+                        keepalive_expiry=config['KEEPALIVE_EXPIRY'],
+                    ),
+                    timeout=self._timeout(),
+                    transport=self._transport,
+                )
+            return self._http
+
+    def post(self, path, payload, check=None):
+        client = self._client()
+        if not self._semaphore.acquire(timeout=self.config['TOTAL_TIMEOUT']):
+            raise RemitaUnavailable(f"Remita {path} timed out waiting for a free slot")
+        try:
+            response = client.post(path, json=payload, headers=self._headers())
+        except httpx.TransportError as exc:
+            logger.warning(f"Remita {path} failed: {exc!r}")
+            raise RemitaUnavailable(f"Remita {path} failed: {exc!r}") from exc
+        finally:
+            self._semaphore.release()
+        return self._parse(path, response, check)
+
+    def close(self):
+        with self._lock:
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+
+
+# --- Process-wide clients ---------------------------------------------------
+
+_lock = threading.Lock()
+_runtime = None  # (pid, loop, client)
+_sync_runtime = None  # (pid, SyncRemitaClient)
+
+
+def use_sync_client():
+    """REMITA['SYNC_CLIENT'] if set, else whether gevent has patched the socket module."""
+    setting = get_config()['SYNC_CLIENT']
+    if setting is not None:
+        return bool(setting)
+    # Only present once something imported gevent; never import it from here
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def _get_runtime():
+    """Start (or, after a fork, restart) the event-loop thread and its client."""
+    global _runtime
+    with _lock:
+        if _runtime is None or _runtime[0] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='remita-client', daemon=True).start()
+            _runtime = (os.getpid(), loop, RemitaClient())
+        return _runtime
+
+
+def _get_sync_client():
+    global _sync_runtime
+    with _lock:
+        if _sync_runtime is None or _sync_runtime[0] != os.getpid():
+            _sync_runtime = (os.getpid(), SyncRemitaClient())
+        return _sync_runtime[1]
+
+
+def _submit(method, args, kwargs):
+    _, loop, client = _get_runtime()
+    return asyncio.run_coroutine_threadsafe(getattr(client, method)(*args, **kwargs), loop)
+
+
+def call(method, *args, **kwargs):
+    """Run a client method from sync code (Celery tasks, sync views)."""
+    if use_sync_client():
+        return getattr(_get_sync_client(), method)(*args, **kwargs)
+    future = _submit(method, args, kwargs)
+    try:
+        return future.result(get_config()['TOTAL_TIMEOUT'])
+    except TimeoutError as exc:
+        future.cancel()
+        raise RemitaUnavailable(f"Remita {method} timed out") from exc
+
+
+async def acall(method, *args, **kwargs):
+    """Await a RemitaClient method from any event loop, sharing the process pool."""
+    return await asyncio.wrap_future(_submit(method, args, kwargs))
+
+
+def reset_client():
+    """Close the shared clients so the next call picks up changed settings."""
+    global _runtime, _sync_runtime
+    with _lock:
+        runtime, _runtime = _runtime, None
+        sync_runtime, _sync_runtime = _sync_runtime, None
+    if runtime is not None and runtime[0] == os.getpid():
+        _, loop, client = runtime
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+    if sync_runtime is not None and sync_runtime[0] == os.getpid():
+        sync_runtime[1].close()
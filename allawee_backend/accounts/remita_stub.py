@@ -0,0 +1,232 @@
+"""
+Local stub of the Remita payday-loan gateway, for offline tests and benchmarks
+
+Serves the three endpoints accounts/remita.py calls with canned responses
+after an artificial latency, checks the auth headers, and keeps HTTP/1.1
+connections alive like the real gateway. Phone numbers starting with 000 get
+a "no salary data" failure.
+
+    python manage.py remita_stub [--port 8765] [--latency 0.2]
+    python manage.py benchmark_remita [--requests 500] [--concurrency 50] [--latency 0.2]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import json
+import multiprocessing
+import statistics
+import threading
+import time
+import uuid
+
+import httpx
+
+from . import remita
+
+REQUIRED_HEADERS = ('MERCHANT_ID', 'API_KEY', 'REQUEST_ID', 'AUTHORIZATION')
+
+
+def _salary_history(body):
+    if body.get('phoneNumber', '').startswith('000'):
+        return {'status': 'success', 'hasData': False, 'responseCode': '7801', 'responseMsg': 'No salary record found'}
+    payments = [{'paymentDate': f'25-{month:02d}-2026 00:00:00+0000', 'amount': 33000.0} for month in range(1, 7)]
+    return {
+        'status': 'success',
+        'hasData': True,
+        'responseId': uuid.uuid4().hex[:12],
+        'responseCode': remita.SUCCESS_CODE,
+        'responseMsg': 'SUCCESSFUL',
+        'data': {
+            'customerId': body.get('phoneNumber'),
+            'accountNumber': '0123456789',
+            'bankCode': '058',
+            'companyName': 'NYSC',
+            'salaryPaymentDetails': payments,
+        },
+    }
+
+
+def _post_loan(body):
+    return {
+        'status': 'success',
+        'responseId': uuid.uuid4().hex[:12],
+        'responseCode': remita.SUCCESS_CODE,
+        'responseMsg': 'SUCCESSFUL',
+        'data': {'mandateReference': f"MR{uuid.uuid4().hex[:10].upper()}", 'customerId': body.get('customerId')},
+    }
+
+
+def _stop_loan(body):
+    return {
+        'status': 'success',
+        'responseId': uuid.uuid4().hex[:12],
+        'responseCode': remita.SUCCESS_CODE,
+        'responseMsg': 'SUCCESSFUL',
+        'data': {'mandateReference': body.get('mandateReference')},
+    }
+
+
+ROUTES = {
+    remita.SALARY_HISTORY_PATH: _salary_history,
+    remita.DISBURSEMENT_PATH: _post_loan,
+    remita.STOP_LOAN_PATH: _stop_loan,
+}
+
+
+class StubRemitaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        with server.stats_lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.requests += 1
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if server.latency:
+                time.sleep(server.latency)
+            handler = ROUTES.get(self.path)
+            if handler is None:
+                self._send(404, {'responseCode': '404', 'responseMsg': 'Not found'})
+            elif any(not self.headers.get(header) for header in REQUIRED_HEADERS):
+                self._send(401, {'responseCode': '401', 'responseMsg': 'Missing credentials'})
+            else:
+                self._send(200, handler(body))
+        finally:
+            with server.stats_lock:
+                server.in_flight -= 1
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRemitaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), StubRemitaHandler)
+        self.latency = latency
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve from a background thread; returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, name='remita-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# --- Benchmark --------------------------------------------------------------
+
+BENCHMARK_CONFIG = {'MERCHANT_ID': 'bench', 'API_KEY': 'bench', 'API_TOKEN': 'bench'}
+
+
+def _summary(mode, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+
+    return {
+        'mode': mode,
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(0.50), 1),
+        'p95_ms': round(percentile(0.95), 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0,
+    }
+
+
+def _blocking(url, total, workers):
+    """Synchronous calls from a fixed pool of worker threads, like sync gunicorn workers."""
+    client = remita.RemitaClient(dict(remita.get_config(), BASE_URL=url, **BENCHMARK_CONFIG))
+    http = httpx.Client(base_url=url, timeout=client.config['READ_TIMEOUT'])
+
+    def one(index):
+        started = time.perf_counter()
+        response = http.post(remita.SALARY_HISTORY_PATH, json={'phoneNumber': f'0803{index:07d}'},
+                                       headers=client._headers())
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies, errors = [], 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(one, index) for index in range(total)]:
+            try:
+                latencies.append(future.result())
+            except httpx.HTTPError:
+                errors += 1
+    http.close()
+    return _summary(f'blocking x{workers}', latencies, errors, time.perf_counter() - started)
+
+
+async def _pooled(url, total, concurrency):
+    config = dict(remita.get_config(), BASE_URL=url, MAX_CONCURRENCY=concurrency,
+                  MAX_CONNECTIONS=concurrency, MAX_KEEPALIVE_CONNECTIONS=concurrency,
+                  **BENCHMARK_CONFIG)
+    client = remita.RemitaClient(config)
+
+    async def one(index):
+        started = time.perf_counter()
+        await client.salary_history(f'0803{index:07d}', 'bench')
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(total)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    latencies = [result for result in results if not isinstance(result, BaseException)]
+    return _summary(f'pooled async x{concurrency}', latencies, len(results) - len(latencies), elapsed)
+
+
+def _serve(latency, ready):
+    server = StubRemitaServer(latency=latency)
+    ready.send(server.url)
+    server.serve_forever()
+
+
+def run_benchmark(total=500, concurrency=50, blocking_workers=4, latency=0.2):
+    """
+    Compare blocking worker threads with the pooled async client. The stub runs
+    in its own process, as the real gateway would, so its threads do not
+    compete with the client for the GIL.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve, args=(latency, sender), daemon=True)
+    process.start()
+    try:
+        url = receiver.recv()
+        results = [
+            _blocking(url, total, blocking_workers),
+            asyncio.run(_pooled(url, total, concurrency)),
+        ]
+    finally:
+        process.terminate()
+        process.join()
+    return results
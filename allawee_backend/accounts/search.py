@@ -0,0 +1,208 @@
+"""
+Index-backed search for support and admin screens
+
+Identifiers are recognised by shape and looked up by equality on their
+unique/indexed columns (application, loan and payment IDs, Remita RRRs,
+phone numbers and BVNs). Anything else is a name/number fragment matched
+against UserProfile:
+  * Postgres: icontains, served by the pg_trgm GIN indexes on
+    UPPER(column) from migration 0012.
+  * SQLite: the accounts_userprofile_fts FTS5 trigram table from the same
+    migration, kept in sync by triggers.
+Rows of other models are then matched through their borrower/applicant.
+
+The view or admin's own search_fields still apply to anything the index does
+not cover (e-mails, usernames, partial IDs): unless the term is an
+identifier the exact path serves, those fields are matched as well and the
+results are OR'ed together. Fields the profile match already covers are left
+out of that fallback.
+"""
+
+import re
+
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import LoanApplication, Loan, Payment, RepaymentSchedule, RemitaTransaction, UserProfile
+
+PROFILE_FTS_TABLE = 'accounts_userprofile_fts'
+
+# FTS5 trigram tokens need at least three characters
+MIN_FTS_TERM_LENGTH = 3
+
+# UserProfile columns matching_profiles() searches
+PROFILE_TEXT_FIELDS = ('full_name', 'phone_number', 'bvn')
+
+# search_fields prefix -> lookup, as in SearchFilter and ModelAdmin; anything else is icontains
+SEARCH_FIELD_LOOKUPS = {'^': 'istartswith', '=': 'iexact'}
+
+IDENTIFIER_PATTERNS = [
+    ('application', re.compile(r'^AL[0-9A-F]{8}$')),
+    ('loan', re.compile(r'^LN[0-9A-F]{8}$')),
+    ('payment', re.compile(r'^PY[0-9A-F]{8}$')),
+    ('rrr', re.compile(r'^\d{12}$')),
+    ('phone_or_bvn', re.compile(r'^\d{11}$')),
+]
+
+# model -> (lookup to the owning UserProfile, {identifier kind: exact lookup(s)})
+SEARCH_SPECS = {
+    UserProfile: ('pk', {'phone_or_bvn': ['phone_number', 'bvn']}),
+    LoanApplication: ('applicant', {
+        'application': ['application_id'],
+        'phone_or_bvn': ['applicant__phone_number', 'applicant__bvn'],
+    }),
+    Loan: ('borrower', {
+        'loan': ['loan_id'],
+        'application': ['application__application_id'],
+        'phone_or_bvn': ['borrower__phone_number', 'borrower__bvn'],
+    }),
+    Payment: ('borrower', {
+        'payment': ['payment_id'],
+        'loan': ['loan__loan_id'],
+        'rrr': ['remita_rrr'],
+        'phone_or_bvn': ['borrower__phone_number', 'borrower__bvn'],
+    }),
+    RepaymentSchedule: ('borrower', {
+        'loan': ['loan__loan_id'],
+        'phone_or_bvn': ['borrower__phone_number', 'borrower__bvn'],
+    }),
+    RemitaTransaction: ('user_profile', {
+        'rrr': ['remita_rrr'],
+        'loan': ['loan__loan_id'],
+        'phone_or_bvn': ['user_profile__phone_number', 'user_profile__bvn'],
+    }),
+}
+
+_fts_available = None
+
+
+def classify(term):
+    """Return the identifier kind a search term looks like, or None."""
+    normalized = term.strip().upper()
+    for kind, pattern in IDENTIFIER_PATTERNS:
+        if pattern.match(normalized):
+            return kind
+    return None
+
+
+def profile_fts_available():
+    """
+    True when the FTS5 table and its sync triggers exist. SQLite table rebuilds
+    (e.g. a later AlterField on UserProfile) drop the triggers, in which case
+    search falls back to icontains until migration 0012 is re-applied.
+    """
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE "
+                    "(type = 'table' AND name = %s) OR (type = 'trigger' AND name LIKE %s)",
+                    [PROFILE_FTS_TABLE, f"{PROFILE_FTS_TABLE}_a_"],
+                )
+                _fts_available = cursor.fetchone()[0] == 4
+    return _fts_available
+
+
+def matching_profiles(term):
+    """Subquery of UserProfile ids whose name, phone number or BVN contains term."""
+    term = term.strip()
+    if profile_fts_available() and len(term) >= MIN_FTS_TERM_LENGTH:
+        phrase = '"' + term.replace('"', '""') + '"'
+        return UserProfile.objects.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {PROFILE_FTS_TABLE} WHERE {PROFILE_FTS_TABLE} MATCH %s", [phrase])
+        ).values('pk')
+    return UserProfile.objects.filter(
+        Q(full_name__icontains=term) | Q(phone_number__icontains=term) | Q(bvn__icontains=term)
+    ).values('pk')
+
+
+def search_q(model, term):
+    """Q matching rows of model (in SEARCH_SPECS) through the indexed paths."""
+    profile_lookup, identifiers = SEARCH_SPECS[model]
+
+    kind = classify(term)
+    lookups = identifiers.get(kind)
+    if lookups:
+        value = term.upper() if kind in ('application', 'loan', 'payment') else term
+        exact = Q()
+        for lookup in lookups:
+            exact |= Q(**{lookup: value})
+        return exact
+
+    return Q(**{f"{profile_lookup}__in": matching_profiles(term)})
+
+
+def search(queryset, term):
+    """Filter queryset (of a model in SEARCH_SPECS) down to rows matching term."""
+    term = term.strip()
+    if not term:
+        return queryset
+    return queryset.filter(search_q(queryset.model, term))
+
+
+def fallback_fields(model, term, search_fields):
+    """
+    The search_fields still to match for term: none when the exact identifier
+    path serves it, else those the profile match misses.
+    """
+    profile_lookup, identifiers = SEARCH_SPECS[model]
+    if identifiers.get(classify(term)):
+        return []
+    prefix = '' if profile_lookup == 'pk' else f"{profile_lookup}__"
+    covered = {f"{prefix}{field}" for field in PROFILE_TEXT_FIELDS}
+    return [field for field in search_fields or () if field.lstrip('^=@$') not in covered]
+
+
+def fallback_q(fields, term):
+    """Q matching term against fields the way SearchFilter/ModelAdmin would, one word at a time."""
+    combined = Q()
+    for word in term.split():
+        matches = Q()
+        for field in fields:
+            lookup = SEARCH_FIELD_LOOKUPS.get(field[0], 'icontains')
+            matches |= Q(**{f"{field.lstrip('^=@$')}__{lookup}": word})
+        combined &= matches
+    return combined
+
+
+def search_with_fallback(queryset, term, fields):
+    """search(), OR'ed with fallback_q() over fields (see fallback_fields)."""
+    term = term.strip()
+    if not term:
+        return queryset
+    if not fields:
+        return search(queryset, term)
+    return queryset.filter(search_q(queryset.model, term) | fallback_q(fields, term))
+
+
+def _spawns_duplicates(opts, fields):
+    return any(lookup_spawns_duplicates(opts, field.lstrip('^=@$')) for field in fields)
+
+
+class IndexedSearchFilter(SearchFilter):
+    """SearchFilter that uses accounts.search for models it knows about."""
+
+    def filter_queryset(self, request, queryset, view):
+        if queryset.model not in SEARCH_SPECS:
+            return super().filter_queryset(request, queryset, view)
+        term = request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+        if not term:
+            return queryset
+        fields = fallback_fields(queryset.model, term, self.get_search_fields(view, request))
+        queryset = search_with_fallback(queryset, term, fields)
+        return queryset.distinct() if _spawns_duplicates(queryset.model._meta, fields) else queryset
+
+
+class IndexedSearchAdminMixin:
+    """ModelAdmin mixin: changelist and autocomplete search through accounts.search."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if queryset.model not in SEARCH_SPECS or not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        fields = fallback_fields(queryset.model, search_term.strip(), self.get_search_fields(request))
+        return search_with_fallback(queryset, search_term, fields), _spawns_duplicates(self.opts, fields)
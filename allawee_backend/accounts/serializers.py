@@ -7,11 +7,15 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.models import User
 from .models import (
     UserProfile, LoanProduct, LoanApplication, 
-    Loan, Payment, RepaymentSchedule, RemitaTransaction
+    Loan, Payment, RepaymentSchedule, RemitaTransaction, PortfolioSnapshot, DataExport
 )
+from .authentication import token_for_user
+from .exports import parse_filters
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -98,6 +102,15 @@ class LoanSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['loan_id', 'created_at', 'updated_at']
 
+class BootstrapLoanSerializer(serializers.ModelSerializer):
+    """Flat loan summary for the app-launch payload"""
+    product_name = serializers.CharField(source='application.loan_product.name', read_only=True)
+    
+    class Meta:
+        model = Loan
+        fields = ['id', 'loan_id', 'product_name', 'status', 'principal_amount', 'total_amount',
+                  'monthly_payment', 'total_paid', 'outstanding_balance', 'disbursement_date', 'maturity_date']
+
 class PaymentSerializer(serializers.ModelSerializer):
     loan = LoanSerializer(read_only=True)
     
@@ -106,6 +119,10 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['payment_id', 'created_at']
 
+class PaymentDetailSerializer(PaymentSerializer):
+    """Includes the raw Remita response; fetch with select_related('remita_payload')"""
+    remita_response = serializers.JSONField(read_only=True)
+
 class RepaymentScheduleSerializer(serializers.ModelSerializer):
     loan = LoanSerializer(read_only=True)
     payment = PaymentSerializer(read_only=True)
@@ -114,6 +131,42 @@ class RepaymentScheduleSerializer(serializers.ModelSerializer):
         model = RepaymentSchedule
         fields = '__all__'
 
+class RepaymentInstallmentSerializer(serializers.ModelSerializer):
+    """Flat installment for the app-launch payload; fetch with select_related('loan')"""
+    loan_id = serializers.CharField(source='loan.loan_id', read_only=True)
+    
+    class Meta:
+        model = RepaymentSchedule
+        fields = ['id', 'loan_id', 'installment_number', 'due_date', 'total_amount', 'is_overdue', 'days_overdue', 'late_fee']
+
+class SyncApplicationSerializer(serializers.ModelSerializer):
+    """Flat application row for the delta sync"""
+    class Meta:
+        model = LoanApplication
+        fields = ['id', 'application_id', 'loan_product', 'requested_amount', 'approved_amount', 'tenure_months',
+                  'interest_rate', 'processing_fee', 'status', 'purpose', 'application_date', 'review_date',
+                  'approval_date', 'disbursement_date', 'review_comments', 'updated_at']
+
+class SyncLoanSerializer(BootstrapLoanSerializer):
+    """Flat loan row for the delta sync; fetch with select_related('application__loan_product')"""
+    class Meta(BootstrapLoanSerializer.Meta):
+        fields = BootstrapLoanSerializer.Meta.fields + ['application', 'interest_amount', 'auto_deduction_active',
+                                                        'created_at', 'updated_at']
+
+class SyncPaymentSerializer(serializers.ModelSerializer):
+    """Flat payment row for the delta sync"""
+    class Meta:
+        model = Payment
+        fields = ['id', 'payment_id', 'loan', 'amount', 'payment_method', 'status', 'payment_date', 'due_date',
+                  'remita_rrr', 'reference', 'created_at', 'updated_at']
+
+class SyncInstallmentSerializer(serializers.ModelSerializer):
+    """Flat installment row for the delta sync"""
+    class Meta:
+        model = RepaymentSchedule
+        fields = ['id', 'loan', 'installment_number', 'due_date', 'principal_amount', 'interest_amount', 'total_amount',
+                  'is_paid', 'payment_date', 'payment', 'is_overdue', 'days_overdue', 'late_fee', 'updated_at']
+
 class RemitaTransactionSerializer(serializers.ModelSerializer):
     user_profile = UserProfileSerializer(read_only=True)
     loan = LoanSerializer(read_only=True)
@@ -123,6 +176,10 @@ class RemitaTransactionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['initiated_at', 'completed_at']
 
+class RemitaTransactionDetailSerializer(RemitaTransactionSerializer):
+    """Includes the raw Remita response; fetch with select_related('payload')"""
+    response_data = serializers.JSONField(read_only=True)
+
 # Dashboard Serializers for Admin Panel
 class DashboardStatsSerializer(serializers.Serializer):
     total_users = serializers.IntegerField()
@@ -140,11 +197,46 @@ class MonthlyStatsSerializer(serializers.Serializer):
     disbursements = serializers.DecimalField(max_digits=15, decimal_places=2)
     collections = serializers.DecimalField(max_digits=15, decimal_places=2)
 
+class PortfolioSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PortfolioSnapshot
+        exclude = ['id', 'created_at']
+
+class DataExportSerializer(serializers.ModelSerializer):
+    file = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DataExport
+        fields = ['id', 'export', 'format', 'compress', 'filters', 'status', 'file', 'row_count', 'error',
+                  'created_at', 'started_at', 'completed_at']
+        read_only_fields = ['status', 'file', 'row_count', 'error', 'created_at', 'started_at', 'completed_at']
+    
+    def validate_filters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("filters must be an object")
+        try:
+            return parse_filters(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+    
+    def get_file(self, obj):
+        """Staff-only download URL; the file itself is never public media."""
+        if obj.status != 'completed' or not obj.file:
+            return None
+        return reverse('export-job-download', kwargs={'pk': obj.pk}, request=self.context.get('request'))
+
 # Authentication Serializers
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
 
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """/api/auth/login/ tokens with the profile id claim (accounts/authentication.py)."""
+
+    @classmethod
+    def get_token(cls, user):
+        return token_for_user(user)
+
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField()
     new_password = serializers.CharField(min_length=8)
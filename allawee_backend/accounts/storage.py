@@ -0,0 +1,36 @@
+"""
+Private file storage for AllaweePlus
+
+Background exports (accounts/exports.py) hold whole loan and payment books,
+so they are written under EXPORT_ROOT rather than MEDIA_ROOT, which the web
+server publishes as /media/. Files are named with a random token and only
+reach a client through the staff-only export-job-download view.
+"""
+
+import os
+import secrets
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ExportStorage(FileSystemStorage):
+    """FileSystemStorage rooted at EXPORT_ROOT, read on every access so override_settings applies."""
+
+    @property
+    def base_location(self):
+        return str(settings.EXPORT_ROOT)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError("Export files have no public URL; use the export-job-download view")
+
+
+def export_upload_to(instance, filename):
+    """<random token>/<filename>: unguessable, but keeps the name for Content-Disposition."""
+    return f"{secrets.token_hex(16)}/{filename}"
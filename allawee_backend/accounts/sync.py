@@ -0,0 +1,165 @@
+"""
+Delta sync for the mobile app
+
+GET /api/accounts/sync/?cursor=<next_cursor from the previous call> returns
+the user's applications, loans, payments and repayment installments changed
+since the cursor, plus tombstones (ids) for rows deleted since then. Every
+query is a range scan on a (borrower, updated_at) / (borrower, deleted_at)
+index, so the usual no-op refresh costs five empty index probes.
+
+Cursors (opaque to clients, see encode_cursor):
+  * a sync round covers rows changed at or after the round's since. Its
+    successor starts at the first page's request time minus
+    SYNC_OVERLAP_SECONDS, so rows saved by transactions still open when we
+    read are picked up next time. Clients upsert by id, so seeing a row twice
+    is harmless.
+  * at most SYNC_PAGE_SIZE rows per entity are returned. When a page is full,
+    has_more is set and next_cursor continues the same round after each
+    entity's last (updated_at, pk) row, so rows sharing one updated_at (the
+    0013 AddField default, a bulk update) are paged through rather than
+    returned again. The client keeps calling until has_more is false.
+  * tombstones are kept for SYNC_TOMBSTONE_RETENTION_DAYS. An older since
+    returns full_resync, meaning: drop local data and sync from scratch.
+?since=<ISO timestamp> starts a round at that time, for clients that keep
+their own watermark.
+
+Tombstones are written by the post_delete receiver below (connected in
+accounts.apps), so cascades from archival and admin deletes are covered.
+Bulk queryset.update() calls must set updated_at themselves.
+"""
+
+import base64
+from datetime import datetime, timedelta
+import json
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LoanApplication, Loan, Payment, RepaymentSchedule, SyncTombstone
+from .purge import delete_in_chunks
+from .serializers import SyncApplicationSerializer, SyncInstallmentSerializer, SyncLoanSerializer, SyncPaymentSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_OVERLAP_SECONDS = 5
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 90
+
+# entity -> (model, owner field, serializer, select_related)
+SYNC_ENTITIES = {
+    'applications': (LoanApplication, 'applicant', SyncApplicationSerializer, ()),
+    'loans': (Loan, 'borrower', SyncLoanSerializer, ('application__loan_product',)),
+    'payments': (Payment, 'borrower', SyncPaymentSerializer, ()),
+    'repayment_schedule': (RepaymentSchedule, 'borrower', SyncInstallmentSerializer, ()),
+}
+
+ENTITY_BY_MODEL = {model: (entity, owner) for entity, (model, owner, _, _) in SYNC_ENTITIES.items()}
+
+
+def page_size():
+    return getattr(settings, 'SYNC_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', DEFAULT_TOMBSTONE_RETENTION_DAYS))
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """post_delete receiver for the synced models."""
+    entity, owner = ENTITY_BY_MODEL[sender]
+    borrower_id = getattr(instance, f"{owner}_id")
+    if borrower_id is not None:
+        SyncTombstone.objects.create(borrower_id=borrower_id, entity=entity, object_id=instance.pk)
+
+
+def encode_cursor(since, until=None, after=None):
+    """
+    Opaque cursor for sync_changes: the round's since, its until (the next
+    round's since) and, mid-round, each entity's last (updated_at, pk).
+    """
+    data = {
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+        'after': {key: [moment.isoformat(), pk] for key, (moment, pk) in (after or {}).items()},
+    }
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(value):
+    """Inverse of encode_cursor: (since, until, after). Raises ValueError on a malformed cursor."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        since, until = (datetime.fromisoformat(data[key]) if data[key] else None for key in ('since', 'until'))
+        after = {key: (datetime.fromisoformat(moment), int(pk)) for key, (moment, pk) in data['after'].items()}
+    except (TypeError, KeyError, AttributeError, ValueError) as exc:
+        raise ValueError(f"Malformed sync cursor: {exc}")
+    if any(moment is not None and timezone.is_naive(moment)
+           for moment in [since, until] + [moment for moment, _ in after.values()]):
+        raise ValueError("Malformed sync cursor: naive timestamp")
+    return since, until, after
+
+
+def _after(field, position):
+    moment, pk = position
+    return Q(**{f"{field}__gt": moment}) | Q(**{field: moment, 'pk__gt': pk})
+
+
+def sync_changes(profile, since=None, now=None, limit=None, until=None, after=None):
+    """
+    Return the delta payload for profile. since=None is an initial sync: every
+    row, no tombstones. until and after continue a round (see decode_cursor).
+    """
+    now = now or timezone.now()
+    limit = limit or page_size()
+    after = after or {}
+    payload = {'full_resync': False, 'has_more': False, 'changes': {}, 'deleted': {}}
+
+    if since is not None and since < now - tombstone_retention():
+        payload.update(full_resync=True, next_cursor=None)
+        return payload
+
+    until = until or now - timedelta(seconds=getattr(settings, 'SYNC_OVERLAP_SECONDS', DEFAULT_OVERLAP_SECONDS))
+    positions = dict(after)
+    for entity, (model, owner, serializer_class, related) in SYNC_ENTITIES.items():
+        rows = model.objects.filter(**{owner: profile})
+        if since is not None:
+            rows = rows.filter(updated_at__gte=since)
+        if entity in after:
+            rows = rows.filter(_after('updated_at', after[entity]))
+        if related:
+            rows = rows.select_related(*related)
+        rows = list(rows.order_by('updated_at', 'pk')[:limit])
+        payload['changes'][entity] = serializer_class(rows, many=True).data
+        if rows:
+            positions[entity] = (rows[-1].updated_at, rows[-1].pk)
+        if len(rows) == limit:
+            payload['has_more'] = True
+
+    if since is not None:
+        tombstones = SyncTombstone.objects.filter(borrower=profile, deleted_at__gte=since)
+        if 'deleted' in after:
+            tombstones = tombstones.filter(_after('deleted_at', after['deleted']))
+        tombstones = list(tombstones.order_by('deleted_at', 'pk').values_list('entity', 'object_id', 'deleted_at', 'pk')[:limit])
+        for entity, object_id, _, _ in tombstones:
+            payload['deleted'].setdefault(entity, []).append(object_id)
+        if tombstones:
+            positions['deleted'] = tombstones[-1][2:]
+        if len(tombstones) == limit:
+            payload['has_more'] = True
+
+    if payload['has_more']:
+        payload['next_cursor'] = encode_cursor(since, until, positions)
+    else:
+        payload['next_cursor'] = encode_cursor(until)
+    return payload
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones past the retention window. Returns the number deleted."""
+    cutoff = (now or timezone.now()) - tombstone_retention()
+    deleted = delete_in_chunks(SyncTombstone.objects.filter(deleted_at__lt=cutoff))
+    if deleted:
+        logger.info(f"Pruned {deleted} sync tombstones older than {cutoff:%Y-%m-%d}")
+    return deleted
@@ -7,11 +7,12 @@ from django.core.mail import send_mail
 from django.utils import timezone
 from django.db.models import Q
 from django.core.cache import cache
-from django.contrib.sessions.models import Session
+from django.conf import settings
 import logging
 from datetime import datetime, timedelta
 
-from .models import Loan, Payment, RepaymentSchedule, UserProfile
+from .models import DataExport, Loan, Payment, RepaymentSchedule, UserProfile
+from . import archival, bulk_actions, exports, maintenance, partitioning, portfolio, posting, purge, sync, webhooks
 
 logger = logging.getLogger(__name__)
 
@@ -48,21 +49,15 @@ def process_payment(self, payment_id):
     Process payment asynchronously
     """
     try:
-        payment = Payment.objects.get(id=payment_id)
+        payment = Payment.objects.only('payment_id', 'loan_id').get(id=payment_id)
         
         # Simulate payment processing
         # In production, this would integrate with payment gateways
         
-        payment.status = 'completed'
-        payment.save()
-        
-        # Update loan balance
-        loan = payment.loan
-        loan.outstanding_balance -= payment.amount
-        loan.save()
+        # Apply to the loan balance under a row lock
+        posting.post_loan_payments(payment.loan_id, payment_ids=[payment.id])
         
         # Clear related caches
-        cache.delete(f"loan_repayment_schedule_{loan.id}")
         cache.delete("payment_analytics")
         cache.delete("dashboard_overview")
         
@@ -73,6 +68,74 @@ def process_payment(self, payment_id):
         logger.error(f"Error processing payment {payment_id}: {exc}")
         self.retry(countdown=60, exc=exc)
 
+@shared_task(bind=True, max_retries=3)
+def post_pending_payments(self, batch_size=posting.DEFAULT_POSTING_BATCH_SIZE):
+    """
+    Post pending payments coalesced per loan - runs every minute
+    """
+    try:
+        result = posting.post_pending_payments(batch_size=batch_size)
+        
+        logger.info(f"Posted {result['payments']} payments across {result['loans']} loans")
+        return f"Posted {result['payments']} payments across {result['loans']} loans"
+        
+    except Exception as exc:
+        logger.error(f"Error posting pending payments: {exc}")
+        self.retry(countdown=60, exc=exc)
+
+@shared_task(bind=True, max_retries=3)
+def process_remita_events(self, batch_size=webhooks.DEFAULT_EVENT_BATCH_SIZE, max_batches=20):
+    """
+    Apply queued Remita webhook events in batches - runs every 15 seconds
+    """
+    try:
+        totals = {}
+        for _ in range(max_batches):
+            counts = webhooks.process_pending_events(batch_size=batch_size)
+            if not counts['events']:
+                break
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+        
+        if totals:
+            logger.info(f"Processed Remita webhook events: {totals}")
+        return totals
+        
+    except Exception as exc:
+        logger.error(f"Error processing Remita webhook events: {exc}")
+        self.retry(countdown=30, exc=exc)
+
+@shared_task(bind=True, max_retries=3)
+def run_bulk_action_job(self, job_id):
+    """
+    Apply a queued admin bulk action in chunks, resuming after the last committed chunk
+    """
+    try:
+        job = bulk_actions.run_job(job_id)
+        return f"Bulk action job {job_id}: {job.changed} of {job.total} rows changed"
+        
+    except Exception as exc:
+        logger.error(f"Error running bulk action job {job_id}: {exc}")
+        self.retry(countdown=60, exc=exc)
+
+@shared_task
+def run_data_export(export_id):
+    """
+    Write a requested DataExport to MEDIA_ROOT/exports/
+    """
+    try:
+        export = DataExport.objects.get(pk=export_id, status='pending')
+    except DataExport.DoesNotExist:
+        logger.warning(f"Export {export_id} is not pending, skipping")
+        return None
+    
+    try:
+        rows = exports.run_export(export)
+        return f"Export {export_id} completed: {rows} rows"
+    except Exception as exc:
+        logger.error(f"Error running export {export_id}: {exc}")
+        return f"Error: {exc}"
+
 @shared_task
 def update_overdue_payments():
     """
@@ -126,11 +189,11 @@ def send_payment_reminders():
         due_schedules = RepaymentSchedule.objects.filter(
             due_date=reminder_date,
             is_paid=False
-        ).select_related('loan', 'loan__user', 'loan__user__profile')
+        ).select_related('loan', 'borrower', 'borrower__user')
         
         count = 0
         for schedule in due_schedules:
-            user_profile = schedule.loan.user.profile
+            user_profile = schedule.borrower
             
             # Send email reminder
             send_mail(
@@ -143,7 +206,7 @@ def send_payment_reminders():
                        f'Please make your payment on time to avoid late fees.\n\n'
                        f'Thank you,\nAllaweePlus Team',
                 from_email='noreply@allaweplus.com',
-                recipient_list=[schedule.loan.user.email],
+                recipient_list=[user_profile.user.email],
                 fail_silently=True,
             )
             count += 1
@@ -156,75 +219,116 @@ def send_payment_reminders():
         return f"Error: {exc}"
 
 @shared_task
-def cleanup_old_sessions():
+def purge_expired_auth_tokens(chunk_size=purge.DEFAULT_CHUNK_SIZE, pause=purge.DEFAULT_PAUSE_SECONDS):
+    """
+    Purge expired auth tokens, JWT blacklist rows and DB sessions in small chunks - runs daily
+    """
+    try:
+        report = purge.purge_expired_auth_rows(chunk_size=chunk_size, pause=pause)
+        
+        logger.info(f"Purged expired auth rows: {report}")
+        return report
+        
+    except Exception as exc:
+        logger.error(f"Error purging expired auth rows: {exc}")
+        return f"Error: {exc}"
+
+@shared_task
+def prune_sync_tombstones():
     """
-    Clean up expired sessions - runs daily
+    Drop delta-sync tombstones past SYNC_TOMBSTONE_RETENTION_DAYS - runs daily
     """
     try:
-        Session.objects.filter(expire_date__lt=timezone.now()).delete()
-        logger.info("Cleaned up expired sessions")
-        return "Cleaned up expired sessions"
+        deleted = sync.prune_tombstones()
+        return f"Pruned {deleted} sync tombstones"
         
     except Exception as exc:
-        logger.error(f"Error cleaning up sessions: {exc}")
+        logger.error(f"Error pruning sync tombstones: {exc}")
         return f"Error: {exc}"
 
 @shared_task
-def generate_daily_reports():
+def generate_daily_reports(snapshot_date=None):
     """
-    Generate daily reports and cache them - runs daily
+    Build yesterday's portfolio snapshot and cache it - runs daily
     """
     try:
-        from django.db import connection
-        
-        with connection.cursor() as cursor:
-            # Generate comprehensive daily statistics
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_applications,
-                    COUNT(CASE WHEN created_at::date = CURRENT_DATE THEN 1 END) as today_applications,
-                    COUNT(CASE WHEN status = 'approved' THEN 1 END) as approved_applications,
-                    SUM(CASE WHEN status = 'approved' THEN requested_amount ELSE 0 END) as total_approved_amount
-                FROM accounts_loanapplication
-                WHERE created_at >= CURRENT_DATE - INTERVAL '30 days'
-            """)
-            loan_stats = cursor.fetchone()
-            
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_payments,
-                    SUM(CASE WHEN status = 'completed' THEN amount ELSE 0 END) as total_collected,
-                    COUNT(CASE WHEN created_at::date = CURRENT_DATE THEN 1 END) as today_payments
-                FROM accounts_payment
-                WHERE created_at >= CURRENT_DATE - INTERVAL '30 days'
-            """)
-            payment_stats = cursor.fetchone()
+        if snapshot_date:
+            day = datetime.strptime(snapshot_date, '%Y-%m-%d').date()
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+        
+        snapshot = portfolio.build_portfolio_snapshot(day)
         
         daily_report = {
-            'date': timezone.now().date().isoformat(),
-            'loan_applications': {
-                'total_last_30_days': loan_stats[0],
-                'today': loan_stats[1],
-                'approved': loan_stats[2],
-                'total_approved_amount': float(loan_stats[3] or 0),
+            'date': snapshot.snapshot_date.isoformat(),
+            'portfolio': {
+                'outstanding_principal': float(snapshot.outstanding_principal),
+                'par1_amount': float(snapshot.par1_amount),
+                'par30_amount': float(snapshot.par30_amount),
+                'par90_amount': float(snapshot.par90_amount),
+                'defaulted_loans': snapshot.defaulted_loans,
+            },
+            'disbursements': {
+                'count': snapshot.disbursed_count,
+                'amount': float(snapshot.disbursed_amount),
             },
             'payments': {
-                'total_last_30_days': payment_stats[0],
-                'total_collected': float(payment_stats[1] or 0),
-                'today': payment_stats[2],
+                'count': snapshot.collections_count,
+                'total_collected': float(snapshot.collections_amount),
             }
         }
         
-        # Cache the report for quick access
-        cache.set('daily_report', daily_report, 86400)  # Cache for 24 hours
+        # Cache the latest report for quick access; history lives in PortfolioSnapshot
+        cache.set('daily_report', daily_report, 86400 * 2)
         
-        logger.info("Generated daily report")
-        return "Generated daily report"
+        logger.info(f"Generated portfolio snapshot for {day}")
+        return f"Generated portfolio snapshot for {day}"
         
     except Exception as exc:
         logger.error(f"Error generating daily report: {exc}")
         return f"Error: {exc}"
 
+@shared_task
+def maintain_partitions():
+    """
+    Create upcoming monthly partitions and archive expired ones - runs daily
+    """
+    try:
+        ensured = partitioning.ensure_future_partitions(
+            months_ahead=getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+        )
+        
+        archived = []
+        archive_after = getattr(settings, 'PARTITION_ARCHIVE_AFTER_MONTHS', None)
+        if archive_after:
+            archived = partitioning.archive_partitions(archive_after)
+        
+        logger.info(f"Partitions ensured: {len(ensured)}, archived: {archived}")
+        return {'ensured': len(ensured), 'archived': archived}
+        
+    except Exception as exc:
+        logger.error(f"Error maintaining partitions: {exc}")
+        return f"Error: {exc}"
+
+@shared_task
+def archive_closed_loans(months=None):
+    """
+    Move long-closed loans and their child rows to LoanArchive - runs daily
+    """
+    try:
+        months = months or getattr(settings, 'LOAN_ARCHIVE_AFTER_MONTHS', 12)
+        archived = archival.archive_closed_loans(months)
+        
+        if archived:
+            cache.delete("dashboard_overview")
+            cache.delete("payment_analytics")
+        
+        return f"Archived {archived} loans"
+        
+    except Exception as exc:
+        logger.error(f"Error archiving closed loans: {exc}")
+        return f"Error: {exc}"
+
 @shared_task(bind=True, max_retries=3)
 def bulk_import_users(self, user_data_list):
     """
@@ -272,23 +376,18 @@ def bulk_import_users(self, user_data_list):
         self.retry(countdown=60, exc=exc)
 
 @shared_task
-def optimize_database():
+def optimize_database(force=False):
     """
-    Database optimization task - runs weekly
+    Statistics-driven database maintenance - runs hourly, acts only in the off-peak window
     """
     try:
-        from django.db import connection
-        
-        with connection.cursor() as cursor:
-            # Analyze and vacuum tables for better performance
-            cursor.execute("ANALYZE accounts_userprofile;")
-            cursor.execute("ANALYZE accounts_loanapplication;")
-            cursor.execute("ANALYZE accounts_loan;")
-            cursor.execute("ANALYZE accounts_payment;")
-            cursor.execute("ANALYZE accounts_repaymentschedule;")
-        
-        logger.info("Database optimization completed")
-        return "Database optimization completed"
+        actions = maintenance.run_maintenance(force=force)
+        
+        if actions is None:
+            return "Outside maintenance window"
+        
+        logger.info(f"Database optimization completed: {len(actions)} actions")
+        return f"Database optimization completed: {', '.join(actions) or 'nothing to do'}"
         
     except Exception as exc:
         logger.error(f"Error optimizing database: {exc}")
@@ -1,7 +1,40 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase
+from django.conf import settings
 from django.test import Client
 from django.contrib.auth.models import User
-from accounts.models import UserProfile, LoanProduct, LoanApplication, Loan, Payment
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from unittest import mock
+from core import admin_performance, db_router, sqlite_profile
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts import views, views_optimized
+from accounts.models import UserProfile, LoanProduct, LoanApplication, Loan, Payment, RepaymentSchedule, PortfolioSnapshot, LoanArchive, RemitaPayload, RemitaTransaction, RemitaWebhookEvent, SyncTombstone, DataExport, BulkActionJob
+from accounts.remita_stub import StubRemitaServer
+from accounts.serializers import PaymentSerializer, PaymentDetailSerializer
+from accounts import archival, authentication, benchmark, bootstrap, bulk_actions, consistency, exports, idempotency, quotes, remita, search, sync, throttling, webhooks, maintenance, partitioning, posting, portfolio, purge
+from accounts.query_plans import check_query_plans
 
 class TestEndToEnd(TestCase):
 	def setUp(self):
@@ -48,4 +81,1287 @@ class TestEndToEnd(TestCase):
 		self.assertEqual(loan.status, 'closed')
 		self.assertEqual(loan.outstanding_balance, 0)
 
+class TestPaymentPosting(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='poster', password='testpass', email='poster@example.com')
+		profile = UserProfile.objects.create(user=user, full_name='Poster User', phone_number='08099990000')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=30000, interest_rate=15, max_tenure_months=1)
+		app = LoanApplication.objects.create(applicant=profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250, status='disbursed')
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, status='active', disbursement_date='2025-08-17T00:00:00Z', maturity_date='2025-09-17', outstanding_balance=11500)
+
+	def make_payment(self, amount):
+		return Payment.objects.create(loan=self.loan, amount=amount, payment_method='remita_auto', status='pending', payment_date='2025-08-18T00:00:00Z', due_date='2025-09-17')
+
+	def test_batch_is_applied_in_one_pass(self):
+		self.make_payment(3000)
+		self.make_payment(2000)
+		result = posting.post_pending_payments()
+		self.assertEqual(result, {'loans': 1, 'payments': 2})
+		loan = Loan.objects.get(pk=self.loan.pk)
+		self.assertEqual(loan.total_paid, 5000)
+		self.assertEqual(loan.outstanding_balance, 6500)
+		self.assertEqual(loan.status, 'active')
+		self.assertFalse(Payment.objects.filter(status='pending').exists())
+
+	def test_loan_closes_when_fully_paid(self):
+		self.make_payment(5000)
+		posting.post_pending_payments()
+		self.make_payment(6500)
+		loan = Loan.objects.get(pk=self.loan.pk)
+		self.assertEqual(loan.status, 'active')
+		self.assertEqual(loan.outstanding_balance, 6500)
+		posting.post_pending_payments()
+		loan = Loan.objects.get(pk=self.loan.pk)
+		self.assertEqual(loan.status, 'closed')
+		self.assertEqual(loan.outstanding_balance, 0)
+		self.assertEqual(loan.total_paid, 11500)
+
+	def test_failed_payment_leaves_balance_untouched(self):
+		Payment.objects.create(loan=self.loan, amount=11500, payment_method='remita_auto', status='failed', payment_date='2025-08-18T00:00:00Z', due_date='2025-09-17')
+		self.assertEqual(posting.post_pending_payments(), {'loans': 0, 'payments': 0})
+		loan = Loan.objects.get(pk=self.loan.pk)
+		self.assertEqual(loan.status, 'active')
+		self.assertEqual(loan.outstanding_balance, 11500)
+		self.assertEqual(loan.total_paid, 0)
+
+	def test_payments_saved_as_successful_are_posted_under_the_lock(self):
+		# e.g. entered through the admin rather than the posting worker
+		payment = Payment.objects.create(loan=self.loan, amount=11500, payment_method='bank_transfer', status='successful', payment_date='2025-08-18T00:00:00Z', due_date='2025-09-17')
+		loan = Loan.objects.get(pk=self.loan.pk)
+		self.assertEqual((loan.status, loan.total_paid, loan.outstanding_balance), ('closed', 11500, 0))
+
+		payment.status = 'refunded'
+		payment.save()
+		loan = Loan.objects.get(pk=self.loan.pk)
+		self.assertEqual((loan.total_paid, loan.outstanding_balance), (0, 11500))
+
+		pending = self.make_payment(4000)
+		pending.status = 'successful'
+		pending.save()
+		self.assertEqual(Loan.objects.get(pk=self.loan.pk).total_paid, 4000)
+		with self.assertNumQueries(2):
+			pending.save()
+
+	def test_posting_is_idempotent(self):
+		payment = self.make_payment(3000)
+		self.assertEqual(posting.post_loan_payments(self.loan.pk, [payment.pk]), 1)
+		self.assertEqual(posting.post_loan_payments(self.loan.pk, [payment.pk]), 0)
+		self.assertEqual(Loan.objects.get(pk=self.loan.pk).total_paid, 3000)
+
+class TestPortfolioSnapshot(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='risk', password='testpass', email='risk@example.com')
+		profile = UserProfile.objects.create(user=user, full_name='Risk User', phone_number='08099991111')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=30000, interest_rate=15, max_tenure_months=2)
+		app = LoanApplication.objects.create(applicant=profile, loan_product=product, requested_amount=10000, tenure_months=2, interest_rate=15, processing_fee=250, status='disbursed')
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=5750, status='active', disbursement_date='2025-01-01T09:00:00Z', maturity_date='2025-03-01', outstanding_balance=11500)
+		RepaymentSchedule.objects.create(loan=self.loan, installment_number=1, due_date=date(2025, 2, 1), principal_amount=5000, interest_amount=750, total_amount=5750)
+		RepaymentSchedule.objects.create(loan=self.loan, installment_number=2, due_date=date(2025, 3, 1), principal_amount=5000, interest_amount=750, total_amount=5750)
+
+	def test_par_buckets_age_with_snapshot_date(self):
+		snapshot = portfolio.build_portfolio_snapshot(date(2025, 2, 5))
+		self.assertEqual(snapshot.outstanding_principal, 10000)
+		self.assertEqual(snapshot.par1_amount, 10000)
+		self.assertEqual(snapshot.par1_loans, 1)
+		self.assertEqual(snapshot.par30_amount, 0)
+		snapshot = portfolio.build_portfolio_snapshot(date(2025, 3, 10))
+		self.assertEqual(snapshot.par30_loans, 1)
+		self.assertEqual(snapshot.par90_loans, 0)
+
+	def test_backfill_builds_each_day(self):
+		call_command('backfill_portfolio_snapshots', start='2024-12-31', end='2025-01-02', stdout=StringIO())
+		self.assertEqual(PortfolioSnapshot.objects.count(), 3)
+		first_day = PortfolioSnapshot.objects.get(snapshot_date=date(2025, 1, 1))
+		self.assertEqual(first_day.disbursed_count, 1)
+		self.assertEqual(first_day.cumulative_disbursed, 10000)
+		next_day = PortfolioSnapshot.objects.get(snapshot_date=date(2025, 1, 2))
+		self.assertEqual(next_day.disbursed_count, 0)
+		self.assertEqual(next_day.cumulative_disbursed, 10000)
+		self.assertEqual(next_day.outstanding_principal, 10000)
+
+	def test_posted_installment_leaves_principal_and_par(self):
+		Payment.objects.create(loan=self.loan, amount=5750, payment_method='remita_auto', status='pending', payment_date='2025-02-03T09:00:00Z', due_date='2025-02-01')
+		posting.post_pending_payments()
+		first, second = RepaymentSchedule.objects.filter(loan=self.loan).order_by('installment_number')
+		self.assertTrue(first.is_paid)
+		self.assertFalse(second.is_paid)
+		before = portfolio.build_portfolio_snapshot(date(2025, 2, 2))
+		self.assertEqual(before.par1_amount, 10000)
+		after = portfolio.build_portfolio_snapshot(date(2025, 2, 5))
+		self.assertEqual(after.outstanding_principal, 5000)
+		self.assertEqual(after.par1_amount, 0)
+
+	def test_late_posting_and_ended_loans_leave_the_book(self):
+		portfolio.backfill_portfolio_snapshots(date(2025, 2, 1), date(2025, 2, 5))
+		# Backdated to Feb 3 but posted after that day's snapshot was built
+		Payment.objects.create(loan=self.loan, amount=5750, payment_method='remita_auto', status='successful', payment_date='2025-02-03T09:00:00Z', due_date='2025-02-01')
+		self.assertEqual(portfolio.build_portfolio_snapshot(date(2025, 2, 6)).outstanding_principal, 5000)
+		self.assertEqual(portfolio.build_portfolio_snapshot(date(2025, 2, 6)).cumulative_collected, 5750)
+
+		Loan.objects.filter(pk=self.loan.pk).update(status='written_off', updated_at=datetime(2025, 2, 10, 12, tzinfo=dt_timezone.utc))
+		self.assertEqual(portfolio.build_portfolio_snapshot(date(2025, 2, 9)).outstanding_principal, 5000)
+		self.assertEqual(portfolio.build_portfolio_snapshot(date(2025, 2, 10)).outstanding_principal, 0)
+
+	def test_defaulted_loans_counted_from_default_date(self):
+		bulk_actions.set_loan_status([self.loan.pk], 'defaulted', datetime(2025, 2, 10, 12, tzinfo=dt_timezone.utc))
+		snapshot = portfolio.build_portfolio_snapshot(date(2025, 2, 5))
+		self.assertEqual((snapshot.defaulted_loans, snapshot.outstanding_principal), (0, 10000))
+		snapshot = portfolio.build_portfolio_snapshot(date(2025, 2, 15))
+		self.assertEqual((snapshot.defaulted_loans, snapshot.outstanding_principal), (1, 0))
+
+	def test_history_rejects_non_positive_days(self):
+		admin = User.objects.create_superuser(username='riskops', password='testpass', email='riskops@example.com')
+		request = APIRequestFactory().get('/api/accounts/dashboard/portfolio/', {'days': '-1'})
+		force_authenticate(request, user=admin)
+		self.assertEqual(views.portfolio_history(request).status_code, 400)
+
+class TestDatabaseMaintenance(SimpleTestCase):
+	def test_plan_only_touches_drifted_tables(self):
+		config = maintenance.get_config()
+		stats = [
+			('accounts_payment', 100000, 200, 9000),
+			('accounts_loan', 100000, 20000, 0),
+			('accounts_userprofile', 100000, 10, 50),
+			('auth_user', 100000, 90000, 90000),
+		]
+		plan = maintenance.plan_table_maintenance(stats, config)
+		self.assertEqual(plan, [('ANALYZE', 'accounts_payment'), ('VACUUM ANALYZE', 'accounts_loan')])
+
+	def test_window_wraps_midnight(self):
+		config = dict(maintenance.get_config(), WINDOW_START_HOUR=22, WINDOW_END_HOUR=4)
+		# Africa/Lagos is UTC+1
+		self.assertTrue(maintenance.in_maintenance_window(config, datetime(2025, 8, 1, 22, 30, tzinfo=dt_timezone.utc)))
+		self.assertFalse(maintenance.in_maintenance_window(config, datetime(2025, 8, 1, 12, 0, tzinfo=dt_timezone.utc)))
+
+class TestAuthPurge(TestCase):
+	def test_only_expired_rows_are_deleted_in_chunks(self):
+		now = timezone.now()
+		for i in range(3):
+			user = User.objects.create_user(username=f'purge{i}', password='testpass')
+			Token.objects.create(user=user)
+			outstanding = OutstandingToken.objects.create(user=user, jti=f'jti-{i}', token='x', expires_at=now - timedelta(days=1 - i))
+			BlacklistedToken.objects.create(token=outstanding)
+		Token.objects.filter(user__username__in=['purge0', 'purge1']).update(created=now - timedelta(days=60))
+		report = purge.purge_expired_auth_rows(chunk_size=1, pause=0, now=now)
+		self.assertEqual(report['authtoken.Token'], 2)
+		self.assertEqual(report['token_blacklist.BlacklistedToken'], 1)
+		self.assertEqual(report['token_blacklist.OutstandingToken'], 1)
+		self.assertEqual(Token.objects.count(), 1)
+		self.assertEqual(OutstandingToken.objects.count(), 2)
+
+class TestQueryPlans(TestCase):
+	def test_hot_queries_use_declared_indexes(self):
+		misses = [(description, plan) for description, index, plan, ok in check_query_plans() if not ok]
+		self.assertEqual(misses, [])
+
+class TestPartitioning(SimpleTestCase):
+	def test_month_arithmetic_and_names(self):
+		self.assertEqual(partitioning.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+		self.assertEqual(partitioning.add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+		self.assertEqual(partitioning.partition_name('accounts_payment', date(2025, 8, 1)), 'accounts_payment_p2025_08')
+
+	def archive(self, live_partitions=()):
+		executed = []
+		cursor = mock.MagicMock()
+		cursor.execute.side_effect = lambda sql, params=None: executed.append(sql)
+		cursor.fetchone.side_effect = lambda: (1,) if any(name in executed[-1] for name in live_partitions) else None
+		pg = mock.MagicMock(vendor='postgresql', in_atomic_block=False)
+		pg.cursor.return_value.__enter__.return_value = cursor
+		pg.ops.quote_name = lambda name: f'"{name}"'
+		partitions = [('accounts_payment_p2023_01', date(2023, 1, 1)), ('accounts_payment_p2025_07', date(2025, 7, 1))]
+		with mock.patch.object(partitioning, 'connection', pg), \
+				mock.patch.object(partitioning.transaction, 'atomic'), \
+				mock.patch.object(partitioning, 'is_partitioned', side_effect=lambda table: table == 'accounts_payment'), \
+				mock.patch.object(partitioning, 'list_partitions', return_value=partitions):
+			archived = partitioning.archive_partitions(12, today=date(2025, 8, 15))
+		return archived, executed
+
+	def test_archive_detaches_without_concurrently_under_lock_timeout(self):
+		archived, executed = self.archive()
+		self.assertEqual(archived, ['archive.accounts_payment_p2023_01'])
+		detach = [sql for sql in executed if 'DETACH' in sql]
+		self.assertEqual(detach, ['ALTER TABLE "accounts_payment" DETACH PARTITION "accounts_payment_p2023_01"'])
+		self.assertLess(executed.index("SELECT set_config('lock_timeout', %s, true)"), executed.index(detach[0]))
+
+	def test_archive_skips_partitions_with_live_loans(self):
+		archived, executed = self.archive(live_partitions=['accounts_payment_p2023_01'])
+		self.assertEqual(archived, [])
+		self.assertFalse(any('DETACH' in sql for sql in executed))
+
+class TestLoanArchival(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='archived', password='testpass', email='archived@example.com')
+		profile = UserProfile.objects.create(user=user, full_name='Archived User', phone_number='08099992222')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=30000, interest_rate=15, max_tenure_months=1)
+		app = LoanApplication.objects.create(applicant=profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250, status='disbursed')
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, status='active', disbursement_date='2024-01-17T00:00:00Z', maturity_date='2024-02-17', outstanding_balance=11500)
+		RepaymentSchedule.objects.create(loan=self.loan, installment_number=1, due_date=date(2024, 2, 17), principal_amount=10000, interest_amount=1500, total_amount=11500, is_paid=True)
+		Payment.objects.create(loan=self.loan, amount=11500, payment_method='bank_transfer', status='successful', payment_date='2024-02-10T00:00:00Z', due_date='2024-02-17')
+
+	def test_closed_loan_moves_to_archive_and_stays_readable(self):
+		Loan.objects.filter(pk=self.loan.pk).update(updated_at=timezone.now() - timedelta(days=400))
+		live = archival.loan_history(self.loan.loan_id)
+		self.assertFalse(live['archived'])
+		self.assertEqual(archival.archive_closed_loans(months=12), 1)
+		self.assertFalse(Loan.objects.filter(pk=self.loan.pk).exists())
+		self.assertFalse(Payment.objects.exists())
+		self.assertFalse(RepaymentSchedule.objects.exists())
+		archived = archival.loan_history(self.loan.loan_id)
+		self.assertTrue(archived['archived'])
+		self.assertEqual(archived['loan'], live['loan'])
+		self.assertEqual(archived['payments'], live['payments'])
+		self.assertEqual(LoanArchive.objects.get().payment_count, 1)
+
+	def test_recently_closed_loans_stay_hot(self):
+		self.assertEqual(archival.archive_closed_loans(months=12), 0)
+		self.assertTrue(Loan.objects.filter(pk=self.loan.pk).exists())
+
+	def test_loan_changed_after_selection_is_not_archived(self):
+		cutoff = archival.archive_cutoff(12)
+		Loan.objects.filter(pk=self.loan.pk).update(updated_at=timezone.now() - timedelta(days=400))
+		self.assertIn(self.loan.pk, archival.archivable_loans(12).values_list('pk', flat=True))
+		Loan.objects.filter(pk=self.loan.pk).update(status='active')
+		self.assertIsNone(archival.archive_loan(self.loan.pk, cutoff))
+		Loan.objects.filter(pk=self.loan.pk).update(status='closed', updated_at=timezone.now())
+		self.assertIsNone(archival.archive_loan(self.loan.pk, cutoff))
+		self.assertTrue(Payment.objects.filter(loan_id=self.loan.pk).exists())
+		self.assertFalse(LoanArchive.objects.exists())
+
+class TestReadReplicaRouting(TestCase):
+	def setUp(self):
+		cache.clear()
+		db_router._lag_checks.clear()
+		self.router = db_router.ReplicaRouter()
+		self.user = User.objects.create_user(username='reader', password='testpass', email='reader@example.com')
+		self.factory = RequestFactory()
+		self.replica_settings = override_settings(DATABASES=dict(
+			default={'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'primary.sqlite3'},
+			replica={'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica.sqlite3'},
+		))
+
+	def test_reads_stay_on_primary_unless_opted_in(self):
+		with self.replica_settings, mock.patch.object(db_router, 'replication_lag_seconds', return_value=0):
+			self.assertIsNone(self.router.db_for_read(Loan))
+			with db_router.use_replica():
+				self.assertEqual(self.router.db_for_read(Loan), 'replica')
+				self.assertEqual(self.router.db_for_write(Loan), 'default')
+
+	def test_no_replica_configured_is_a_noop(self):
+		with override_settings(REPLICA_DATABASE_ALIAS='analytics'), db_router.use_replica():
+			self.assertIsNone(self.router.db_for_read(Loan))
+
+	def test_lagging_replica_falls_back_to_primary(self):
+		with self.replica_settings, mock.patch.object(db_router, 'replication_lag_seconds', return_value=60):
+			with db_router.use_replica():
+				self.assertIsNone(self.router.db_for_read(Loan))
+
+	def test_writes_pin_user_to_primary(self):
+		request = self.factory.get('/api/accounts/loans/')
+		request.user = self.user
+		self.assertTrue(db_router.replica_allowed_for(request))
+
+		post = self.factory.post('/api/accounts/payments/')
+		post.user = self.user
+		with self.replica_settings:
+			db_router.ReplicaStickinessMiddleware(lambda r: HttpResponse(status=201))(post)
+		self.assertFalse(db_router.replica_allowed_for(request))
+
+		post.method = 'GET'
+		self.assertFalse(db_router.replica_allowed_for(post))
+
+	def test_dashboard_overview_reads_from_replica(self):
+		cursor = mock.MagicMock()
+		cursor.fetchone.return_value = (0, 0, 0)
+		request = APIRequestFactory().get('/api/optimized/dashboard/overview/')
+		force_authenticate(request, user=self.user)
+		view = views_optimized.DashboardAnalyticsView.as_view({'get': 'overview'})
+		with self.replica_settings, mock.patch.object(db_router, 'replication_lag_seconds', return_value=0), \
+				mock.patch.object(views_optimized, 'connections') as connections:
+			connections.__getitem__.return_value.cursor.return_value.__enter__.return_value = cursor
+			self.assertEqual(view(request).status_code, 200)
+		connections.__getitem__.assert_called_once_with('replica')
+
+class TestDbPoolStatus(TestCase):
+	def test_admin_sees_pool_metrics(self):
+		admin = User.objects.create_superuser(username='ops', password='testpass', email='ops@example.com')
+		request = APIRequestFactory().get('/api/accounts/health/db-pool/')
+		force_authenticate(request, user=admin)
+		response = views.db_pool_status(request)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['pools']['default'], {'pooled': False, 'vendor': 'sqlite'})
+
+	def test_requires_admin(self):
+		user = User.objects.create_user(username='borrower', password='testpass', email='b@example.com')
+		request = APIRequestFactory().get('/api/accounts/health/db-pool/')
+		force_authenticate(request, user=user)
+		self.assertEqual(views.db_pool_status(request).status_code, 403)
+
+class TestBorrowerDenormalization(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='owner', password='testpass', email='owner@example.com')
+		self.profile = UserProfile.objects.create(user=user, full_name='Owner', phone_number='08011112222')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		self.schedule = RepaymentSchedule.objects.create(loan=self.loan, installment_number=1, due_date=date.today() + timedelta(days=30), principal_amount=10000, interest_amount=1500, total_amount=11500)
+		self.payment = Payment.objects.create(loan=self.loan, amount=5000, payment_method='bank_transfer', status='successful', payment_date=timezone.now(), due_date=date.today())
+
+	def test_borrower_copied_on_create(self):
+		self.assertEqual(self.loan.borrower_id, self.profile.id)
+		self.assertEqual(self.schedule.borrower_id, self.profile.id)
+		self.assertEqual(self.payment.borrower_id, self.profile.id)
+		self.assertEqual(list(Payment.objects.filter(borrower=self.profile)), [self.payment])
+
+	def test_consistency_check_finds_and_repairs_drift(self):
+		self.assertEqual(set(consistency.check_borrower_consistency().values()), {0})
+		Payment.objects.filter(pk=self.payment.pk).update(borrower=None)
+		RepaymentSchedule.objects.filter(pk=self.schedule.pk).update(borrower=None)
+		self.assertEqual(consistency.check_borrower_consistency()['accounts.Payment'], 1)
+		with self.assertRaises(CommandError):
+			call_command('check_borrower_consistency', stdout=StringIO())
+		fixed = consistency.repair_borrower_consistency()
+		self.assertEqual(fixed['accounts.Payment'], 1)
+		self.assertEqual(fixed['accounts.RepaymentSchedule'], 1)
+		self.payment.refresh_from_db()
+		self.assertEqual(self.payment.borrower_id, self.profile.id)
+
+class TestRemitaPayloadOffload(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='payer', password='testpass', email='payer@example.com')
+		self.profile = UserProfile.objects.create(user=user, full_name='Payer', phone_number='08033334444')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		self.payment = Payment.objects.create(loan=self.loan, amount=11500, payment_method='remita_auto', status='successful', payment_date=timezone.now(), due_date=date.today(), remita_rrr='290007781234')
+		self.response = {'statuscode': '00', 'RRR': '290007781234', 'lineItems': [{'amount': '11500'}] * 20}
+		self.payment.store_remita_response(self.response)
+
+	def test_list_rows_do_not_carry_the_payload(self):
+		self.assertNotIn('remita_response', [field.name for field in Payment._meta.concrete_fields])
+		self.assertNotIn('remita_response', PaymentSerializer(self.payment).data)
+		payment = Payment.objects.select_related('remita_payload', 'loan__application__applicant__user', 'loan__application__loan_product').get(pk=self.payment.pk)
+		with self.assertNumQueries(0):
+			self.assertEqual(PaymentDetailSerializer(payment).data['remita_response'], self.response)
+
+	def test_transaction_detail_serves_the_payload(self):
+		collection = RemitaTransaction.objects.create(user_profile=self.profile, loan=self.loan, transaction_type='payment_collection', remita_rrr='290007781234', amount=11500, status='successful')
+		collection.store_response_data(self.response)
+		request = APIRequestFactory().get(f'/api/accounts/remita/transactions/{collection.pk}/')
+		force_authenticate(request, user=self.profile.user)
+		response = views.RemitaTransactionDetail.as_view()(request, pk=collection.pk)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['response_data'], self.response)
+		other = User.objects.create_user(username='nosy', password='testpass', email='nosy@example.com')
+		UserProfile.objects.create(user=other, full_name='Nosy', phone_number='08033335555')
+		request = APIRequestFactory().get(f'/api/accounts/remita/transactions/{collection.pk}/')
+		force_authenticate(request, user=other)
+		self.assertEqual(views.RemitaTransactionDetail.as_view()(request, pk=collection.pk).status_code, 404)
+
+	def test_archive_keeps_the_payload(self):
+		Loan.objects.filter(pk=self.loan.pk).update(status='closed', updated_at=timezone.now() - timedelta(days=400))
+		archival.archive_closed_loans(months=12)
+		self.assertFalse(RemitaPayload.objects.exists())
+		history = archival.loan_history(self.loan.loan_id)
+		self.assertEqual(history['payments'][0]['remita_response'], self.response)
+
+class TestLoanQuotes(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.personal = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=3, max_tenure_months=3, processing_fee_percentage=1.5)
+		self.emergency = LoanProduct.objects.create(name='Emergency Loan', loan_type='emergency', min_amount=1000, max_amount=20000, interest_rate=5, max_tenure_months=1)
+
+	def test_matrix_matches_scalar_pricing(self):
+		result = quotes.compute_quotes([10000, 30000], tenures=[1, 2, 3])
+		personal, emergency = result['products']
+		self.assertEqual(personal['total_interest'][1][0], 600.0)
+		self.assertEqual(personal['monthly_payment'][1][0], 5300.0)
+		self.assertEqual(personal['processing_fee'], [150.0, 450.0])
+		self.assertEqual(emergency['monthly_payment'][0], [10500.0, None])
+		self.assertEqual(emergency['monthly_payment'][2], [None, None])
+		self.assertEqual(emergency['processing_fee'], [250.0, None])
+
+	def test_endpoint_defaults_tenures_and_validates(self):
+		request = APIRequestFactory().get('/api/accounts/loan-quotes/', {'amount': '10000'})
+		response = views.loan_quotes(request)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['tenures'], [1, 2, 3])
+		for amounts in ['10000,abc', '1e400', 'NaN', '-5000', '100000000']:
+			bad = APIRequestFactory().get('/api/accounts/loan-quotes/', {'amounts': amounts})
+			self.assertEqual(views.loan_quotes(bad).status_code, 400, amounts)
+
+	def test_product_changes_drop_cached_quotes(self):
+		self.assertEqual(quotes.get_quotes([10000], [1])['products'][0]['monthly_payment'], [[10300.0]])
+		with self.captureOnCommitCallbacks(execute=True):
+			LoanProduct.objects.filter(pk=self.personal.pk).update(interest_rate=4)
+			LoanProduct.objects.get(pk=self.personal.pk).save()
+		self.assertEqual(quotes.get_quotes([10000], [1])['products'][0]['monthly_payment'], [[10400.0]])
+		with self.captureOnCommitCallbacks(execute=True):
+			self.emergency.delete()
+		self.assertEqual(len(quotes.get_quotes([10000], [1])['products']), 1)
+
+class TestIndexedSearch(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='adaeze', password='testpass', email='adaeze@example.com')
+		self.profile = UserProfile.objects.create(user=user, full_name='Adaeze Okonkwo', phone_number='08055556666', bvn='22233344455')
+		other = User.objects.create_user(username='bola', password='testpass', email='bola@example.com')
+		UserProfile.objects.create(user=other, full_name='Bola Adeyemi', phone_number='08077778888')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		self.app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=self.app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		self.payment = Payment.objects.create(loan=self.loan, amount=5000, payment_method='remita_auto', status='successful', payment_date=timezone.now(), due_date=date.today(), remita_rrr='310007654321')
+
+	def test_name_fragments_use_the_fts_index(self):
+		self.assertTrue(search.profile_fts_available())
+		self.assertEqual(list(search.search(UserProfile.objects.all(), 'konk')), [self.profile])
+		self.assertEqual(list(search.search(Payment.objects.all(), 'adaeze')), [self.payment])
+		UserProfile.objects.filter(pk=self.profile.pk).update(full_name='Adaeze Nwosu')
+		self.assertEqual(list(search.search(UserProfile.objects.all(), 'konk')), [])
+		self.assertEqual(list(search.search(UserProfile.objects.all(), 'nwos')), [self.profile])
+
+	def test_identifiers_take_the_exact_path(self):
+		self.assertEqual(search.classify(self.loan.loan_id.lower()), 'loan')
+		self.assertEqual(list(search.search(Loan.objects.all(), self.loan.loan_id.lower())), [self.loan])
+		self.assertEqual(list(search.search(Loan.objects.all(), self.app.application_id)), [self.loan])
+		self.assertEqual(list(search.search(Payment.objects.all(), '310007654321')), [self.payment])
+		self.assertEqual(list(search.search(UserProfile.objects.all(), '22233344455')), [self.profile])
+
+	def test_admin_changelist_search(self):
+		admin = User.objects.create_superuser(username='support', password='testpass', email='support@example.com')
+		self.client.force_login(admin)
+		response = self.client.get('/admin/accounts/payment/', {'q': 'okonkwo'})
+		self.assertEqual(response.status_code, 200)
+		self.assertContains(response, self.payment.payment_id)
+
+	def test_admin_search_fields_still_apply(self):
+		admin = User.objects.create_superuser(username='support', password='testpass', email='support@example.com')
+		self.client.force_login(admin)
+		response = self.client.get('/admin/accounts/userprofile/', {'q': 'adaeze@example'})
+		self.assertContains(response, 'Adaeze Okonkwo')
+		self.assertNotContains(response, 'Bola Adeyemi')
+		response = self.client.get('/admin/accounts/loan/', {'q': 'adaeze@example.com'})
+		self.assertContains(response, self.loan.loan_id)
+		response = self.client.get('/admin/accounts/payment/', {'q': self.payment.payment_id[:6]})
+		self.assertContains(response, self.payment.payment_id)
+		response = self.client.get('/admin/accounts/payment/', {'q': '3100076'})
+		self.assertContains(response, self.payment.payment_id)
+		response = self.client.get('/admin/autocomplete/', {'app_label': 'accounts', 'model_name': 'loanapplication', 'field_name': 'applicant', 'term': 'adaeze@'})
+		self.assertEqual([item['id'] for item in response.json()['results']], [str(self.profile.pk)])
+
+	def test_api_search_fields_still_apply(self):
+		request = Request(APIRequestFactory().get('/api/optimized/payments/', {'search': self.payment.payment_id[2:7]}))
+		view = mock.Mock(search_fields=['payment_id', 'loan__loan_id'])
+		results = search.IndexedSearchFilter().filter_queryset(request, Payment.objects.all(), view)
+		self.assertEqual(list(results), [self.payment])
+		request = Request(APIRequestFactory().get('/api/optimized/payments/', {'search': 'bola'}))
+		self.assertEqual(list(search.IndexedSearchFilter().filter_queryset(request, Payment.objects.all(), view)), [])
+
+	def test_mounted_lists_search_through_the_index(self):
+		staff = User.objects.create_user(username='support', password='testpass', email='support@example.com', is_staff=True)
+		UserProfile.objects.create(user=staff, full_name='Support Desk', phone_number='08011112222')
+		bola = User.objects.get(username='bola')
+		app = LoanApplication.objects.create(applicant=bola.profile, loan_product=self.app.loan_product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+
+		def get(view, user, term):
+			request = APIRequestFactory().get('/api/accounts/', {'search': term})
+			force_authenticate(request, user=user)
+			return [row['id'] for row in view(request).data['results']]
+
+		self.assertEqual(get(views.LoanList.as_view(), staff, 'konk'), [self.loan.pk])
+		self.assertEqual(get(views.PaymentList.as_view(), staff, '310007654321'), [self.payment.pk])
+		self.assertEqual(get(views.LoanApplicationList.as_view(), staff, self.app.application_id), [self.app.pk])
+		self.assertEqual(get(views.LoanList.as_view(), bola, 'konk'), [])
+
+	def test_profile_search_is_staff_only(self):
+		cache.clear()
+		staff = User.objects.create_user(username='support', password='testpass', email='support@example.com', is_staff=True)
+		bola = User.objects.get(username='bola')
+
+		def get(user, term):
+			request = APIRequestFactory().get('/api/optimized/users/', {'search': term}, HTTP_AUTHORIZATION=f'Bearer {user.username}')
+			force_authenticate(request, user=user)
+			return [row['id'] for row in views_optimized.OptimizedUserProfileViewSet.as_view({'get': 'list'})(request).data['results']]
+
+		self.assertEqual(get(staff, '22233344455'), [self.profile.pk])
+		self.assertEqual(get(bola, '22233344455'), [])
+		self.assertEqual(get(bola, 'bola'), [bola.profile.pk])
+
+class TestSqliteProfile(SimpleTestCase):
+	def test_tuned_pragmas(self):
+		import sqlite3, tempfile, os
+		with tempfile.TemporaryDirectory() as directory:
+			conn = sqlite3.connect(os.path.join(directory, 'profile.sqlite3'))
+			sqlite_profile.apply_pragmas(conn.cursor())
+			self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+			self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+			self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+			conn.close()
+
+	def test_benchmark_runs_both_profiles(self):
+		for tuned in (False, True):
+			result = sqlite_profile.run_benchmark(tuned, threads=2, seconds=1, loans=20)
+			self.assertGreater(result['operations'], 0)
+		self.assertEqual(result['errors'], 0)
+
+class TestBootstrap(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='launcher', password='testpass', email='launcher@example.com')
+		self.profile = UserProfile.objects.create(user=self.user, full_name='Launcher', phone_number='08099990000')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, outstanding_balance=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		RepaymentSchedule.objects.create(loan=self.loan, installment_number=1, due_date=date.today() + timedelta(days=30), principal_amount=10000, interest_amount=1500, total_amount=11500)
+
+	def get(self, etags=None):
+		headers = {'HTTP_IF_NONE_MATCH': ', '.join(f'"{etag}"' for etag in etags)} if etags else {}
+		request = APIRequestFactory().get('/api/accounts/bootstrap/', **headers)
+		force_authenticate(request, user=self.user)
+		return views.app_bootstrap(request)
+
+	def test_first_launch_returns_every_section(self):
+		response = self.get()
+		self.assertEqual(response.status_code, 200)
+		sections = response.data['sections']
+		self.assertEqual(set(sections), set(bootstrap.SECTIONS))
+		self.assertEqual(sections['loans']['data'][0]['loan_id'], self.loan.loan_id)
+		self.assertEqual(sections['next_repayment']['data']['installment_number'], 1)
+		self.assertEqual(sections['dashboard']['data']['active_loans'], 1)
+
+	def test_known_etags_skip_unchanged_sections(self):
+		first = self.get().data
+		etags = [section['etag'] for section in first['sections'].values()]
+		self.assertEqual(self.get([first['etag']]).status_code, 304)
+
+		Payment.objects.create(loan=self.loan, amount=5000, payment_method='bank_transfer', status='pending', payment_date=timezone.now(), due_date=date.today())
+		posting.post_loan_payments(self.loan.pk)
+		sections = self.get(etags).data['sections']
+		self.assertTrue(sections['loan_products']['not_modified'])
+		self.assertTrue(sections['profile']['not_modified'])
+		self.assertEqual(sections['loans']['data'][0]['outstanding_balance'], '6500.00')
+
+	def test_product_changes_drop_the_loan_products_section(self):
+		etag = self.get().data['sections']['loan_products']['etag']
+		with self.captureOnCommitCallbacks(execute=True):
+			LoanProduct.objects.create(name='Emergency Loan', loan_type='emergency', min_amount=1000, max_amount=20000, interest_rate=5, max_tenure_months=1)
+		section = self.get([etag]).data['sections']['loan_products']
+		self.assertNotEqual(section['etag'], etag)
+		self.assertEqual(len(section['data']), 2)
+
+	def test_full_application_create_is_the_borrowers_and_refreshes_the_dashboard(self):
+		self.assertEqual(self.get().data['sections']['dashboard']['data']['total_applications'], 1)
+		other = UserProfile.objects.create(user=User.objects.create_user(username='other', password='testpass'), full_name='Other', phone_number='08099990001')
+		body = {'loan_product_id': self.loan.application.loan_product_id, 'applicant': other.pk, 'requested_amount': '20000.00', 'tenure_months': 3,
+			'interest_rate': '15.00', 'processing_fee': '500.00', 'purpose': 'Rent'}
+		request = APIRequestFactory().post('/api/loan-applications/', body, format='json')
+		force_authenticate(request, user=self.user)
+		response = views.LoanApplicationListCreateView.as_view()(request)
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual(LoanApplication.objects.get(pk=response.data['id']).applicant, self.profile)
+		self.assertEqual(self.get().data['sections']['dashboard']['data']['total_applications'], 2)
+
+class TestDeltaSync(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='syncer', password='testpass', email='syncer@example.com')
+		self.profile = UserProfile.objects.create(user=self.user, full_name='Syncer', phone_number='08012121212')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		self.app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=self.app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		self.schedule = RepaymentSchedule.objects.create(loan=self.loan, installment_number=1, due_date=date.today() + timedelta(days=30), principal_amount=10000, interest_amount=1500, total_amount=11500)
+
+	def get(self, since=None):
+		request = APIRequestFactory().get('/api/accounts/sync/', {'since': since.isoformat()} if since else {})
+		force_authenticate(request, user=self.user)
+		return views.delta_sync(request)
+
+	def test_initial_sync_then_empty_delta(self):
+		first = self.get().data
+		self.assertEqual(first['changes']['loans'][0]['loan_id'], self.loan.loan_id)
+		self.assertEqual(len(first['changes']['repayment_schedule']), 1)
+		later = timezone.now() + timedelta(seconds=10)
+		with self.assertNumQueries(5):
+			delta = sync.sync_changes(self.profile, since=later)
+		self.assertEqual(delta['changes'], {entity: [] for entity in sync.SYNC_ENTITIES})
+		self.assertEqual(delta['deleted'], {})
+		bad = APIRequestFactory().get('/api/accounts/sync/', {'since': 'yesterday'})
+		force_authenticate(bad, user=self.user)
+		self.assertEqual(views.delta_sync(bad).status_code, 400)
+
+	def test_posting_and_deletes_show_up_in_the_delta(self):
+		since = timezone.now()
+		payment = Payment.objects.create(loan=self.loan, amount=5000, payment_method='bank_transfer', status='pending', payment_date=timezone.now(), due_date=date.today())
+		Payment.objects.filter(pk=payment.pk).update(updated_at=since - timedelta(minutes=1))
+		posting.post_loan_payments(self.loan.pk)
+		delta = self.get(since).data
+		self.assertEqual([row['status'] for row in delta['changes']['payments']], ['successful'])
+		self.assertEqual(delta['changes']['applications'], [])
+
+		since = timezone.now()
+		loan_pk = self.loan.pk
+		self.loan.delete()
+		delta = self.get(since).data
+		self.assertEqual(delta['deleted']['loans'], [loan_pk])
+		self.assertEqual(delta['deleted']['payments'], [payment.pk])
+		self.assertEqual(delta['deleted']['repayment_schedule'], [self.schedule.pk])
+
+	def test_paging_and_stale_watermarks(self):
+		since = timezone.now() - timedelta(minutes=1)
+		delta = sync.sync_changes(self.profile, since=since, limit=1)
+		self.assertTrue(delta['has_more'])
+		self.assertEqual(sync.decode_cursor(delta['next_cursor'])[0], since)
+		self.assertTrue(sync.sync_changes(self.profile, since=since - timedelta(days=365))['full_resync'])
+		SyncTombstone.objects.create(borrower=self.profile, entity='loans', object_id=1, deleted_at=timezone.now() - timedelta(days=365))
+		self.assertEqual(sync.prune_tombstones(), 1)
+
+	def test_pages_through_rows_sharing_one_timestamp(self):
+		payments = [Payment.objects.create(loan=self.loan, amount=1000, payment_method='cash', status='successful', payment_date=timezone.now(), due_date=date.today()) for _ in range(5)]
+		stamp = timezone.now() - timedelta(minutes=1)
+		Payment.objects.filter(loan=self.loan).update(updated_at=stamp)
+		seen, params = [], {'since': stamp.isoformat()}
+		with override_settings(SYNC_PAGE_SIZE=2):
+			for page in range(5):
+				request = APIRequestFactory().get('/api/accounts/sync/', params)
+				force_authenticate(request, user=self.user)
+				delta = views.delta_sync(request).data
+				seen += [row['id'] for row in delta['changes']['payments']]
+				if not delta['has_more']:
+					break
+				params = {'cursor': delta['next_cursor']}
+		self.assertFalse(delta['has_more'])
+		self.assertEqual(seen, sorted(payment.pk for payment in payments))
+
+	def test_cursor_round_trip_and_validation(self):
+		after = {'payments': (timezone.now(), 7)}
+		since = timezone.now() - timedelta(hours=1)
+		self.assertEqual(sync.decode_cursor(sync.encode_cursor(since, since, after)), (since, since, after))
+		for cursor in ['not-a-cursor', sync.encode_cursor(None)[:-4], 'e30=']:
+			request = APIRequestFactory().get('/api/accounts/sync/', {'cursor': cursor})
+			force_authenticate(request, user=self.user)
+			self.assertEqual(views.delta_sync(request).status_code, 400, cursor)
+
+class TestRemitaClient(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.stub = StubRemitaServer().start()
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.stub.stop()
+		super().tearDownClass()
+
+	def setUp(self):
+		self.stub.latency = 0
+		# A request that timed out in the previous test may still be sleeping in the stub
+		deadline = time.monotonic() + 5
+		while self.stub.in_flight and time.monotonic() < deadline:
+			time.sleep(0.01)
+		self.stub.max_in_flight = 0
+		self.settings_override = override_settings(REMITA={'BASE_URL': self.stub.url, 'MERCHANT_ID': 'm', 'API_KEY': 'k', 'API_TOKEN': 't', 'MAX_CONCURRENCY': 2, 'READ_TIMEOUT': 1})
+		self.settings_override.enable()
+		remita.reset_client()
+		user = User.objects.create_user(username='corper', password='testpass', email='corper@example.com')
+		self.profile = UserProfile.objects.create(user=user, full_name='Corper', phone_number='08031234567')
+		self.user = user
+
+	def tearDown(self):
+		remita.reset_client()
+		self.settings_override.disable()
+
+	def test_sync_and_async_calls_share_a_bounded_pool(self):
+		self.assertEqual(remita.call('salary_history', '08031234567', 'code')['data']['companyName'], 'NYSC')
+		self.stub.latency = 0.05
+
+		async def burst():
+			return await asyncio.gather(*(remita.acall('salary_history', '08031234567', 'code') for _ in range(6)))
+
+		self.assertEqual(len(asyncio.run(burst())), 6)
+		self.assertLessEqual(self.stub.max_in_flight, 2)
+
+	def test_failures_are_classified(self):
+		with self.assertRaises(remita.RemitaError) as raised:
+			remita.call('salary_history', '00012345678', 'code')
+		self.assertNotIsInstance(raised.exception, remita.RemitaUnavailable)
+		self.stub.latency = 1.5
+		with self.assertRaises(remita.RemitaUnavailable):
+			remita.call('salary_history', '08031234567', 'code')
+
+	def test_non_object_bodies_are_errors(self):
+		for body in ([], 'SUCCESSFUL', None):
+			with mock.patch.dict('accounts.remita_stub.ROUTES', {remita.SALARY_HISTORY_PATH: lambda request, body=body: body}):
+				with self.assertRaises(remita.RemitaError) as raised:
+					remita.call('salary_history', '08031234567', 'code')
+			self.assertNotIsInstance(raised.exception, remita.RemitaUnavailable)
+
+	def test_gevent_workers_use_the_blocking_client(self):
+		self.assertFalse(remita.use_sync_client())
+		patched = mock.Mock(is_module_patched=lambda name: name == 'socket')
+		with mock.patch.dict(sys.modules, {'gevent.monkey': patched}):
+			self.assertTrue(remita.use_sync_client())
+			self.stub.latency = 0.05
+			with ThreadPoolExecutor(max_workers=6) as executor:
+				results = list(executor.map(lambda _: remita.call('salary_history', '08031234567', 'code'), range(6)))
+			self.assertEqual({result['data']['companyName'] for result in results}, {'NYSC'})
+			self.assertLessEqual(self.stub.max_in_flight, 2)
+			self.assertIsNone(remita._runtime)  # no event-loop thread was started
+			with override_settings(REMITA=dict(settings.REMITA, SYNC_CLIENT=False)):
+				self.assertFalse(remita.use_sync_client())
+
+	def test_verify_salary_records_the_transaction(self):
+		request = APIRequestFactory().post('/api/accounts/remita/verify-salary/', {'authorisation_code': 'code'}, format='json')
+		force_authenticate(request, user=self.user)
+		response = views.verify_salary(request)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['employer'], 'NYSC')
+		transaction = RemitaTransaction.objects.get(user_profile=self.profile)
+		self.assertEqual(transaction.response_data['data']['customerId'], '08031234567')
+		self.profile.refresh_from_db()
+		self.assertTrue(self.profile.salary_account_verified)
+
+	def test_incomplete_responses_are_rejected(self):
+		ok = {'status': 'success', 'responseId': 'R1', 'responseCode': remita.SUCCESS_CODE, 'responseMsg': 'SUCCESSFUL'}
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=30000, interest_rate=15, max_tenure_months=1)
+		app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+
+		def post(view, path, data):
+			request = APIRequestFactory().post(path, data, format='json')
+			force_authenticate(request, user=self.user)
+			return view(request)
+
+		routes = {
+			remita.SALARY_HISTORY_PATH: lambda body: dict(ok, data={'salaryPaymentDetails': [{'paymentDate': '25-01-2026 00:00:00+0000'}]}),
+			remita.DISBURSEMENT_PATH: lambda body: dict(ok, data={'customerId': body.get('customerId')}),
+		}
+		with mock.patch.dict('accounts.remita_stub.ROUTES', routes) as stub_routes:
+			response = post(views.verify_salary, '/api/accounts/remita/verify-salary/', {'authorisation_code': 'code'})
+			self.assertEqual(response.status_code, 400)
+			self.assertIn('incomplete response', response.data['error'])
+			self.assertEqual(post(views.setup_mandate, '/api/accounts/remita/setup-mandate/', {'loan_id': loan.pk}).status_code, 400)
+			stub_routes[remita.SALARY_HISTORY_PATH] = lambda body: dict(ok, data=['not', 'an', 'object'])
+			self.assertEqual(post(views.verify_salary, '/api/accounts/remita/verify-salary/', {'authorisation_code': 'code'}).status_code, 400)
+		self.assertFalse(RemitaTransaction.objects.exists())
+		loan.refresh_from_db()
+		self.assertFalse(loan.remita_mandate_id)
+
+@override_settings(REMITA={'WEBHOOK_SECRET': 'webhook-secret'})
+class TestRemitaWebhook(TestCase):
+	def setUp(self):
+		user = User.objects.create_user(username='payee', password='testpass', email='payee@example.com')
+		self.profile = UserProfile.objects.create(user=user, full_name='Payee', phone_number='08044445555')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		app = LoanApplication.objects.create(applicant=self.profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30), remita_mandate_id='MND0001')
+		self.collection = RemitaTransaction.objects.create(user_profile=self.profile, loan=self.loan, transaction_type='payment_collection', remita_rrr='310000000001', amount=4000, status='pending')
+		self.pending = Payment.objects.create(loan=self.loan, amount=2000, payment_method='remita_manual', status='pending', payment_date=timezone.now(), due_date=date.today(), remita_rrr='310000000002')
+
+	def post(self, payload, secret='webhook-secret'):
+		body = json.dumps(payload).encode('utf-8')
+		signature = hmac.new(secret.encode('utf-8'), body, hashlib.sha512).hexdigest()
+		request = APIRequestFactory().post('/api/accounts/remita/webhook/', body, content_type='application/json', HTTP_X_REMITA_SIGNATURE=signature)
+		return views.remita_webhook(request)
+
+	def test_receipt_is_one_insert_and_deduplicated(self):
+		notifications = [
+			{'rrr': '310000000001', 'amount': '4000.00', 'responseCode': '00', 'orderRef': 'ORD-1', 'debitdate': '2026-10-18 10:00:00'},
+			{'rrr': '310000000002', 'amount': '2000.00', 'responseCode': '00', 'orderRef': 'ORD-2'},
+		]
+		self.assertEqual(self.post(notifications, secret='wrong').status_code, 403)
+		with self.assertNumQueries(1):
+			self.assertEqual(self.post(notifications).status_code, 200)
+		self.assertEqual(self.post(notifications[:1]).status_code, 200)
+		self.assertEqual(RemitaWebhookEvent.objects.count(), 2)
+		self.assertEqual(self.post({'amount': 1}).status_code, 400)
+
+	def test_consumer_applies_events_through_posting(self):
+		self.post([
+			{'rrr': '310000000001', 'amount': '4000.00', 'responseCode': '00', 'orderRef': 'ORD-1'},
+			{'rrr': '310000000002', 'amount': '2000.00', 'responseCode': '00', 'orderRef': 'ORD-2'},
+			{'rrr': '319999999999', 'amount': '100.00', 'responseCode': '00', 'orderRef': 'ORD-3'},
+			{'mandateId': 'MND0001', 'status': 'ACTIVE', 'requestId': 'REQ-1'},
+		])
+		counts = webhooks.process_pending_events()
+		self.assertEqual(counts, {'events': 4, 'applied': 3, 'ignored': 1})
+		self.loan.refresh_from_db()
+		self.assertEqual(self.loan.total_paid, Decimal('6000.00'))
+		self.assertTrue(self.loan.auto_deduction_active)
+		created = Payment.objects.get(remita_rrr='310000000001')
+		self.assertEqual((created.status, created.amount), ('successful', Decimal('4000.00')))
+		self.assertEqual(created.remita_response['orderRef'], 'ORD-1')
+		self.collection.refresh_from_db()
+		self.assertEqual(self.collection.status, 'successful')
+		self.assertFalse(RemitaWebhookEvent.objects.filter(processed_at__isnull=True).exists())
+		self.assertEqual(webhooks.process_pending_events(), {'events': 0})
+
+	def test_missing_codes_fail_and_duplicate_rrrs_apply_once(self):
+		self.post([
+			{'rrr': '310000000002', 'amount': '2000.00', 'orderRef': 'ORD-0'},
+			{'rrr': '310000000001', 'amount': '4000.00', 'responseCode': '00', 'orderRef': 'ORD-1'},
+			{'rrr': '310000000001', 'amount': '4000.00', 'responseCode': '00', 'orderRef': 'ORD-1-RETRY'},
+			{'rrr': '310000000002', 'amount': '2000.00', 'status': '00', 'orderRef': 'ORD-2'},
+			{'rrr': '310000000002', 'amount': '2000.00', 'responseCode': '02', 'orderRef': 'ORD-2-LATE'},
+		])
+		self.assertEqual(webhooks.process_pending_events(), {'events': 5, 'applied': 2, 'ignored': 2, 'failed': 1})
+		self.assertEqual(RemitaWebhookEvent.objects.get(transaction_id='ORD-0').detail, 'Notification has no response code')
+		self.assertEqual(Payment.objects.filter(remita_rrr='310000000001').count(), 1)
+		self.loan.refresh_from_db()
+		self.assertEqual(self.loan.total_paid, Decimal('6000.00'))
+
+class TestDataExports(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_user(username='finance', password='testpass', email='finance@example.com', is_staff=True)
+		self.user = User.objects.create_user(username='borrower', password='testpass', email='borrower@example.com')
+		profile = UserProfile.objects.create(user=self.user, full_name='Export, "Borrower"', phone_number='08055550000')
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		app = LoanApplication.objects.create(applicant=profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		self.loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		Payment.objects.bulk_create([
+			Payment(loan=self.loan, borrower=profile, payment_id=f"PYEXP{index:04d}", amount=Decimal('100.50'), payment_method='bank_transfer',
+				status='successful' if index % 2 else 'pending', payment_date=datetime(2026, 1 + index % 2, 10, tzinfo=dt_timezone.utc), due_date=date(2026, 1, 10))
+			for index in range(7)
+		])
+
+	def download(self, filename, user=None, **params):
+		request = APIRequestFactory().get(f'/api/accounts/exports/{filename}', params)
+		force_authenticate(request, user=user or self.admin)
+		return views.export_download(request, filename=filename)
+
+	def test_csv_is_streamed_in_keyset_pages(self):
+		stream = exports.ExportStream('payments', chunk_size=3)
+		with self.assertNumQueries(3):
+			chunks = list(stream)
+		self.assertEqual(len(chunks), 4)  # header + 3 pages
+		lines = b''.join(chunks).decode('utf-8').splitlines()
+		self.assertEqual(lines[0].split(',')[:4], ['payment_id', 'loan_id', 'borrower_id', 'amount'])
+		self.assertEqual(len(lines), 8)
+		self.assertEqual(stream.rows, 7)
+		self.assertTrue(lines[1].startswith(f"PYEXP0000,{self.loan.loan_id},"))
+		self.assertIn('2026-01-10T00:00:00+00:00', lines[1])
+		loans = b''.join(exports.ExportStream('loans')).decode('utf-8')
+		self.assertIn('"Export, ""Borrower"""', loans)
+
+	def test_ndjson_gzip_and_filters(self):
+		response = self.download('payments.ndjson.gz', start='2026-02-01', status='successful')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Content-Type'], 'application/gzip')
+		self.assertIn('payments.ndjson.gz', response['Content-Disposition'])
+		rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+		self.assertEqual([row['payment_id'] for row in rows], ['PYEXP0001', 'PYEXP0003', 'PYEXP0005'])
+		self.assertEqual(rows[0]['amount'], '100.50')
+
+		self.assertEqual(self.download('payments.xml').status_code, 400)
+		self.assertEqual(self.download('payments.csv', start='last week').status_code, 400)
+		self.assertEqual(self.download('payments.csv', user=self.user).status_code, 403)
+
+	def test_background_export_and_command(self):
+		request = APIRequestFactory().post('/api/accounts/exports/', {'export': 'schedules', 'format': 'csv', 'compress': True, 'filters': {'start': 'soon'}}, format='json')
+		force_authenticate(request, user=self.admin)
+		self.assertEqual(views.export_jobs(request).status_code, 400)
+
+		request = APIRequestFactory().post('/api/accounts/exports/', {'export': 'payments', 'format': 'csv', 'compress': True}, format='json')
+		force_authenticate(request, user=self.admin)
+		with mock.patch.object(views.run_data_export, 'delay') as delay, self.captureOnCommitCallbacks(execute=True):
+			response = views.export_jobs(request)
+		self.assertEqual(response.status_code, 202)
+		export = DataExport.objects.get(pk=response.data['id'])
+		delay.assert_called_once_with(export.pk)
+
+		with tempfile.TemporaryDirectory() as media, override_settings(EXPORT_ROOT=media):
+			self.assertEqual(exports.run_export(export), 7)
+			export.refresh_from_db()
+			self.assertEqual((export.status, export.row_count), ('completed', 7))
+			with export.file.open('rb') as artifact:
+				self.assertEqual(len(gzip.decompress(artifact.read()).splitlines()), 8)
+
+			path = os.path.join(media, 'loans.csv')
+			out = StringIO()
+			call_command('export_data', 'loans', '--output', path, stdout=out)
+			self.assertIn('Exported 1 loans rows', out.getvalue())
+			with open(path, 'rb') as output:
+				self.assertIn(self.loan.loan_id.encode('utf-8'), output.read())
+
+	def test_export_files_are_private_and_staff_only(self):
+		export = DataExport.objects.create(export='payments', format='csv', requested_by=self.admin)
+		with tempfile.TemporaryDirectory() as media, tempfile.TemporaryDirectory() as private, \
+				override_settings(MEDIA_ROOT=media, EXPORT_ROOT=private, EXPORT_ACCEL_REDIRECT_PREFIX=''):
+			exports.run_export(export)
+			export.refresh_from_db()
+			self.assertEqual(os.listdir(media), [])
+			token, filename = export.file.name.split('/')
+			self.assertEqual((len(token), filename), (32, 'payments.csv'))
+			self.assertTrue(os.path.isfile(os.path.join(private, token, filename)))
+
+			request = APIRequestFactory().get(f'/api/accounts/exports/jobs/{export.pk}/')
+			force_authenticate(request, user=self.admin)
+			url = views.export_job_detail(request, pk=export.pk).data['file']
+			self.assertTrue(url.endswith(f'/api/accounts/exports/jobs/{export.pk}/download/'))
+
+			request = APIRequestFactory().get(url)
+			force_authenticate(request, user=self.user)
+			self.assertEqual(views.export_job_download(request, pk=export.pk).status_code, 403)
+
+			request = APIRequestFactory().get(url)
+			force_authenticate(request, user=self.admin)
+			response = views.export_job_download(request, pk=export.pk)
+			self.assertEqual((response.status_code, response['Cache-Control']), (200, 'no-store'))
+			self.assertIn('filename="payments.csv"', response['Content-Disposition'])
+			self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 8)
+			response.close()
+
+			with override_settings(EXPORT_ACCEL_REDIRECT_PREFIX='/protected-exports/'):
+				response = views.export_job_download(request, pk=export.pk)
+			self.assertEqual(response['X-Accel-Redirect'], f'/protected-exports/{token}/payments.csv')
+			self.assertEqual(response.content, b'')
+
+class TestAdminPerformance(TestCase):
+	def setUp(self):
+		self.product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		self.admin = User.objects.create_superuser(username='backoffice', password='testpass', email='backoffice@example.com')
+		self.client.force_login(self.admin)
+		self.borrowers = 0
+		self.first_loan = self.add_borrower()
+
+	def add_borrower(self):
+		self.borrowers += 1
+		user = User.objects.create_user(username=f'admin-borrower-{self.borrowers}', password='testpass')
+		profile = UserProfile.objects.create(user=user, full_name=f'Borrower {self.borrowers}')
+		app = LoanApplication.objects.create(applicant=profile, loan_product=self.product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+		Payment.objects.create(loan=loan, amount=1000, payment_method='bank_transfer', status='successful', payment_date=timezone.now(), due_date=date.today())
+		RepaymentSchedule.objects.create(loan=loan, installment_number=1, due_date=date.today(), principal_amount=10000, interest_amount=1500, total_amount=11500)
+		RemitaTransaction.objects.create(user_profile=profile, loan=loan, transaction_type='payment_collection', remita_rrr=f'3100000000{self.borrowers:02d}', status='pending')
+		return loan
+
+	def changelist_queries(self, url):
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(self.client.get(url).status_code, 200)
+		return len(queries)
+
+	def test_changelist_queries_do_not_grow_with_rows(self):
+		urls = ['/admin/accounts/loanapplication/', '/admin/accounts/loan/', '/admin/accounts/payment/',
+			'/admin/accounts/repaymentschedule/', '/admin/accounts/remitatransaction/']
+		before = {url: self.changelist_queries(url) for url in urls}
+		for _ in range(3):
+			self.add_borrower()
+		self.assertEqual({url: self.changelist_queries(url) for url in urls}, before)
+
+	def test_change_forms_do_not_render_whole_tables(self):
+		loan = self.add_borrower()
+		response = self.client.get(f'/admin/accounts/loan/{loan.pk}/change/')
+		self.assertEqual(response.status_code, 200)
+		self.assertContains(response, 'admin-autocomplete')
+		self.assertContains(response, f'<option value="{loan.application_id}" selected>')
+		self.assertNotContains(response, f'<option value="{self.first_loan.application_id}"')
+		response = self.client.get(f'/admin/accounts/loanapplication/{loan.application_id}/change/')
+		self.assertContains(response, 'vForeignKeyRawIdAdminField')  # reviewed_by
+
+	def test_unfiltered_counts_use_the_estimate_on_large_tables(self):
+		with mock.patch.object(admin_performance, 'estimated_row_count', return_value=2000000):
+			self.assertEqual(admin_performance.EstimatedCountPaginator(Payment.objects.order_by('pk'), 100).count, 2000000)
+			self.assertEqual(admin_performance.EstimatedCountPaginator(Payment.objects.filter(status='successful').order_by('pk'), 100).count, 1)
+		with mock.patch.object(admin_performance, 'estimated_row_count', return_value=10):
+			self.assertEqual(admin_performance.EstimatedCountPaginator(Payment.objects.order_by('pk'), 100).count, 1)
+		self.assertIsNone(admin_performance.estimated_row_count(Payment))  # SQLite
+
+class TestBulkActions(TestCase):
+	def setUp(self):
+		self.admin = User.objects.create_superuser(username='collections', password='testpass', email='collections@example.com')
+		self.client.force_login(self.admin)
+		product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+		self.loans = []
+		for index in range(3):
+			user = User.objects.create_user(username=f'bulk-{index}', password='testpass')
+			profile = UserProfile.objects.create(user=user, full_name=f'Bulk {index}')
+			app = LoanApplication.objects.create(applicant=profile, loan_product=product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+			loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+			# bulk_create skips Payment.save(), leaving the loan's stored balance stale
+			Payment.objects.bulk_create([Payment(loan=loan, borrower=profile, payment_id=f'PYBULK{index}', amount=1500, payment_method='cash', status='successful', payment_date=timezone.now(), due_date=date.today())])
+			self.loans.append(loan)
+
+	def post_action(self, action):
+		return self.client.post('/admin/accounts/loan/', {'action': action, '_selected_action': [loan.pk for loan in self.loans]})
+
+	def test_small_selection_runs_inline_and_recomputes_balances(self):
+		cache.set(bootstrap.section_cache_key('loans', self.loans[0].borrower_id), ('loans:stale', []))
+		self.assertEqual(self.post_action('mark_as_defaulted').status_code, 302)
+		for loan in Loan.objects.filter(pk__in=[loan.pk for loan in self.loans]):
+			self.assertEqual((loan.status, loan.total_paid, loan.outstanding_balance), ('defaulted', Decimal('1500.00'), Decimal('10000.00')))
+		self.assertIsNone(cache.get(bootstrap.section_cache_key('loans', self.loans[0].borrower_id)))
+		self.assertFalse(BulkActionJob.objects.exists())
+
+	@override_settings(ADMIN_BULK_SYNC_LIMIT=1)
+	def test_large_selection_is_queued_and_resumes_after_a_failure(self):
+		with mock.patch('accounts.tasks.run_bulk_action_job.delay') as delay, self.captureOnCommitCallbacks(execute=True):
+			response = self.post_action('mark_as_closed')
+		job = BulkActionJob.objects.get()
+		delay.assert_called_once_with(job.pk)
+		self.assertEqual((job.status, job.total, job.object_ids), ('pending', 3, sorted(loan.pk for loan in self.loans)))
+		self.assertEqual(Loan.objects.filter(status='closed').count(), 0)
+		self.assertContains(self.client.get(response.url), f'/admin/accounts/bulkactionjob/{job.pk}/change/')
+
+		with mock.patch.object(bulk_actions, 'set_loan_status', side_effect=[2, DatabaseError('lock timeout')]):
+			with self.assertRaises(DatabaseError):
+				bulk_actions.run_job(job.pk, size=2)
+		job.refresh_from_db()
+		self.assertEqual((job.status, job.processed, job.error), ('failed', 2, 'lock timeout'))
+
+		job = bulk_actions.run_job(job.pk, size=2)
+		self.assertEqual((job.status, job.processed, job.changed, job.percent_done), ('completed', 3, 3, 100))
+		self.assertEqual(list(Loan.objects.filter(status='closed').values_list('pk', flat=True)), [self.loans[2].pk])
+		self.assertContains(self.client.get(f'/admin/accounts/bulkactionjob/{job.pk}/change/'), '3 / 3 (100%)')
+
+class TestIdempotency(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='retrier', password='testpass', email='retrier@example.com')
+		self.profile = UserProfile.objects.create(user=self.user, full_name='Retrier', phone_number='08031313131')
+		self.product = LoanProduct.objects.create(name='Personal Loan', loan_type='personal', min_amount=5000, max_amount=50000, interest_rate=15, max_tenure_months=3)
+
+	def register(self, key, username='flaky'):
+		body = {'username': username, 'email': f'{username}@example.com', 'password': 'longpassword1', 'full_name': 'Flaky Network'}
+		request = APIRequestFactory().post('/api/accounts/auth/register/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+		return views.register_view(request)
+
+	def apply(self, key):
+		request = APIRequestFactory().post('/api/accounts/loan-applications/', {'loan_product': self.product.pk, 'requested_amount': '10000.00', 'tenure_months': 1, 'purpose': 'Rent'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+		force_authenticate(request, user=self.user)
+		return views.LoanApplicationList.as_view()(request)
+
+	def test_retries_replay_the_first_response(self):
+		first = self.register('3f1c2a9e-0001')
+		self.assertEqual(first.status_code, 201)
+		with self.assertNumQueries(0):
+			retry = self.register('3f1c2a9e-0001')
+		self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (201, 'true'))
+		self.assertEqual(retry.data['user_id'], first.data['user_id'])
+		self.assertEqual(User.objects.filter(username='flaky').count(), 1)
+		self.assertEqual(self.register('3f1c2a9e-0001', username='someone-else').status_code, 422)
+
+		self.assertEqual(self.apply('loan-key-1').status_code, 201)
+		self.assertEqual(self.apply('loan-key-1').status_code, 201)
+		self.assertEqual(self.apply('loan-key-2').status_code, 201)
+		self.assertEqual(LoanApplication.objects.filter(applicant=self.profile).count(), 2)
+
+	def test_concurrent_duplicates_are_rejected_and_errors_not_stored(self):
+		request = APIRequestFactory().post('/api/accounts/auth/register/', {}, format='json', HTTP_IDEMPOTENCY_KEY='busy')
+		request.user = None
+		cache.add(idempotency.cache_key('register', request, 'busy') + '_lock', 1)
+		self.assertEqual(self.register('busy').status_code, 409)
+
+		app = LoanApplication.objects.create(applicant=self.profile, loan_product=self.product, requested_amount=10000, tenure_months=1, interest_rate=15, processing_fee=250)
+		loan = Loan.objects.create(application=app, principal_amount=10000, interest_amount=1500, total_amount=11500, monthly_payment=11500, disbursement_date=timezone.now(), maturity_date=date.today() + timedelta(days=30))
+
+		def setup(key):
+			request = APIRequestFactory().post('/api/accounts/remita/setup-mandate/', {'loan_id': loan.pk}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+			force_authenticate(request, user=self.user)
+			return views.setup_mandate(request)
+
+		with mock.patch.object(remita, 'is_configured', return_value=True), \
+				mock.patch.object(remita, 'call', side_effect=[remita.RemitaUnavailable('down'), {'responseId': 'R1', 'data': {'mandateReference': 'MR1'}}]) as call:
+			self.assertEqual(setup('mandate-key').status_code, 503)
+			self.assertEqual(setup('mandate-key').status_code, 200)
+			self.assertEqual(setup('mandate-key').data['mandate_id'], 'MR1')
+		self.assertEqual(call.call_count, 2)
+
+	def test_retry_that_takes_the_lock_after_the_first_finished_replays(self):
+		first = self.register('late-lock')
+		self.assertEqual(first.status_code, 201)
+		stored_key = idempotency.cache_key('register', mock.Mock(user=None), 'late-lock')
+		stored = cache.get(stored_key)
+		# The retry's first lookup misses; by the time it takes the lock the first request has stored and released
+		lookups = iter([None])
+		with mock.patch.object(idempotency.cache, 'get', side_effect=lambda key: next(lookups, stored) if key == stored_key else None):
+			retry = self.register('late-lock')
+		self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (201, 'true'))
+		self.assertEqual(retry.data['user_id'], first.data['user_id'])
+		self.assertEqual(User.objects.filter(username='flaky').count(), 1)
+		self.assertTrue(cache.add(stored_key + '_lock', 1))
+
+class TestThrottling(TestCase):
+	RATES = {'login_ip': '4/min', 'login_identifier': '2/min', 'register_ip': '10/hour', 'register_identifier': '1/hour'}
+
+	def setUp(self):
+		cache.clear()
+		User.objects.create_user(username='target', password='testpass', email='target@example.com')
+		# Pin the throttle clock mid-window so a minute boundary cannot fall inside a test
+		clock = mock.patch.object(throttling, 'time', mock.Mock(time=mock.Mock(return_value=1230.0)))
+		clock.start()
+		self.addCleanup(clock.stop)
+
+	def login(self, username, password='wrong', ip='10.0.0.1'):
+		request = APIRequestFactory().post('/api/accounts/auth/login/', {'username': username, 'password': password}, format='json', REMOTE_ADDR=ip)
+		return views.login_view(request)
+
+	def test_sliding_window_weights_the_previous_window(self):
+		for second in (0, 10, 20):
+			self.assertTrue(throttling.hit('k', 3, 60, now=1200 + second)[0])
+		allowed, wait = throttling.hit('k', 3, 60, now=1250)
+		self.assertFalse(allowed)
+		self.assertAlmostEqual(wait, 10)
+		# 30s into the next window the previous three count as 1.5
+		self.assertTrue(throttling.hit('k', 3, 60, now=1290)[0])
+		self.assertTrue(throttling.hit('k', 3, 60, now=1291)[0])
+		self.assertFalse(throttling.hit('k', 3, 60, now=1292)[0])
+		self.assertTrue(throttling.hit('k', 3, 60, now=1320)[0])
+
+	def test_login_is_rejected_before_the_password_is_checked(self):
+		with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': self.RATES}), \
+				mock.patch.object(views, 'authenticate', return_value=None) as authenticate:
+			self.assertEqual([self.login('Target').status_code for _ in range(3)], [401, 401, 429])
+			self.assertEqual(authenticate.call_count, 2)
+			self.assertEqual(self.login('someone').status_code, 401)
+			# the IP limit catches a spray across usernames
+			response = self.login('another')
+			self.assertEqual(response.status_code, 429)
+			self.assertIn('Retry-After', response)
+			self.assertEqual(self.login('another', ip='10.0.0.2').status_code, 401)
+			self.assertEqual(authenticate.call_count, 4)
+
+	def test_register_is_limited_per_email(self):
+		def register(username, email):
+			body = {'username': username, 'email': email, 'password': 'longpassword1', 'full_name': 'New Corper'}
+			return views.register_view(APIRequestFactory().post('/api/accounts/auth/register/', body, format='json'))
+
+		with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': self.RATES}):
+			self.assertEqual(register('corper1', 'corper@example.com').status_code, 201)
+			self.assertEqual(register('corper2', ' Corper@Example.com').status_code, 429)
+			self.assertEqual(register('corper3', 'other@example.com').status_code, 201)
+
+	def test_redis_script_and_fail_open(self):
+		script = mock.Mock(return_value=[0, '12.5'])
+		with mock.patch.object(throttling, '_redis_script', return_value=script):
+			self.assertEqual(throttling.hit('k', 5, 60, now=130), (False, 12.5))
+		keys = script.call_args.kwargs['keys']
+		self.assertEqual(keys, [cache.make_key('k_2'), cache.make_key('k_1')])
+		self.assertEqual(script.call_args.kwargs['args'], [5, 60, 10])
+
+		with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': self.RATES}), \
+				mock.patch.object(throttling, 'hit', side_effect=ConnectionError('redis down')):
+			self.assertEqual([self.login('target').status_code for _ in range(3)], [401, 401, 401])
+
+	def test_redis_backend_is_detected_on_the_configured_cache(self):
+		self.assertIsNone(throttling._redis_script())
+		redis_cache = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/15'}}
+		with override_settings(CACHES=redis_cache), mock.patch.object(throttling, '_script', None):
+			# Registering the script only hashes it; nothing is sent to Redis yet
+			script = throttling._redis_script()
+			self.assertEqual(script.script, throttling.SLIDING_WINDOW_LUA)
+			self.assertIs(throttling._redis_script(), script)
+
+	def test_forwarded_for_rotation_keeps_the_ip_bucket(self):
+		def login(forwarded_for):
+			request = APIRequestFactory().post('/api/accounts/auth/login/', {'username': f'user-{forwarded_for}', 'password': 'wrong'},
+				format='json', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR=f'{forwarded_for}, 203.0.113.7')
+			return views.login_view(request).status_code
+
+		with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': self.RATES, 'NUM_PROXIES': 1}):
+			self.assertEqual([login(f'198.51.100.{n}') for n in range(5)], [401, 401, 401, 401, 429])
+
+class TestCachedPrincipal(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = User.objects.create_user(username='cached', password='testpass', email='cached@example.com')
+		self.profile = UserProfile.objects.create(user=self.user, full_name='Cached Corper', phone_number='08041414141')
+
+	def get(self, token, prefix='Bearer'):
+		with CaptureQueriesContext(connection) as queries:
+			response = self.client.get('/api/accounts/profile/', HTTP_AUTHORIZATION=f'{prefix} {token}')
+		principal = [q for q in queries.captured_queries if 'auth_user' in q['sql'] and 'accounts_userprofile' in q['sql']]
+		return response, len(principal), len(queries.captured_queries)
+
+	def test_principal_is_cached_until_user_or_profile_changes(self):
+		access = str(authentication.token_for_user(self.user).access_token)
+		response, loads, first_total = self.get(access)
+		self.assertEqual((response.status_code, loads), (200, 1))
+		self.assertEqual(response.data['full_name'], 'Cached Corper')
+		response, loads, total = self.get(access, prefix='Token')
+		self.assertEqual((response.status_code, loads), (200, 0))
+		self.assertEqual(total, first_total - 1)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.profile.full_name = 'Renamed Corper'
+			self.profile.save()
+		response, loads, _ = self.get(access)
+		self.assertEqual((response.data['full_name'], loads), ('Renamed Corper', 1))
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.user.is_active = False
+			self.user.save()
+		self.assertEqual(self.get(access)[0].status_code, 401)
+
+	def test_tokens_carry_the_profile_id(self):
+		response = views.login_view(APIRequestFactory().post('/api/accounts/auth/login/', {'username': 'cached', 'password': 'testpass'}, format='json'))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['token'], response.data['access'])
+		token = authentication.CachedJWTAuthentication().get_validated_token(response.data['access'])
+		self.assertEqual(token[authentication.PROFILE_ID_CLAIM], self.profile.pk)
+
+		staff = User.objects.create_user(username='staff', password='testpass', is_staff=True)
+		refresh = authentication.token_for_user(staff)
+		self.assertNotIn(authentication.PROFILE_ID_CLAIM, refresh)
+		with self.assertNumQueries(1):
+			user = authentication.load_principal(staff.pk)
+		self.assertFalse(hasattr(user, 'profile'))
+		with self.assertNumQueries(1):
+			user = authentication.load_principal(self.user.pk, self.profile.pk)
+			self.assertEqual(user.profile.full_name, 'Cached Corper')
+
+		pair = self.client.post('/api/auth/login/', {'username': 'cached', 'password': 'testpass'}).json()
+		self.assertEqual(self.get(pair['access'])[0].status_code, 200)
+		logout = self.client.post('/api/accounts/auth/logout/', {'refresh': pair['refresh']}, content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+		self.assertEqual(logout.status_code, 200)
+		self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': pair['refresh']}).status_code, 401)
+
+class TestEndpointBenchmark(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.counts = benchmark.seed(users=3, applications=6, payments=9, batch_size=4)
+
+	def test_seeded_dataset_covers_every_route(self):
+		self.assertEqual(self.counts, {'users': 3, 'applications': 6, 'loans': 3, 'schedules': 9, 'payments': 9})
+		self.assertEqual(Loan.objects.get(loan_id='BL000000000').borrower.user.username, benchmark.BORROWER_USERNAME)
+		self.assertFalse(Payment.objects.filter(borrower_id=None).exists())
+		cases = benchmark.build_cases(benchmark.fixtures())
+		self.assertEqual(benchmark.uncovered_routes(cases), [])
+		self.assertIn('optimized-loan-list', benchmark.routes())
+
+	def test_report_and_baseline_comparison(self):
+		report = benchmark.run_benchmark(iterations=2, warmup=0, only='GET payments')
+		self.assertEqual(sorted(report['results']), ['GET payments as borrower', 'GET payments as staff'])
+		result = report['results']['GET payments as staff']
+		self.assertEqual((result['status'], result['path']), (200, '/api/accounts/payments/'))
+		self.assertGreater(result['queries'], 0)
+		self.assertGreater(result['alloc_peak_kb'], 0)
+		self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+		json.dumps(report)
+
+		baseline = json.loads(json.dumps(report))
+		self.assertEqual(benchmark.compare(report, baseline), [])
+		baseline['results']['GET payments as staff'].update(queries=result['queries'] - 1, p95_ms=result['p95_ms'] / 2 - 5)
+		baseline['results']['GET payments as borrower']['p95_ms'] = report['results']['GET payments as borrower']['p95_ms'] * 0.9
+		regressions = benchmark.compare(report, baseline, tolerance=0.2)
+		self.assertEqual({(r['case'], r['metric']) for r in regressions}, {('GET payments as staff', 'queries'), ('GET payments as staff', 'p95_ms')})
+
+	def test_writes_are_rolled_back_and_errors_recorded(self):
+		applications = LoanApplication.objects.count()
+		report = benchmark.run_benchmark(iterations=2, warmup=1, only='POST loan-applications')
+		self.assertEqual(report['results']['POST loan-applications as borrower']['status'], 201)
+		report = benchmark.run_benchmark(iterations=2, warmup=1, only='POST loanapplication-list-create')
+		self.assertEqual(report['results']['POST loanapplication-list-create as borrower']['status'], 201)
+		self.assertEqual(LoanApplication.objects.count(), applications)
+
+		with mock.patch.object(views.LoanList, 'get_queryset', side_effect=RuntimeError('boom')):
+			report = benchmark.run_benchmark(iterations=1, warmup=0, only='GET loans as borrower')
+		self.assertEqual(report['results']['GET loans as borrower']['status'], 500)
+		self.assertEqual(report['results']['GET loans as borrower']['error'], 'RuntimeError: boom')
+		self.assertEqual(benchmark.failed_cases(report), ['GET loans as borrower'])
+
+	def test_optimized_routes_succeed_without_per_row_queries(self):
+		report = benchmark.run_benchmark(iterations=1, warmup=0, only='optimized', cold=True)
+		self.assertEqual(len(report['results']), 15)
+		self.assertEqual(benchmark.failed_cases(report), [])
+		# Principal (cold cache), count and page, whatever the page size
+		self.assertEqual(report['results']['GET optimized-payment-list as borrower']['queries'], 3)
+		self.assertEqual(report['results']['GET optimized-loan-list as borrower']['queries'], 3)
+
 # Create your tests here.
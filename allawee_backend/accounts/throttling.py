@@ -0,0 +1,169 @@
+"""
+Sliding-window throttles for login and registration
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per key in the
+cache and rewrites it on every request. These throttles keep two integer
+counters per key instead: the current fixed window and the previous one.
+The request count over the last `duration` seconds is estimated as
+
+    previous * (1 - elapsed fraction of the current window) + current
+
+With django-redis the check-and-increment is one Lua script (EVALSHA), so
+it is atomic across workers and costs a single round trip. Other cache
+backends (LocMem in development and tests) run the same arithmetic through
+cache.add/incr.
+
+Throttles run in APIView.initial(), before the view, so a rejected login
+never reaches the password hasher. Each view is limited per client IP and
+per submitted identifier (username / email / phone), with rates from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']. If Redis is unreachable the
+throttles allow the request and log a warning. The client IP is DRF's
+get_ident(): set REST_FRAMEWORK['NUM_PROXIES'] to the number of proxies in
+front of the app, or a client can rotate X-Forwarded-For to get a fresh
+per-IP bucket on every request.
+"""
+
+import hashlib
+import logging
+import math
+import time
+
+from django.core.cache import cache, caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local duration = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local weight = 1 - elapsed / duration
+if previous * weight + current >= limit then
+    local wait = duration - elapsed
+    if current < limit and previous > 0 then
+        wait = math.min(wait, (1 - (limit - current) / previous) * duration - elapsed)
+    end
+    return {0, tostring(math.max(wait, 0))}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], duration * 2)
+return {1, '0'}
+"""
+
+_script = None
+
+
+def _redis_script():
+    """The registered Lua script, or None when the cache is not django-redis."""
+    global _script
+    if _script is None:
+        # cache is a ConnectionProxy; the backend class is on caches['default']
+        if not type(caches['default']).__module__.startswith('django_redis'):
+            return None
+        from django_redis import get_redis_connection
+        _script = get_redis_connection('default').register_script(SLIDING_WINDOW_LUA)
+    return _script
+
+
+def _wait(limit, duration, elapsed, current, previous):
+    """Seconds until the weighted count drops below limit (mirrors the Lua script)."""
+    wait = duration - elapsed
+    if current < limit and previous > 0:
+        wait = min(wait, (1 - (limit - current) / previous) * duration - elapsed)
+    return max(wait, 0)
+
+
+def hit(key, limit, duration, now=None):
+    """
+    Count one request against key. Returns (allowed, seconds to wait).
+    Rejected requests are not counted.
+    """
+    now = time.time() if now is None else now
+    window = int(now // duration)
+    elapsed = now - window * duration
+    current_key, previous_key = f"{key}_{window}", f"{key}_{window - 1}"
+
+    script = _redis_script()
+    if script is not None:
+        allowed, wait = script(
+            keys=[cache.make_key(current_key), cache.make_key(previous_key)], args=[limit, duration, elapsed]
+        )
+        return bool(allowed), float(wait)
+
+    # Same arithmetic as the Lua script; the read and increment are not atomic here
+    current = cache.get(current_key, 0)
+    previous = cache.get(previous_key, 0)
+    if previous * (1 - elapsed / duration) + current >= limit:
+        return False, _wait(limit, duration, elapsed, current, previous)
+    if not cache.add(current_key, 1, duration * 2):
+        cache.incr(current_key)
+    return True, 0.0
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle rates and cache keys, counted with hit() instead of a timestamp list."""
+
+    def get_rate(self):
+        # SimpleRateThrottle.THROTTLE_RATES is frozen at import; read the live setting
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        try:
+            allowed, self._wait = hit(self.key, self.num_requests, self.duration)
+        except Exception as exc:
+            logger.warning(f"Throttle {self.scope} unavailable, allowing request: {exc}")
+            return True
+        return allowed
+
+    def wait(self):
+        return math.ceil(self._wait)
+
+
+class IPThrottle(SlidingWindowThrottle):
+    def get_cache_key(self, request, view):
+        return f"throttle_{self.scope}_{self.get_ident(request)}"
+
+
+class IdentifierThrottle(SlidingWindowThrottle):
+    """Keyed on the first non-empty identifier_fields value in the request body."""
+    identifier_fields = ('username',)
+
+    def get_cache_key(self, request, view):
+        try:
+            # Buffer the raw body first: request.data consumes the stream, and
+            # the view may still need request.body (idempotency fingerprints)
+            request.body
+            data = request.data
+        except Exception:
+            return None
+        for field in self.identifier_fields:
+            value = data.get(field) if hasattr(data, 'get') else None
+            if isinstance(value, str) and value.strip():
+                digest = hashlib.sha256(value.strip().lower().encode('utf-8')).hexdigest()[:32]
+                return f"throttle_{self.scope}_{digest}"
+        return None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login_ip'
+
+
+class LoginIdentifierThrottle(IdentifierThrottle):
+    scope = 'login_identifier'
+
+
+class RegisterIPThrottle(IPThrottle):
+    scope = 'register_ip'
+
+
+class RegisterIdentifierThrottle(IdentifierThrottle):
+    scope = 'register_identifier'
+    identifier_fields = ('email', 'phone_number', 'username')
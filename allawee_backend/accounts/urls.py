@@ -7,12 +7,17 @@ urlpatterns = [
     path('auth/register/', views.register_view, name='register'),
     path('auth/logout/', views.logout_view, name='logout'),
     
+    # App launch
+    path('bootstrap/', views.app_bootstrap, name='bootstrap'),
+    path('sync/', views.delta_sync, name='delta-sync'),
+    
     # User Profile URLs
     path('profile/', views.UserProfileDetail.as_view(), name='user-profile'),
     
     # Loan Product URLs
     path('loan-products/', views.LoanProductList.as_view(), name='loan-products'),
     path('loan-products/<int:pk>/', views.LoanProductDetail.as_view(), name='loan-product-detail'),
+    path('loan-quotes/', views.loan_quotes, name='loan-quotes'),
     
     # Loan Application URLs
     path('loan-applications/', views.LoanApplicationList.as_view(), name='loan-applications'),
@@ -22,17 +27,31 @@ urlpatterns = [
     # Loan URLs
     path('loans/', views.LoanList.as_view(), name='loans'),
     path('loans/<int:pk>/', views.LoanDetail.as_view(), name='loan-detail'),
+    path('loans/<str:loan_id>/history/', views.loan_history, name='loan-history'),
     
     # Payment URLs
     path('payments/', views.PaymentList.as_view(), name='payments'),
+    path('payments/<int:pk>/', views.PaymentDetail.as_view(), name='payment-detail'),
     path('loans/<int:loan_id>/repayment-schedule/', views.RepaymentScheduleList.as_view(), name='repayment-schedule'),
     
     # Dashboard URLs
     path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
     path('dashboard/trends/', views.monthly_trends, name='monthly-trends'),
+    path('dashboard/portfolio/', views.portfolio_history, name='portfolio-history'),
     path('dashboard/user/', views.user_dashboard, name='user-dashboard'),
     
+    # Data export URLs
+    path('exports/', views.export_jobs, name='export-jobs'),
+    path('exports/jobs/<int:pk>/', views.export_job_detail, name='export-job-detail'),
+    path('exports/jobs/<int:pk>/download/', views.export_job_download, name='export-job-download'),
+    path('exports/<str:filename>', views.export_download, name='export-download'),
+    
+    # Health URLs
+    path('health/db-pool/', views.db_pool_status, name='db-pool-status'),
+    
     # Remita Integration URLs
     path('remita/verify-salary/', views.verify_salary, name='verify-salary'),
     path('remita/setup-mandate/', views.setup_mandate, name='setup-mandate'),
+    path('remita/webhook/', views.remita_webhook, name='remita-webhook'),
+    path('remita/transactions/<int:pk>/', views.RemitaTransactionDetail.as_view(), name='remita-transaction-detail'),
 ]
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Routes for the viewsets in views_optimized.py
+
+Not mounted in core.urls. The endpoint benchmark (accounts/benchmark.py)
+serves them under /api/optimized/ so they are measured next to accounts.urls.
+"""
+
+from rest_framework.routers import SimpleRouter
+
+from . import views_optimized
+
+router = SimpleRouter()
+router.register('profiles', views_optimized.OptimizedUserProfileViewSet, basename='optimized-profile')
+router.register('loan-applications', views_optimized.OptimizedLoanApplicationViewSet, basename='optimized-application')
+router.register('loans', views_optimized.OptimizedLoanViewSet, basename='optimized-loan')
+router.register('payments', views_optimized.OptimizedPaymentViewSet, basename='optimized-payment')
+router.register('loan-products', views_optimized.OptimizedLoanProductViewSet, basename='optimized-product')
+router.register('dashboard', views_optimized.DashboardAnalyticsView, basename='optimized-dashboard')
+
+urlpatterns = router.urls
@@ -1,30 +1,54 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.filters import SearchFilter
 from rest_framework.response import Response
-from rest_framework.authtoken.models import Token
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.db.models import Sum, Count, Q, Avg
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
+import json
+import os
 
 from .models import (
     UserProfile, LoanProduct, LoanApplication, 
-    Loan, Payment, RepaymentSchedule, RemitaTransaction
+    Loan, Payment, RepaymentSchedule, RemitaTransaction, PortfolioSnapshot, DataExport
 )
+from core.db_pool import pool_metrics, server_connections
+from core.db_router import ReplicaReadMixin, replica_reads
+
+from . import archival, authentication, bootstrap, exports, quotes, remita, sync, webhooks
+from .idempotency import IdempotentPostMixin, idempotent
+from .search import IndexedSearchFilter
+from .throttling import LoginIdentifierThrottle, LoginIPThrottle, RegisterIdentifierThrottle, RegisterIPThrottle
+from .tasks import run_data_export
 from .serializers import (
     UserProfileSerializer, UserProfileCreateSerializer,
     LoanProductSerializer, LoanApplicationSerializer, LoanApplicationCreateSerializer,
-    LoanSerializer, PaymentSerializer, RepaymentScheduleSerializer,
-    RemitaTransactionSerializer, DashboardStatsSerializer, MonthlyStatsSerializer,
+    LoanSerializer, PaymentSerializer, PaymentDetailSerializer, RepaymentScheduleSerializer,
+    RemitaTransactionSerializer, RemitaTransactionDetailSerializer, DashboardStatsSerializer, MonthlyStatsSerializer,
+    PortfolioSnapshotSerializer, DataExportSerializer,
     LoginSerializer, ChangePasswordSerializer
 )
 
+# The project's filter backends, with ?search= served by the indexed paths in accounts.search
+SEARCH_FILTER_BACKENDS = [
+    backend for backend in api_settings.DEFAULT_FILTER_BACKENDS if not issubclass(backend, SearchFilter)
+] + [IndexedSearchFilter]
+
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([LoginIPThrottle, LoginIdentifierThrottle])
 def login_view(request):
     print(f"Login attempt - Request data: {request.data}")
     serializer = LoginSerializer(data=request.data)
@@ -57,7 +81,8 @@ def login_view(request):
         
         print(f"Final authentication result: {user}")
         if user:
-            token, created = Token.objects.get_or_create(user=user)
+            refresh = authentication.token_for_user(user)
+            access = str(refresh.access_token)
             
             # Safely get profile data
             profile_data = None
@@ -68,7 +93,9 @@ def login_view(request):
                 profile_data = None
             
             return Response({
-                'token': token.key,
+                'token': access,
+                'access': access,
+                'refresh': str(refresh),
                 'user_id': user.id,
                 'username': user.username,
                 'email': user.email,
@@ -83,14 +110,19 @@ def login_view(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([RegisterIPThrottle, RegisterIdentifierThrottle])
+@idempotent('register')
 def register_view(request):
     serializer = UserProfileCreateSerializer(data=request.data)
     if serializer.is_valid():
         profile = serializer.save()
-        token, created = Token.objects.get_or_create(user=profile.user)
+        refresh = authentication.token_for_user(profile.user)
+        access = str(refresh.access_token)
         
         return Response({
-            'token': token.key,
+            'token': access,
+            'access': access,
+            'refresh': str(refresh),
             'user_id': profile.user.id,
             'profile': UserProfileSerializer(profile).data,
             'message': 'Registration successful'
@@ -101,10 +133,11 @@ def register_view(request):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def logout_view(request):
+    # Access tokens expire on their own; the refresh token from login is blacklisted
     try:
-        request.user.auth_token.delete()
+        RefreshToken(request.data.get('refresh', '')).blacklist()
         return Response({'message': 'Successfully logged out'})
-    except:
+    except TokenError:
         return Response({'error': 'Error logging out'}, status=status.HTTP_400_BAD_REQUEST)
 
 # User Profile Views
@@ -114,9 +147,13 @@ class UserProfileDetail(generics.RetrieveUpdateAPIView):
     
     def get_object(self):
         return self.request.user.profile
+    
+    def perform_update(self, serializer):
+        profile = serializer.save()
+        bootstrap.invalidate_user_sections(profile.pk)
 
 # Loan Product Views
-class LoanProductList(generics.ListAPIView):
+class LoanProductList(ReplicaReadMixin, generics.ListAPIView):
     queryset = LoanProduct.objects.filter(is_active=True)
     serializer_class = LoanProductSerializer
     permission_classes = [permissions.AllowAny]  # Allow anyone to view loan products
@@ -126,16 +163,48 @@ class LoanProductDetail(generics.RetrieveAPIView):
     serializer_class = LoanProductSerializer
     permission_classes = [permissions.AllowAny]  # Allow anyone to view loan product details
 
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def loan_quotes(request):
+    """
+    Monthly payment, interest and fee for every product x tenure x amount.
+    ?amount=50000 or ?amounts=20000,50000; optional ?tenures=1,3,6 and ?products=1,2
+    """
+    try:
+        raw_amounts = request.query_params.get('amounts') or request.query_params.get('amount', '')
+        amounts = [Decimal(item) for item in raw_amounts.split(',') if item.strip()]
+        tenures = _int_list(request.query_params['tenures']) if request.query_params.get('tenures') else None
+        product_ids = _int_list(request.query_params['products']) if request.query_params.get('products') else None
+    except (ArithmeticError, ValueError):
+        return Response({'error': 'amounts, tenures and products must be comma-separated numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not amounts or len(amounts) > quotes.MAX_AMOUNTS:
+        return Response({'error': f'Provide 1 to {quotes.MAX_AMOUNTS} amounts'}, status=status.HTTP_400_BAD_REQUEST)
+    # Checked after the float conversion: Decimal('1e400') is finite, float('1e400') is not
+    amounts = [float(amount) for amount in amounts]
+    if any(not 0 < amount <= quotes.MAX_AMOUNT for amount in amounts):
+        return Response({'error': f'Amounts must be positive and at most {quotes.MAX_AMOUNT:,.2f}'}, status=status.HTTP_400_BAD_REQUEST)
+    if tenures is not None and any(not 1 <= tenure <= quotes.MAX_TENURE_MONTHS for tenure in tenures):
+        return Response({'error': f'Tenures must be between 1 and {quotes.MAX_TENURE_MONTHS} months'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(quotes.get_quotes(amounts, tenures, product_ids))
+
 # Loan Application Views
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class LoanApplicationList(generics.ListCreateAPIView):
+class LoanApplicationList(IdempotentPostMixin, ReplicaReadMixin, generics.ListCreateAPIView):
     serializer_class = LoanApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    filter_backends = SEARCH_FILTER_BACKENDS
+    search_fields = ['application_id', 'applicant__full_name']
+    idempotency_scope = 'loan_application'
     
     def get_queryset(self):
         if self.request.user.is_staff:
@@ -147,12 +216,18 @@ class LoanApplicationList(generics.ListCreateAPIView):
             return LoanApplicationCreateSerializer
         return LoanApplicationSerializer
     
-class LoanApplicationListCreateView(generics.ListCreateAPIView):
+    def perform_create(self, serializer):
+        application = serializer.save()
+        bootstrap.invalidate_user_sections(application.applicant_id)
+    
+class LoanApplicationListCreateView(IdempotentPostMixin, generics.ListCreateAPIView):
     queryset = LoanApplication.objects.all()
     serializer_class = LoanApplicationSerializer
+    idempotency_scope = 'loan_application'
 
     def perform_create(self, serializer):
-        loan_application = serializer.save()
+        loan_application = serializer.save(applicant=self.request.user.profile)
+        bootstrap.invalidate_user_sections(loan_application.applicant_id)
         # Dummy Remita NYSC verification
         is_nysc_member = self.dummy_remita_nysc_verification(loan_application)
         if is_nysc_member:
@@ -183,15 +258,28 @@ class LoanApplicationDetail(generics.RetrieveUpdateAPIView):
         return LoanApplication.objects.filter(applicant=self.request.user.profile)
 
 # Loan Views
-class LoanList(generics.ListAPIView):
+class LoanList(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    filter_backends = SEARCH_FILTER_BACKENDS
+    search_fields = ['loan_id', 'borrower__full_name']
     
     def get_queryset(self):
         if self.request.user.is_staff:
             return Loan.objects.all().order_by('-created_at')
-        return Loan.objects.filter(application__applicant=self.request.user.profile).order_by('-created_at')
+        return Loan.objects.filter(borrower=self.request.user.profile).order_by('-created_at')
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@replica_reads
+def loan_history(request, loan_id):
+    """Full loan history by loan_id, served from the archive once the loan is archived"""
+    owner = archival.loan_history_owner(loan_id)
+    if owner is None or (not request.user.is_staff and owner != request.user.profile.id):
+        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(archival.loan_history(loan_id))
 
 class LoanDetail(generics.RetrieveAPIView):
     serializer_class = LoanSerializer
@@ -200,20 +288,32 @@ class LoanDetail(generics.RetrieveAPIView):
     def get_queryset(self):
         if self.request.user.is_staff:
             return Loan.objects.all()
-        return Loan.objects.filter(application__applicant=self.request.user.profile)
+        return Loan.objects.filter(borrower=self.request.user.profile)
 
 # Payment Views
-class PaymentList(generics.ListAPIView):
+class PaymentList(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
+    filter_backends = SEARCH_FILTER_BACKENDS
+    search_fields = ['payment_id', 'loan__loan_id', 'remita_rrr']
     
     def get_queryset(self):
         if self.request.user.is_staff:
             return Payment.objects.all().order_by('-created_at')
-        return Payment.objects.filter(loan__application__applicant=self.request.user.profile).order_by('-created_at')
+        return Payment.objects.filter(borrower=self.request.user.profile).order_by('-created_at')
+
+class PaymentDetail(generics.RetrieveAPIView):
+    serializer_class = PaymentDetailSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = Payment.objects.select_related('remita_payload', 'loan__application__applicant__user', 'loan__application__loan_product')
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(borrower=self.request.user.profile)
 
-class RepaymentScheduleList(generics.ListAPIView):
+class RepaymentScheduleList(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = RepaymentScheduleSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -222,13 +322,14 @@ class RepaymentScheduleList(generics.ListAPIView):
         queryset = RepaymentSchedule.objects.filter(loan_id=loan_id).order_by('installment_number')
         
         if not self.request.user.is_staff:
-            queryset = queryset.filter(loan__application__applicant=self.request.user.profile)
+            queryset = queryset.filter(borrower=self.request.user.profile)
         
         return queryset
 
 # Dashboard Views for Admin
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@replica_reads
 def dashboard_stats(request):
     # Calculate dashboard statistics
     total_users = UserProfile.objects.count()
@@ -260,6 +361,7 @@ def dashboard_stats(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
+@replica_reads
 def monthly_trends(request):
     # Get last 12 months data
     end_date = timezone.now().date()
@@ -299,78 +401,296 @@ def monthly_trends(request):
     serializer = MonthlyStatsSerializer(monthly_data, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@replica_reads
+def portfolio_history(request):
+    """Daily portfolio-at-risk history from the persisted snapshots"""
+    try:
+        days = min(int(request.query_params.get('days', 90)), 730)
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if days < 1:
+        return Response({'error': 'days must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    snapshots = PortfolioSnapshot.objects.all()[:days]
+    serializer = PortfolioSnapshotSerializer(snapshots, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def db_pool_status(request):
+    """Connection pool statistics for this worker plus server-side connection counts"""
+    return Response({
+        'pools': pool_metrics(),
+        'server_connections': server_connections(),
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_download(request, filename):
+    """
+    Stream a full extract, e.g. payments.csv, loans.ndjson.gz. Optional
+    ?start=&end= (dates, end exclusive) and ?status= filters.
+    """
+    try:
+        name, fmt, compress = exports.parse_filename(filename)
+        filters = exports.parse_filters(request.query_params)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    stream = exports.ExportStream(name, fmt, compress, filters, using=exports.read_alias())
+    response = StreamingHttpResponse(stream, content_type=stream.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{stream.filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAdminUser])
+def export_jobs(request):
+    """List recent background exports, or queue one (written by accounts.tasks.run_data_export)"""
+    if request.method == 'GET':
+        recent = DataExport.objects.order_by('-created_at')[:50]
+        return Response(DataExportSerializer(recent, many=True, context={'request': request}).data)
+    
+    serializer = DataExportSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    export = serializer.save(requested_by=request.user)
+    db_transaction.on_commit(lambda: run_data_export.delay(export.pk))
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_job_detail(request, pk):
+    """Status of a background export; file is the download URL once completed"""
+    try:
+        export = DataExport.objects.get(pk=pk)
+    except DataExport.DoesNotExist:
+        return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(DataExportSerializer(export, context={'request': request}).data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_job_download(request, pk):
+    """
+    The file of a completed background export. Behind nginx this hands off to
+    the internal EXPORT_ACCEL_REDIRECT_PREFIX location; otherwise it streams.
+    """
+    try:
+        export = DataExport.objects.get(pk=pk, status='completed')
+    except DataExport.DoesNotExist:
+        return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not export.file or not export.file.storage.exists(export.file.name):
+        return Response({'error': 'Export file is no longer available'}, status=status.HTTP_410_GONE)
+    
+    filename = os.path.basename(export.file.name)
+    prefix = getattr(settings, 'EXPORT_ACCEL_REDIRECT_PREFIX', '')
+    if prefix:
+        response = HttpResponse(content_type='application/gzip' if export.compress else exports.FORMATS[export.format])
+        response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{export.file.name}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        response = FileResponse(export.file.open('rb'), as_attachment=True, filename=filename)
+    response['Cache-Control'] = 'no-store'
+    return response
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@replica_reads
 def user_dashboard(request):
     """Dashboard data for regular users"""
     user_profile = request.user.profile
     
-    # User's loan statistics
-    applications = LoanApplication.objects.filter(applicant=user_profile)
-    loans = Loan.objects.filter(application__applicant=user_profile)
-    payments = Payment.objects.filter(loan__application__applicant=user_profile, status='successful')
+    stats = bootstrap.dashboard_for(user_profile)
+    stats['next_payment_due'] = bootstrap.next_repayment(user_profile)
+    return Response(stats)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def app_bootstrap(request):
+    """
+    Everything the app needs at launch in one response. Send the section
+    ETags you hold in If-None-Match to skip unchanged sections; a 304 means
+    nothing changed at all.
+    """
+    known = bootstrap.parse_etags(request.META.get('HTTP_IF_NONE_MATCH'))
+    etag, payload = bootstrap.build_bootstrap(request.user.profile, known)
+    if etag in known:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response({'etag': etag, 'sections': payload})
+    response['ETag'] = f'"{etag}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def delta_sync(request):
+    """
+    Rows changed since ?cursor= (the previous next_cursor) plus ids of deleted
+    rows. Omit it for the initial sync, or pass ?since= (an ISO timestamp) to
+    start from a stored watermark. Always reads the primary: a lagging
+    replica would make the cursor skip rows.
+    """
+    if request.query_params.get('cursor'):
+        try:
+            since, until, after = sync.decode_cursor(request.query_params['cursor'])
+        except ValueError:
+            return Response({'error': 'cursor is not a valid sync cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(sync.sync_changes(request.user.profile, since, until=until, after=after))
     
-    stats = {
-        'total_applications': applications.count(),
-        'pending_applications': applications.filter(status='pending').count(),
-        'approved_applications': applications.filter(status='approved').count(),
-        'active_loans': loans.filter(status='active').count(),
-        'total_borrowed': loans.aggregate(total=Sum('principal_amount'))['total'] or Decimal('0'),
-        'total_paid': payments.aggregate(total=Sum('amount'))['total'] or Decimal('0'),
-        'outstanding_balance': loans.filter(status='active').aggregate(total=Sum('outstanding_balance'))['total'] or Decimal('0'),
-        'next_payment_due': RepaymentSchedule.objects.filter(
-            loan__application__applicant=user_profile,
-            is_paid=False
-        ).order_by('due_date').first()
-    }
+    since = None
+    if request.query_params.get('since'):
+        try:
+            since = parse_datetime(request.query_params['since'])
+        except ValueError:
+            since = None
+        if since is None:
+            return Response({'error': 'since must be an ISO 8601 timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, dt_timezone.utc)
     
-    return Response(stats)
+    return Response(sync.sync_changes(request.user.profile, since))
 
 # Remita Integration Views
+class RemitaTransactionDetail(generics.RetrieveAPIView):
+    serializer_class = RemitaTransactionDetailSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = RemitaTransaction.objects.select_related(
+            'payload', 'user_profile__user', 'loan__application__applicant__user', 'loan__application__loan_product'
+        )
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user_profile=self.request.user.profile)
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def verify_salary(request):
     """Verify user's salary through Remita"""
     user_profile = request.user.profile
+    now = timezone.now()
     
-    # Mock salary verification
-    verification_data = {
-        'status': 'success',
-        'salary_verified': True,
-        'monthly_salary': user_profile.monthly_allowance,
-        'employer': 'NYSC',
-        'verification_date': timezone.now()
-    }
+    if remita.is_configured():
+        try:
+            result = remita.call('salary_history', user_profile.phone_number, request.data.get('authorisation_code', ''))
+        except remita.RemitaUnavailable:
+            return Response({'error': 'Remita is unavailable, please try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except remita.RemitaError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        salary = result.get('data') or {}
+        payments = salary.get('salaryPaymentDetails') or []
+        transaction = RemitaTransaction.objects.create(
+            user_profile=user_profile, transaction_type='salary_verification',
+            remita_rrr=result.get('responseId', ''), status='successful', completed_at=now,
+        )
+        transaction.store_response_data(result)
+        user_profile.remita_payer_id = salary.get('customerId') or user_profile.remita_payer_id
+        verification_data = {
+            'status': 'success',
+            'salary_verified': True,
+            'monthly_salary': payments[0].get('amount') if payments else user_profile.monthly_allowance,
+            'employer': salary.get('companyName', ''),
+            'verification_date': now
+        }
+    else:
+        # Mock salary verification
+        verification_data = {
+            'status': 'success',
+            'salary_verified': True,
+            'monthly_salary': user_profile.monthly_allowance,
+            'employer': 'NYSC',
+            'verification_date': now
+        }
     
     # Update user profile
     user_profile.salary_account_verified = True
-    user_profile.last_salary_verification = timezone.now()
+    user_profile.last_salary_verification = now
     user_profile.save()
+    bootstrap.invalidate_user_sections(user_profile.pk)
     
     return Response(verification_data)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent('setup_mandate')
 def setup_mandate(request):
     """Setup Remita mandate for automatic deductions"""
     loan_id = request.data.get('loan_id')
     
     try:
-        loan = Loan.objects.get(id=loan_id, application__applicant=request.user.profile)
+        loan = Loan.objects.select_related('application', 'borrower').get(id=loan_id, borrower=request.user.profile)
         
-        # Mock mandate setup
-        mandate_data = {
-            'status': 'success',
-            'mandate_id': f"MND{loan.loan_id}",
-            'message': 'Mandate setup successful'
-        }
+        if remita.is_configured():
+            profile = loan.borrower
+            first_due = loan.repayment_schedule.order_by('due_date').values_list('due_date', flat=True).first()
+            try:
+                result = remita.call(
+                    'notify_disbursement',
+                    customer_id=profile.remita_payer_id or profile.phone_number,
+                    authorisation_code=request.data.get('authorisation_code', ''),
+                    phone_number=profile.phone_number,
+                    account_number=request.data.get('account_number', ''),
+                    bank_code=request.data.get('bank_code', ''),
+                    loan_amount=loan.principal_amount,
+                    collection_amount=loan.monthly_payment,
+                    number_of_repayments=loan.application.tenure_months,
+                    disbursement_date=loan.disbursement_date,
+                    collection_date=first_due or loan.maturity_date,
+                )
+            except remita.RemitaUnavailable:
+                return Response({'error': 'Remita is unavailable, please try again shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            except remita.RemitaError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            transaction = RemitaTransaction.objects.create(
+                user_profile=profile, loan=loan, transaction_type='mandate_setup',
+                remita_rrr=result.get('responseId', ''), amount=loan.monthly_payment,
+                status='successful', completed_at=timezone.now(),
+            )
+            transaction.store_response_data(result)
+            mandate_data = {
+                'status': 'success',
+                'mandate_id': result.get('data', {}).get('mandateReference'),
+                'message': 'Mandate setup successful'
+            }
+        else:
+            # Mock mandate setup
+            mandate_data = {
+                'status': 'success',
+                'mandate_id': f"MND{loan.loan_id}",
+                'message': 'Mandate setup successful'
+            }
         
         # Update loan
         loan.remita_mandate_id = mandate_data['mandate_id']
         loan.auto_deduction_active = True
-        loan.save()
+        # Only the mandate fields: a full save would overwrite balances posted concurrently
+        loan.save(update_fields=['remita_mandate_id', 'auto_deduction_active', 'updated_at'])
+        bootstrap.invalidate_user_sections(loan.borrower_id)
         
         return Response(mandate_data)
         
     except Loan.DoesNotExist:
-        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return Response({'error': 'Loan not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def remita_webhook(request):
+    """
+    Remita payment and mandate notifications. Only verified and appended here;
+    accounts.tasks.process_remita_events applies them.
+    """
+    body = request.body
+    if not webhooks.verify_signature(body, request.META.get(webhooks.SIGNATURE_HEADER, '')):
+        return Response({'error': 'Invalid signature'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        events = webhooks.parse_events(json.loads(body))
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    webhooks.record_events(events)
+    return Response({'status': 'received', 'events': len(events)})
@@ -5,9 +5,10 @@ Optimized views for handling 20,000 concurrent users and 500,000+ records
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 from django.core.cache import cache
+from django.db import connections, router
 from django.db.models import Q, Count, Sum, Avg
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_headers
@@ -16,7 +17,10 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
 import logging
 
+from core.db_router import replica_allowed_for, use_replica
+
 from .models import UserProfile, LoanApplication, Loan, Payment, LoanProduct
+from .search import IndexedSearchFilter
 from .serializers import (
     UserProfileSerializer, LoanApplicationSerializer, 
     LoanSerializer, PaymentSerializer, LoanProductSerializer
@@ -24,22 +28,24 @@ from .serializers import (
 
 logger = logging.getLogger(__name__)
 
+def _stats_scope(request):
+    """Cache key part for figures computed over get_queryset(), which is per borrower for non-staff"""
+    return 'all' if request.user.is_staff else f"profile_{request.user.profile.pk}"
+
 class CustomPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 200
 
-class LoginRateThrottle(UserRateThrottle):
-    scope = 'login'
-
 class OptimizedUserProfileViewSet(viewsets.ModelViewSet):
     """
-    Optimized UserProfile ViewSet with caching and efficient queries
+    Optimized UserProfile ViewSet with caching and efficient queries.
+    Staff list and search every profile; anyone else only sees their own.
     """
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
     filterset_fields = ['nysc_state_code', 'salary_account_verified']
     search_fields = ['full_name', 'phone_number', 'bvn']
     ordering_fields = ['created_at', 'full_name']
@@ -51,6 +57,8 @@ class OptimizedUserProfileViewSet(viewsets.ModelViewSet):
             'loan_applications__loan_product',
             'loans__payments'
         )
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
         
         # Cache frequent queries
         cache_key = f"user_profiles_count_{self.request.user.id}"
@@ -61,7 +69,7 @@ class OptimizedUserProfileViewSet(viewsets.ModelViewSet):
         return queryset
     
     @method_decorator(cache_page(300))  # Cache for 5 minutes
-    @method_decorator(vary_on_headers('User-Agent'))
+    @method_decorator(vary_on_headers('User-Agent', 'Authorization', 'Cookie'))  # results are per user
     def list(self, request, *args, **kwargs):
         """Cached list view"""
         return super().list(request, *args, **kwargs)
@@ -69,11 +77,11 @@ class OptimizedUserProfileViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def loan_summary(self, request, pk=None):
         """Get user's loan summary with caching"""
+        user_profile = self.get_object()  # 404 for other borrowers' profiles, even when cached
         cache_key = f"user_loan_summary_{pk}"
         summary = cache.get(cache_key)
         
         if summary is None:
-            user_profile = self.get_object()
             loans = user_profile.loans.all()
             
             summary = {
@@ -90,24 +98,27 @@ class OptimizedUserProfileViewSet(viewsets.ModelViewSet):
 
 class OptimizedLoanApplicationViewSet(viewsets.ModelViewSet):
     """
-    Optimized LoanApplication ViewSet for high-volume processing
+    Optimized LoanApplication ViewSet for high-volume processing.
+    Staff see every application; anyone else only their own.
     """
     serializer_class = LoanApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'loan_product__loan_type']
-    search_fields = ['loan_id', 'user__profile__full_name']
-    ordering_fields = ['created_at', 'requested_amount']
-    ordering = ['-created_at']
+    search_fields = ['application_id', 'applicant__full_name']
+    ordering_fields = ['application_date', 'requested_amount']
+    ordering = ['-application_date']
     
     def get_queryset(self):
         """Optimized queryset with proper joins"""
-        return LoanApplication.objects.select_related(
-            'user', 'user__profile', 'loan_product'
-        ).prefetch_related('loans')
+        queryset = LoanApplication.objects.select_related('applicant__user', 'loan_product')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(applicant=self.request.user.profile)
+        return queryset
     
     @method_decorator(cache_page(180))  # Cache for 3 minutes
+    @method_decorator(vary_on_headers('User-Agent', 'Authorization', 'Cookie'))  # results are per user
     def list(self, request, *args, **kwargs):
         """Cached list with frequent updates"""
         return super().list(request, *args, **kwargs)
@@ -115,7 +126,7 @@ class OptimizedLoanApplicationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get application statistics with caching"""
-        cache_key = "loan_application_stats"
+        cache_key = f"loan_application_stats_{_stats_scope(request)}"
         stats = cache.get(cache_key)
         
         if stats is None:
@@ -141,37 +152,40 @@ class OptimizedLoanViewSet(viewsets.ModelViewSet):
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'loan_product__loan_type']
-    search_fields = ['loan_id', 'user__profile__full_name']
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
+    filterset_fields = ['status', 'application__loan_product__loan_type']
+    search_fields = ['loan_id', 'borrower__full_name']
     ordering_fields = ['created_at', 'principal_amount', 'disbursement_date']
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Optimized queryset with selective loading"""
-        return Loan.objects.select_related(
-            'user', 'user__profile', 'loan_product', 'loan_application'
-        ).prefetch_related(
-            'payments',
-            'repayment_schedule'
-        )
+        """Optimized queryset with selective loading (everything LoanSerializer nests)"""
+        queryset = Loan.objects.select_related('application__applicant__user', 'application__loan_product')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(borrower=self.request.user.profile)
+        return queryset
     
     @action(detail=True, methods=['get'])
     def repayment_schedule(self, request, pk=None):
         """Get loan repayment schedule with caching"""
+        loan = self.get_object()  # 404 for other borrowers' loans, even when cached
         cache_key = f"loan_repayment_schedule_{pk}"
         schedule = cache.get(cache_key)
         
         if schedule is None:
-            loan = self.get_object()
-            schedule_items = loan.repayment_schedule.all().order_by('installment_number')
+            schedule_items = list(loan.repayment_schedule.all().order_by('installment_number'))
+            unpaid = [item for item in schedule_items if not item.is_paid]
             
             schedule = {
                 'loan_id': loan.loan_id,
-                'total_installments': schedule_items.count(),
-                'paid_installments': schedule_items.filter(is_paid=True).count(),
-                'overdue_installments': schedule_items.filter(is_overdue=True).count(),
-                'next_payment': schedule_items.filter(is_paid=False).first(),
+                'total_installments': len(schedule_items),
+                'paid_installments': len(schedule_items) - len(unpaid),
+                'overdue_installments': sum(1 for item in schedule_items if item.is_overdue),
+                'next_payment': {
+                    'installment_number': unpaid[0].installment_number,
+                    'due_date': unpaid[0].due_date,
+                    'total_amount': unpaid[0].total_amount,
+                } if unpaid else None,
                 'schedule': [
                     {
                         'installment_number': item.installment_number,
@@ -198,34 +212,35 @@ class OptimizedPaymentViewSet(viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
     filterset_fields = ['status', 'payment_method']
     search_fields = ['payment_id', 'loan__loan_id']
     ordering_fields = ['created_at', 'amount']
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Optimized payment queries"""
-        return Payment.objects.select_related(
-            'loan', 'loan__user', 'loan__user__profile'
-        )
+        """Optimized payment queries (joins everything PaymentSerializer nests)"""
+        queryset = Payment.objects.select_related('loan__application__applicant__user', 'loan__application__loan_product')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(borrower=self.request.user.profile)
+        return queryset
     
     @action(detail=False, methods=['get'])
     def payment_analytics(self, request):
         """Get payment analytics with caching"""
-        cache_key = "payment_analytics"
+        cache_key = f"payment_analytics_{_stats_scope(request)}"
         analytics = cache.get(cache_key)
         
         if analytics is None:
             queryset = self.get_queryset()
             analytics = {
                 'total_payments': queryset.count(),
-                'successful_payments': queryset.filter(status='completed').count(),
+                'successful_payments': queryset.filter(status='successful').count(),
                 'failed_payments': queryset.filter(status='failed').count(),
                 'pending_payments': queryset.filter(status='pending').count(),
-                'total_amount_processed': queryset.filter(status='completed').aggregate(
+                'total_amount_processed': queryset.filter(status='successful').aggregate(
                     Sum('amount'))['amount__sum'] or 0,
-                'average_payment_amount': queryset.filter(status='completed').aggregate(
+                'average_payment_amount': queryset.filter(status='successful').aggregate(
                     Avg('amount'))['amount__avg'] or 0,
             }
             cache.set(cache_key, analytics, 600)  # Cache for 10 minutes
@@ -271,16 +286,23 @@ class DashboardAnalyticsView(viewsets.ViewSet):
         overview = cache.get(cache_key)
         
         if overview is None:
-            # Use raw SQL for better performance on large datasets
-            from django.db import connection
+            # Use raw SQL for better performance on large datasets. Raw cursors
+            # bypass the router, so ask it for the read alias explicitly
+            with use_replica(replica_allowed_for(request)):
+                alias = router.db_for_read(UserProfile)
+            
+            connection = connections[alias]
+            # Start of the month in Python, so the SQL runs on SQLite as well as PostgreSQL
+            month_start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            month_start = connection.ops.adapt_datetimefield_value(month_start)
             
             with connection.cursor() as cursor:
                 cursor.execute("""
                     SELECT 
                         COUNT(*) as total_users,
-                        COUNT(CASE WHEN date_trunc('month', created_at) = date_trunc('month', CURRENT_DATE) THEN 1 END) as new_users_this_month
+                        COUNT(CASE WHEN created_at >= %s THEN 1 END) as new_users_this_month
                     FROM accounts_userprofile
-                """)
+                """, [month_start])
                 user_stats = cursor.fetchone()
                 
                 cursor.execute("""
@@ -295,10 +317,10 @@ class DashboardAnalyticsView(viewsets.ViewSet):
                 cursor.execute("""
                     SELECT 
                         COUNT(*) as total_payments,
-                        SUM(CASE WHEN status = 'completed' THEN amount ELSE 0 END) as total_collected
+                        SUM(CASE WHEN status = 'successful' THEN amount ELSE 0 END) as total_collected
                     FROM accounts_payment
-                    WHERE created_at >= date_trunc('month', CURRENT_DATE)
-                """)
+                    WHERE created_at >= %s
+                """, [month_start])
                 payment_stats = cursor.fetchone()
             
             overview = {
@@ -0,0 +1,254 @@
+"""
+Remita webhook ingestion
+
+The webhook view only verifies the HMAC-SHA512 signature, parses the body
+and appends one RemitaWebhookEvent per notification with a single multi-row
+INSERT. Redeliveries hit the (remita_rrr, transaction_id) unique constraint
+and are dropped, so the request does no lookups and holds no locks.
+
+process_pending_events() (accounts.tasks.process_remita_events, every 15 s)
+applies events in batches:
+  * payment events update the matching RemitaTransaction, create the Payment
+    for a known collection RRR if it does not exist yet, and post payments
+    through posting.post_loan_payments, one loan at a time;
+  * mandate events switch auto_deduction_active on the loan with that mandate.
+Every event gets processed_at and an outcome (applied / ignored / failed).
+"""
+
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import posting, remita
+from .bootstrap import invalidate_user_sections
+from .models import Loan, Payment, RemitaPayload, RemitaTransaction, RemitaWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'HTTP_X_REMITA_SIGNATURE'
+
+DEFAULT_EVENT_BATCH_SIZE = 500
+
+SUCCESS_CODES = {'00', '01'}
+# Where payment notifications carry their result code, in order of preference
+PAYMENT_CODE_KEYS = ('responseCode', 'statuscode', 'status')
+MANDATE_ACTIVE_STATES = {'ACTIVE', 'ACTIVATED', 'MANDATE_ACTIVATED'}
+MANDATE_STOPPED_STATES = {'STOPPED', 'CANCELLED', 'INACTIVE', 'MANDATE_STOPPED', 'MANDATE_CANCELLED'}
+
+TRANSACTION_ID_KEYS = ('transactionId', 'transactionRef', 'orderRef', 'requestId')
+
+
+def verify_signature(body, signature, secret=None):
+    """True when signature is the hex HMAC-SHA512 of body under the webhook secret."""
+    secret = remita.get_config()['WEBHOOK_SECRET'] if secret is None else secret
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def _transaction_id(item):
+    for key in TRANSACTION_ID_KEYS:
+        if item.get(key):
+            return str(item[key])[:100]
+    # No reference at all: dedupe exact redeliveries on the content
+    return hashlib.sha256(json.dumps(item, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def parse_events(payload):
+    """Turn a notification body (one object or a list) into unsaved events."""
+    items = payload if isinstance(payload, list) else [payload]
+    events = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Each notification must be a JSON object")
+        rrr = str(item.get('rrr') or item.get('RRR') or '')[:100]
+        if rrr:
+            event_type = 'payment'
+        elif item.get('mandateId') or item.get('mandateRef'):
+            event_type = 'mandate'
+        else:
+            raise ValueError("Notification has neither an RRR nor a mandate reference")
+        events.append(RemitaWebhookEvent(
+            event_type=event_type, remita_rrr=rrr, transaction_id=_transaction_id(item), payload=item,
+        ))
+    return events
+
+
+def record_events(events):
+    RemitaWebhookEvent.objects.bulk_create(events, ignore_conflicts=True)
+
+
+def _amount(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount {value!r}")
+
+
+def _payment_code(item):
+    for key in PAYMENT_CODE_KEYS:
+        if item.get(key) not in (None, ''):
+            return str(item[key])
+    return None
+
+
+def _apply_payment_events(events, outcomes, now):
+    """
+    Returns {loan_id: [payment ids]} to post once the batch is committed.
+
+    A notification without a result code is failed and changes nothing. Only
+    the first event that acts on an RRR applies; later ones in the same batch
+    are ignored, so a redelivery with a new transaction id cannot create or
+    post the payment twice.
+    """
+    rrrs = {event.remita_rrr for event in events}
+    payments = {payment.remita_rrr: payment for payment in Payment.objects.filter(remita_rrr__in=rrrs)}
+    collections = {
+        txn.remita_rrr: txn for txn in RemitaTransaction.objects.select_related('loan').filter(
+            remita_rrr__in=rrrs, transaction_type='payment_collection'
+        )
+    }
+
+    to_post = defaultdict(list)
+    new_payments, new_payloads = [], []
+    succeeded, failed, failed_payments = set(), set(), set()
+    handled = set()
+    for event in events:
+        item = event.payload
+        code = _payment_code(item)
+        if code is None:
+            outcomes[event.pk] = ('failed', 'Notification has no response code')
+            continue
+        if event.remita_rrr in handled:
+            outcomes[event.pk] = ('ignored', 'Duplicate of an earlier notification in this batch')
+            continue
+        ok = code in SUCCESS_CODES
+        collection = collections.get(event.remita_rrr)
+        if collection is not None:
+            (succeeded if ok else failed).add(collection.pk)
+
+        payment = payments.get(event.remita_rrr)
+        if payment is None:
+            if not ok or collection is None or collection.loan is None:
+                outcomes[event.pk] = ('ignored', 'No payment or collection for this RRR')
+                continue
+            try:
+                amount = _amount(item.get('amount') or collection.amount)
+            except ValueError as exc:
+                outcomes[event.pk] = ('failed', str(exc))
+                continue
+            paid_at = parse_datetime(str(item.get('debitdate') or item.get('transactiondate') or '')) or now
+            if timezone.is_naive(paid_at):
+                paid_at = timezone.make_aware(paid_at)
+            payment = Payment(
+                loan=collection.loan, borrower_id=collection.loan.borrower_id,
+                payment_id=f"PY{str(uuid.uuid4())[:8].upper()}",
+                amount=amount, payment_method='remita_auto', status='pending',
+                payment_date=paid_at, due_date=paid_at.date(),
+                remita_rrr=event.remita_rrr, remita_transaction_id=event.transaction_id,
+            )
+            payments[event.remita_rrr] = payment
+            handled.add(event.remita_rrr)
+            new_payments.append(payment)
+            new_payloads.append(item)
+            outcomes[event.pk] = ('applied', 'Payment created')
+        elif not ok:
+            if payment.status == 'pending':
+                failed_payments.add(payment.pk)
+            handled.add(event.remita_rrr)
+            outcomes[event.pk] = ('applied', 'Payment failed')
+        elif payment.status == 'pending':
+            to_post[payment.loan_id].append(payment.pk)
+            handled.add(event.remita_rrr)
+            outcomes[event.pk] = ('applied', 'Payment posted')
+        else:
+            outcomes[event.pk] = ('ignored', f"Payment already {payment.status}")
+
+    if new_payments:
+        Payment.objects.bulk_create(new_payments)
+        RemitaPayload.objects.bulk_create([
+            RemitaPayload(payment_id=payment.pk, data=data) for payment, data in zip(new_payments, new_payloads)
+        ])
+        for payment in new_payments:
+            to_post[payment.loan_id].append(payment.pk)
+    if failed_payments:
+        Payment.objects.filter(pk__in=failed_payments, status='pending').update(status='failed', updated_at=now)
+    if succeeded:
+        RemitaTransaction.objects.filter(pk__in=succeeded).update(status='successful', completed_at=now)
+    if failed:
+        RemitaTransaction.objects.filter(pk__in=failed - succeeded).update(status='failed', completed_at=now)
+    return to_post
+
+
+def _apply_mandate_events(events, outcomes, now):
+    references = {str(event.payload.get('mandateId') or event.payload.get('mandateRef')): event for event in events}
+    loans = {
+        mandate_id: (pk, borrower_id)
+        for mandate_id, pk, borrower_id in Loan.objects.filter(remita_mandate_id__in=references).values_list(
+            'remita_mandate_id', 'pk', 'borrower_id'
+        )
+    }
+    switch = {True: [], False: []}
+    for event in events:
+        reference = str(event.payload.get('mandateId') or event.payload.get('mandateRef'))
+        state = str(event.payload.get('status') or event.payload.get('notificationType') or '').upper()
+        if reference not in loans:
+            outcomes[event.pk] = ('ignored', 'No loan with this mandate')
+        elif state in MANDATE_ACTIVE_STATES or state in MANDATE_STOPPED_STATES:
+            switch[state in MANDATE_ACTIVE_STATES].append(loans[reference])
+            outcomes[event.pk] = ('applied', f"Mandate {state.lower()}")
+        else:
+            outcomes[event.pk] = ('ignored', f"Unhandled mandate state {state!r}")
+
+    for active, affected in switch.items():
+        if affected:
+            Loan.objects.filter(pk__in=[pk for pk, _ in affected]).update(auto_deduction_active=active, updated_at=now)
+    return {borrower_id for affected in switch.values() for _, borrower_id in affected}
+
+
+def process_pending_events(batch_size=DEFAULT_EVENT_BATCH_SIZE):
+    """
+    Apply up to batch_size unprocessed events. Concurrent consumers skip each
+    other's rows (SKIP LOCKED on Postgres). Returns counts per outcome.
+    """
+    now = timezone.now()
+    outcomes = {}
+    with transaction.atomic():
+        events = list(
+            RemitaWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True).order_by('pk')[:batch_size]
+        )
+        if not events:
+            return {'events': 0}
+        to_post = _apply_payment_events([event for event in events if event.event_type == 'payment'], outcomes, now)
+        borrowers = _apply_mandate_events([event for event in events if event.event_type == 'mandate'], outcomes, now)
+
+        by_outcome = defaultdict(list)
+        for pk, outcome in outcomes.items():
+            by_outcome[outcome].append(pk)
+        for (outcome, detail), pks in by_outcome.items():
+            RemitaWebhookEvent.objects.filter(pk__in=pks).update(processed_at=now, outcome=outcome, detail=detail[:255])
+
+    # Each loan is posted in its own short transaction; payments left pending by
+    # a failure here are picked up by the post_pending_payments task
+    for loan_id, payment_ids in to_post.items():
+        try:
+            posting.post_loan_payments(loan_id, payment_ids)
+        except Loan.DoesNotExist:
+            logger.warning(f"Skipping webhook payments {payment_ids}: loan {loan_id} no longer exists")
+    for borrower_id in borrowers:
+        invalidate_user_sections(borrower_id)
+
+    counts = {'events': len(events)}
+    for outcome, _ in outcomes.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    return counts
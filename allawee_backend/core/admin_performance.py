@@ -0,0 +1,77 @@
+"""
+Admin changelist and change-form settings for large tables
+
+AdminPerformanceMixin (use it on every ModelAdmin over a big table):
+  * no "N total" count next to filtered results (show_full_result_count)
+    and no per-filter facet counts;
+  * unfiltered changelists are paginated with the planner's row estimate
+    (pg_class.reltuples, summed over partitions) instead of COUNT(*), once
+    the table has ADMIN_ESTIMATED_COUNT_THRESHOLD rows or more;
+  * foreign keys not listed in autocomplete_fields get a raw-ID widget, so
+    change forms never render a whole table into a <select>.
+Declare list_select_related for every relation list_display touches, and
+only point date_hierarchy at indexed columns.
+"""
+
+import logging
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin import widgets
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ESTIMATED_COUNT_THRESHOLD = 50000
+
+
+def estimated_row_count(model, using='default'):
+    """Planner row estimate for model's table (and its partitions); None when unavailable."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT SUM(GREATEST(c.reltuples, 0))::bigint FROM pg_class c "
+                "WHERE c.oid = %s::regclass "
+                "OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)",
+                [table, table],
+            )
+            estimate = cursor.fetchone()[0]
+    except DatabaseError as exc:
+        logger.warning(f"Row estimate for {table} failed: {exc}")
+        return None
+    return int(estimate) if estimate is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts unfiltered querysets from the row estimate when the table is large."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            threshold = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', DEFAULT_ESTIMATED_COUNT_THRESHOLD)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
+
+
+class AdminPerformanceMixin:
+    """ModelAdmin mixin: cheap counts and raw-ID widgets for foreign keys."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name not in self.get_autocomplete_fields(request) \
+                and db_field.name not in self.radio_fields:
+            kwargs['widget'] = widgets.ForeignKeyRawIdWidget(db_field.remote_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -19,6 +19,14 @@ app.autodiscover_tasks()
 
 # Celery Beat Schedule for periodic tasks
 app.conf.beat_schedule = {
+    'post-pending-payments': {
+        'task': 'accounts.tasks.post_pending_payments',
+        'schedule': 60.0,  # Run every minute
+    },
+    'process-remita-events': {
+        'task': 'accounts.tasks.process_remita_events',
+        'schedule': 15.0,  # Drain webhook events every 15 seconds
+    },
     'update-overdue-payments': {
         'task': 'accounts.tasks.update_overdue_payments',
         'schedule': 3600.0,  # Run every hour
@@ -27,14 +35,30 @@ app.conf.beat_schedule = {
         'task': 'accounts.tasks.send_payment_reminders',
         'schedule': 86400.0,  # Run daily
     },
-    'cleanup-old-sessions': {
-        'task': 'accounts.tasks.cleanup_old_sessions',
+    'purge-expired-auth-tokens': {
+        'task': 'accounts.tasks.purge_expired_auth_tokens',
+        'schedule': 86400.0,  # Run daily
+    },
+    'prune-sync-tombstones': {
+        'task': 'accounts.tasks.prune_sync_tombstones',
         'schedule': 86400.0,  # Run daily
     },
     'generate-daily-reports': {
         'task': 'accounts.tasks.generate_daily_reports',
         'schedule': 86400.0,  # Run daily
     },
+    'maintain-partitions': {
+        'task': 'accounts.tasks.maintain_partitions',
+        'schedule': 86400.0,  # Run daily
+    },
+    'archive-closed-loans': {
+        'task': 'accounts.tasks.archive_closed_loans',
+        'schedule': 86400.0,  # Run daily
+    },
+    'optimize-database': {
+        'task': 'accounts.tasks.optimize_database',
+        'schedule': 3600.0,  # Run hourly, only acts inside DB_MAINTENANCE window
+    },
 }
 
 app.conf.timezone = 'UTC'
@@ -0,0 +1,46 @@
+"""
+Database connection pool metrics
+
+Pools are per process: pool_metrics() reports the pools of the worker that
+serves the call. server_connections() asks Postgres for the cluster-wide
+picture, so the two together show whether the total stays bounded.
+"""
+
+from django.db import DatabaseError, connections
+
+
+def pool_metrics():
+    """Return {alias: stats} for every configured database."""
+    metrics = {}
+    for alias in connections:
+        wrapper = connections[alias]
+        # Only the postgresql backend has a pool, and only when OPTIONS['pool'] is set
+        pool = getattr(wrapper, 'pool', None)
+        if pool is None:
+            metrics[alias] = {'pooled': False, 'vendor': wrapper.vendor}
+            continue
+        stats = pool.get_stats()
+        stats.update({
+            'pooled': True,
+            'vendor': wrapper.vendor,
+            'min_size': pool.min_size,
+            'max_size': pool.max_size,
+        })
+        metrics[alias] = stats
+    return metrics
+
+
+def server_connections(alias='default'):
+    """Connections to this database by state, as seen by Postgres; {} elsewhere."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT coalesce(state, 'unknown'), count(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() GROUP BY 1"
+            )
+            return dict(cursor.fetchall())
+    except DatabaseError:
+        return {}
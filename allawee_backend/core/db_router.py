@@ -0,0 +1,167 @@
+"""
+Read/write splitting for AllaweePlus
+
+Writes always go to the primary ('default'). Reads go to the replica only
+inside an opted-in view (replica_reads decorator, ReplicaReadMixin) or a
+use_replica() block, and only when:
+  * the request is a safe (read-only) method,
+  * the user has not written within REPLICA_STICKY_SECONDS (read-your-writes),
+  * the replica's replication lag is under REPLICA_MAX_LAG_SECONDS.
+Otherwise reads fall back to the primary. Without a 'replica' entry in
+DATABASES the router is a no-op.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+# alias -> (checked_at, healthy); per process, refreshed every REPLICA_LAG_CHECK_INTERVAL
+_lag_checks = {}
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def sticky_cache_key(user_id):
+    return f"db_sticky_primary_{user_id}"
+
+
+def mark_user_wrote(user_id):
+    """Pin the user's reads to the primary for the stickiness window."""
+    cache.set(sticky_cache_key(user_id), 1, getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+
+
+def user_is_sticky(user):
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return False
+    return cache.get(sticky_cache_key(user.pk)) is not None
+
+
+def replication_lag_seconds(alias):
+    """
+    Seconds the replica is behind the primary; 0 for backends without replication.
+
+    The age of the last replayed transaction keeps growing while the primary
+    is idle, so it only counts when the replica has received WAL it has not
+    replayed yet.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+            "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def replica_is_healthy(alias):
+    now = time.monotonic()
+    checked_at, healthy = _lag_checks.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5):
+        return healthy
+    try:
+        lag = replication_lag_seconds(alias)
+        healthy = lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+        if not healthy:
+            logger.warning(f"Replica '{alias}' is {lag:.1f}s behind, reading from primary")
+    except DatabaseError as exc:
+        logger.warning(f"Replica '{alias}' unavailable, reading from primary: {exc}")
+        healthy = False
+    _lag_checks[alias] = (now, healthy)
+    return healthy
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Route ORM reads in this block to the replica (subject to the lag check)."""
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def replica_allowed_for(request):
+    return request.method in SAFE_METHODS and not user_is_sticky(getattr(request, 'user', None))
+
+
+def replica_reads(view_func):
+    """Opt a function view (or view method via method_decorator) into replica reads."""
+    @wraps(view_func)
+    def wrapped(request, *args, **kwargs):
+        with use_replica(replica_allowed_for(request)):
+            return view_func(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaReadMixin:
+    """Opt a DRF generic view into replica reads for its GET handler."""
+
+    def get(self, request, *args, **kwargs):
+        with use_replica(replica_allowed_for(request)):
+            return super().get(request, *args, **kwargs)
+
+
+class ReplicaChangelistMixin:
+    """Opt a ModelAdmin's changelist into replica reads (GET only; actions POST)."""
+
+    def changelist_view(self, request, extra_context=None):
+        with use_replica(replica_allowed_for(request)):
+            return super().changelist_view(request, extra_context)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get():
+            return None
+        alias = replica_alias()
+        if alias and replica_is_healthy(alias):
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica rows are copies of primary rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica_alias()
+
+
+class ReplicaStickinessMiddleware:
+    """
+    After a successful write by an authenticated user, pin that user's reads
+    to the primary for REPLICA_STICKY_SECONDS. DRF authenticates inside the
+    view and copies the user onto the underlying request, so request.user is
+    resolved by the time the response comes back.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_alias():
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                mark_user_wrote(user.pk)
+        return response
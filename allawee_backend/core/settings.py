@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 # --- Base paths ---
@@ -23,7 +24,12 @@ INSTALLED_APPS = [
 
     # Third-party
     "rest_framework",
+    "rest_framework.authtoken",
+    "rest_framework_simplejwt.token_blacklist",
     "corsheaders",
+
+    # Local
+    "accounts",
 ]
 
 MIDDLEWARE = [
@@ -33,6 +39,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.db_router.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -58,13 +65,36 @@ TEMPLATES = [
 WSGI_APPLICATION = "core.wsgi.application"
 
 # --- Database (SQLite for dev; swap for Postgres in prod) ---
+# SQLite profile: "tuned" (WAL, synchronous=NORMAL, mmap, cache, busy timeout,
+# IMMEDIATE write transactions; see core/sqlite_profile.py) or "default".
+# Benchmark both with `python manage.py benchmark_sqlite`.
+SQLITE_PROFILE = os.getenv("DJANGO_SQLITE_PROFILE", "tuned")
+SQLITE_OPTIONS = {"transaction_mode": "IMMEDIATE", "timeout": 5} if SQLITE_PROFILE == "tuned" else {}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": SQLITE_OPTIONS,
     }
 }
 
+# --- Read replica ---
+# Opted-in read views (core.db_router.replica_reads / ReplicaReadMixin) read from
+# DATABASES["replica"] when it exists. Locally a second SQLite file can stand in
+# for it; in tests it mirrors "default".
+if os.getenv("DJANGO_SQLITE_REPLICA"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / os.getenv("DJANGO_SQLITE_REPLICA"),
+        "OPTIONS": SQLITE_OPTIONS,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))  # read-your-writes window
+REPLICA_MAX_LAG_SECONDS = int(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = 5
+
 # --- Password validation ---
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -89,12 +119,85 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # --- CORS ---
 CORS_ALLOW_ALL_ORIGINS = True  # tighten later with CORS_ALLOWED_ORIGINS
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 
 # --- DRF / JWT ---
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
+    # Sliding-window limits on login and registration (accounts/throttling.py),
+    # per client IP and per submitted username / email / phone
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": os.getenv("THROTTLE_LOGIN_IP", "30/min"),
+        "login_identifier": os.getenv("THROTTLE_LOGIN_IDENTIFIER", "5/min"),
+        "register_ip": os.getenv("THROTTLE_REGISTER_IP", "10/hour"),
+        "register_identifier": os.getenv("THROTTLE_REGISTER_IDENTIFIER", "3/hour"),
+    },
+    # Proxies in front of the app: the client IP for throttling is the
+    # X-Forwarded-For entry this many hops from the end (0 = REMOTE_ADDR)
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+}
+
+SIMPLE_JWT = {
+    # "Token" keeps the admin dashboard's Authorization header working
+    "AUTH_HEADER_TYPES": ("Bearer", "Token"),
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.ProfileTokenObtainPairSerializer",
+}
+
+# Seconds an authenticated user and profile stay cached (accounts/authentication.py);
+# saving either one starts a new cache generation once the transaction commits
+AUTH_PRINCIPAL_CACHE_TTL = int(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", "60"))
+
+# DRF auth tokens older than this are purged by accounts.tasks.purge_expired_auth_tokens
+AUTH_TOKEN_MAX_AGE_DAYS = int(os.getenv("AUTH_TOKEN_MAX_AGE_DAYS", "30"))
+
+# Closed loans older than this move to accounts.LoanArchive (accounts.tasks.archive_closed_loans)
+LOAN_ARCHIVE_AFTER_MONTHS = int(os.getenv("LOAN_ARCHIVE_AFTER_MONTHS", "12"))
+
+# Delta sync (accounts/sync.py): rows per entity per call, watermark overlap,
+# and how long deletions are remembered before clients must fully resync
+SYNC_PAGE_SIZE = 500
+SYNC_OVERLAP_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "90"))
+
+# Rows per keyset page for streamed exports (accounts/exports.py)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Background export files (accounts/storage.py) live outside MEDIA_ROOT and are
+# only served by the staff-only export-job-download view. Behind nginx, set the
+# prefix of an `internal` location aliased to EXPORT_ROOT so nginx sends the file.
+EXPORT_ROOT = os.getenv("EXPORT_ROOT", str(BASE_DIR / "private" / "exports"))
+EXPORT_ACCEL_REDIRECT_PREFIX = os.getenv("EXPORT_ACCEL_REDIRECT_PREFIX", "")
+
+# Unfiltered admin changelists over tables at least this large are paginated
+# with the planner's row estimate instead of COUNT(*) (core/admin_performance.py)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 50000
+
+# Admin bulk actions over more rows than this run as chunked background jobs
+# (accounts/bulk_actions.py)
+ADMIN_BULK_SYNC_LIMIT = 200
+ADMIN_BULK_CHUNK_SIZE = 500
+
+# Idempotency-Key replay (accounts/idempotency.py): how long responses are kept,
+# and how long a first request holds the key against concurrent duplicates
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TIMEOUT = 90
+
+# Stored report that python manage.py benchmark_endpoints compares against
+BENCHMARK_BASELINE = BASE_DIR / "benchmarks" / "baseline.json"
+
+# Remita gateway (accounts/remita.py). Leave REMITA_BASE_URL unset for mock
+# responses, or point it at the local stub: python manage.py remita_stub
+REMITA = {
+    "BASE_URL": os.getenv("REMITA_BASE_URL", ""),
+    "MERCHANT_ID": os.getenv("REMITA_MERCHANT_ID", ""),
+    "API_KEY": os.getenv("REMITA_API_KEY", ""),
+    "API_TOKEN": os.getenv("REMITA_API_TOKEN", ""),
+    "WEBHOOK_SECRET": os.getenv("REMITA_WEBHOOK_SECRET", ""),
+    "READ_TIMEOUT": float(os.getenv("REMITA_READ_TIMEOUT", "30")),
+    "MAX_CONNECTIONS": int(os.getenv("REMITA_MAX_CONNECTIONS", "100")),
+    "MAX_CONCURRENCY": int(os.getenv("REMITA_MAX_CONCURRENCY", "50")),
 }
 
 # --- Email (optional, via env) ---
@@ -28,13 +28,68 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
         'OPTIONS': {
-            'MAX_CONNS': 200,  # Maximum connections for high concurrency
             'sslmode': 'require',
+            'connect_timeout': 10,
         },
-        'CONN_MAX_AGE': 600,  # Connection pooling
     }
 }
 
+# CONNECTION POOLING
+# Every gevent greenlet gets its own Django connection, so persistent
+# connections (CONN_MAX_AGE) scale with worker_connections, not with load.
+# Two bounded modes (DB_POOL_MODE):
+#   'psycopg'   - psycopg 3 pool per worker process. Greenlets borrow a
+#                 connection per request and wait up to DB_POOL_TIMEOUT when
+#                 all are busy. Total = processes x DB_POOL_MAX_SIZE
+#                 (16 web + 8 celery processes x 6 = 144 < max_connections 200).
+#   'pgbouncer' - DB_HOST points at PgBouncer in transaction mode, which bounds
+#                 server connections itself (default_pool_size). Server-side
+#                 cursors and prepared statements do not survive transaction
+#                 pooling, so both are disabled.
+# Pool statistics: core.db_pool.pool_metrics(), served by accounts.views.db_pool_status
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'psycopg')
+
+if DB_POOL_MODE == 'pgbouncer':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': True,
+    })
+    DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+else:
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # the pool owns connection lifetime
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '6')),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),  # seconds to wait for a free connection
+        'max_idle': 300,
+        'max_lifetime': 1800,
+        'check': ConnectionPool.check_connection,  # health check on checkout
+    }
+
+# READ REPLICA (streaming standby); see core/db_router.py for what reads go there
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        OPTIONS=dict(DATABASES['default']['OPTIONS']),
+        HOST=os.environ['DB_REPLICA_HOST'],
+        PORT=os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},
+    )
+
+# DATABASE MAINTENANCE (see accounts/maintenance.py for all keys)
+DB_MAINTENANCE = {
+    'WINDOW_START_HOUR': int(os.environ.get('DB_MAINTENANCE_START_HOUR', '1')),
+    'WINDOW_END_HOUR': int(os.environ.get('DB_MAINTENANCE_END_HOUR', '5')),
+}
+
+# PARTITIONING (accounts_payment / accounts_remitatransaction, see accounts/partitioning.py)
+PARTITION_MONTHS_AHEAD = 3
+PARTITION_ARCHIVE_AFTER_MONTHS = int(os.environ.get('PARTITION_ARCHIVE_AFTER_MONTHS', '0')) or None
+PARTITION_DETACH_LOCK_TIMEOUT = os.environ.get('PARTITION_DETACH_LOCK_TIMEOUT', '5s')
+
 # REDIS CACHE CONFIGURATION
 CACHES = {
     'default': {
@@ -68,7 +123,7 @@ REST_FRAMEWORK.update({
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',  # Anonymous users: 100 requests per hour
         'user': '10000/hour',  # Authenticated users: 10,000 requests per hour
-        'login': '20/hour',    # Login attempts: 20 per hour
+        **REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],  # login_* / register_* from settings.py
     },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,  # Increased from 20 for efficiency
@@ -80,6 +135,9 @@ REST_FRAMEWORK.update({
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # nginx (deploy_production.sh) is the one hop in front of gunicorn and
+    # appends $remote_addr to X-Forwarded-For
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '1')),
 })
 
 # CELERY CONFIGURATION FOR BACKGROUND TASKS
@@ -158,6 +216,10 @@ MEDIA_ROOT = '/var/www/allaweeplus/media/'
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
+# Background exports: private, served via nginx's internal /protected-exports/ location
+EXPORT_ROOT = '/var/lib/allaweeplus/exports/'
+EXPORT_ACCEL_REDIRECT_PREFIX = '/protected-exports/'
+
 # EMAIL CONFIGURATION
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -170,6 +232,7 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@allaweplus.co
 # JWT SETTINGS
 from datetime import timedelta
 SIMPLE_JWT = {
+    **SIMPLE_JWT,
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
@@ -198,6 +261,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.cache.FetchFromCacheMiddleware',  # Cache middleware last
@@ -0,0 +1,163 @@
+"""
+SQLite performance profile for dev and small deployments
+
+Enabled with DJANGO_SQLITE_PROFILE=tuned (the default in core/settings.py):
+  * WAL journal: readers no longer block the writer or each other
+  * synchronous=NORMAL: fsync at checkpoints, not every commit (safe with WAL;
+    a power cut can lose the last transactions but never corrupts the file)
+  * mmap_size / cache_size: serve hot pages from memory
+  * busy_timeout: wait for the write lock instead of failing immediately
+  * temp_store=MEMORY: sorts and temp indexes off disk
+and, via DATABASES OPTIONS, transaction_mode=IMMEDIATE so atomic() blocks
+take the write lock up front instead of failing with "database is locked"
+when a read transaction later tries to upgrade.
+
+DJANGO_SQLITE_PROFILE=default leaves SQLite's defaults in place.
+
+run_benchmark() compares the two under a mixed read/write workload modelled
+on scalability_test.py (see the benchmark_sqlite management command).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+
+TUNED_PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64 * 1024),  # negative = KiB, i.e. 64 MiB
+    ('busy_timeout', 5000),      # ms
+    ('temp_store', 'MEMORY'),
+]
+
+# Django's sqlite backend passes OPTIONS['timeout'] to sqlite3.connect
+DEFAULT_BUSY_TIMEOUT = 5.0
+
+
+def profile_enabled():
+    return getattr(settings, 'SQLITE_PROFILE', 'default') == 'tuned'
+
+
+def apply_pragmas(cursor, pragmas=TUNED_PRAGMAS):
+    for name, value in pragmas:
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def apply_sqlite_profile(sender, connection, **kwargs):
+    """connection_created receiver (connected in accounts.apps)."""
+    if connection.vendor != 'sqlite' or not profile_enabled():
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
+
+
+# --- Benchmark --------------------------------------------------------------
+
+BENCHMARK_SCHEMA = [
+    "CREATE TABLE profile (id INTEGER PRIMARY KEY, phone TEXT UNIQUE, full_name TEXT, created_at REAL)",
+    "CREATE TABLE loan (id INTEGER PRIMARY KEY, profile_id INTEGER, total REAL, paid REAL DEFAULT 0)",
+    "CREATE TABLE payment (id INTEGER PRIMARY KEY, loan_id INTEGER, amount REAL, created_at REAL)",
+    "CREATE INDEX payment_loan ON payment (loan_id)",
+]
+
+
+def _connect(path, tuned):
+    conn = sqlite3.connect(path, timeout=DEFAULT_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    if tuned:
+        apply_pragmas(conn.cursor())
+    return conn
+
+
+def _seed(path, loans):
+    conn = sqlite3.connect(path, isolation_level=None)
+    for statement in BENCHMARK_SCHEMA:
+        conn.execute(statement)
+    conn.execute("BEGIN")
+    for index in range(loans):
+        conn.execute("INSERT INTO profile (phone, full_name, created_at) VALUES (?, ?, ?)",
+                     (f"0800{index:07d}", f"Seed User {index}", time.time()))
+        conn.execute("INSERT INTO loan (profile_id, total) VALUES (?, ?)", (index + 1, 11500))
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _worker(path, tuned, deadline, loans, seed):
+    """One simulated client: register / log in / read dashboard / post a payment."""
+    rng = random.Random(seed)
+    conn = _connect(path, tuned)
+    begin = "BEGIN IMMEDIATE" if tuned else "BEGIN"
+    latencies, errors, serial = [], 0, 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        action = rng.random()
+        try:
+            if action < 0.5:
+                # login + dashboard: reads only
+                profile_id = rng.randint(1, loans)
+                conn.execute("SELECT full_name FROM profile WHERE id = ?", (profile_id,)).fetchone()
+                conn.execute("SELECT count(*), sum(amount) FROM payment WHERE loan_id = ?", (profile_id,)).fetchone()
+            elif action < 0.8:
+                # payment posting: read-modify-write in one transaction
+                loan_id = rng.randint(1, loans)
+                conn.execute(begin)
+                paid = conn.execute("SELECT coalesce(sum(amount), 0) FROM payment WHERE loan_id = ?", (loan_id,)).fetchone()[0]
+                conn.execute("INSERT INTO payment (loan_id, amount, created_at) VALUES (?, ?, ?)", (loan_id, 500, time.time()))
+                conn.execute("UPDATE loan SET paid = ? WHERE id = ?", (paid + 500, loan_id))
+                conn.execute("COMMIT")
+            else:
+                # registration
+                serial += 1
+                conn.execute(begin)
+                conn.execute("INSERT INTO profile (phone, full_name, created_at) VALUES (?, ?, ?)",
+                             (f"09{seed:03d}{serial:06d}", f"Bench User {seed}-{serial}", time.time()))
+                conn.execute("COMMIT")
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+    conn.close()
+    return latencies, errors
+
+
+def run_benchmark(tuned, threads=16, seconds=10, loans=1000):
+    """Run the workload against a fresh temporary database and return a summary dict."""
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.sqlite3')
+    try:
+        _seed(path, loans)
+        deadline = time.monotonic() + seconds
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(
+                lambda seed: _worker(path, tuned, deadline, loans, seed), range(threads)
+            ))
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    errors = sum(worker_errors for _, worker_errors in results)
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+
+    return {
+        'profile': 'tuned' if tuned else 'default',
+        'threads': threads,
+        'seconds': seconds,
+        'operations': len(latencies),
+        'ops_per_second': round(len(latencies) / seconds, 1),
+        'errors': errors,
+        'p50_ms': round(percentile(0.50), 2),
+        'p95_ms': round(percentile(0.95), 2),
+        'p99_ms': round(percentile(0.99), 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else 0,
+    }
@@ -27,10 +27,13 @@ sudo mkdir -p $BACKUP_DIR
 sudo mkdir -p $LOG_DIR
 sudo mkdir -p /var/www/allaweeplus/static
 sudo mkdir -p /var/www/allaweeplus/media
+sudo mkdir -p /var/lib/allaweeplus/exports
 
 # Set ownership
 sudo chown -R $USER:www-data $PROJECT_DIR
 sudo chown -R $USER:www-data $LOG_DIR
+sudo chown -R $USER:www-data /var/lib/allaweeplus/exports
+sudo chmod 750 /var/lib/allaweeplus/exports
 
 echo -e "${GREEN}✅ Directories created${NC}"
 
@@ -197,6 +200,14 @@ server {
         add_header Cache-Control "public";
     }
     
+    # Background exports: only reachable via X-Accel-Redirect from the
+    # staff-only /api/accounts/exports/jobs/<id>/download/ view
+    location /protected-exports/ {
+        internal;
+        alias /var/lib/allaweeplus/exports/;
+        add_header Cache-Control "no-store";
+    }
+    
     location /api/accounts/auth/login/ {
         limit_req zone=login burst=10 nodelay;
         proxy_pass http://allaweeplus_backend;